@@ -0,0 +1,75 @@
+"""p99 latency of an ``/api/embed`` cache hit with and without the read-through tier.
+
+    python -m api._embedding.bench_cache --requests 5000
+    DATABASE_URL=postgres://... python -m api._embedding.bench_cache --media-id <id>
+
+Without ``DATABASE_URL`` the Postgres round trip is simulated with
+``--db-rtt-ms`` of sleep, so absolute numbers only mean something against a
+real database. Set ``REDIS_URL`` with ``EMBED_CACHE_MAX_ENTRIES=0`` to
+measure the Redis tier on its own.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+
+import api.embed as embed
+from api._embedding.cache import EmbeddingCache, LocalTier
+
+
+class StubConn:
+    def __init__(self, rtt_s: float, vec):
+        self.rtt_s = rtt_s
+        self.row = {"title": "t", "description": "d", "tags": [], "embedding": vec}
+
+    async def fetchrow(self, *args):
+        await asyncio.sleep(self.rtt_s)
+        return self.row
+
+    async def close(self):
+        pass
+
+
+async def run(n: int, media_id: str) -> dict:
+    req = embed.EmbedRequest(mediaId=media_id)
+    await embed.handle(req)  # warm the connection path / populate the cache
+    samples = np.empty(n)
+    for i in range(n):
+        t0 = time.perf_counter()
+        await embed.handle(req)
+        samples[i] = (time.perf_counter() - t0) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(samples, 50)), 4),
+        "p99_ms": round(float(np.percentile(samples, 99)), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--media-id", default="bench")
+    parser.add_argument("--db-rtt-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        conn = StubConn(args.db_rtt_ms / 1000, np.ones(256, dtype=np.float32).tolist())
+
+        async def get_db():
+            return conn
+
+        embed.get_db = get_db
+
+    embed.cache = EmbeddingCache(local=None)
+    before = asyncio.run(run(args.requests, args.media_id))
+    embed.cache = EmbeddingCache.from_env()
+    if embed.cache.local is None and embed.cache.redis is None:
+        embed.cache = EmbeddingCache(LocalTier(1024, 3600))
+    after = asyncio.run(run(args.requests, args.media_id))
+    print(json.dumps({"requests": args.requests, "before": before, "after": after}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Read-through cache for ``canonical_media.embedding``.
+
+Embeddings are stored as raw float32 bytes keyed by media id, first in a small
+in-process LRU and, when ``REDIS_URL`` is set, in a shared Redis tier. A hit in
+either tier answers ``/api/embed`` without touching Postgres. The local tier
+is bounded by ``EMBED_CACHE_MAX_ENTRIES``; Redis entries expire after
+``EMBED_CACHE_TTL_S`` and are otherwise bounded by the server's maxmemory
+policy.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+import numpy as np
+
+KEY_PREFIX = "emb:media:"
+
+
+def encode(vec: Sequence[float]) -> bytes:
+    return np.asarray(vec, dtype=np.float32).tobytes()
+
+
+def decode(raw: bytes) -> np.ndarray:
+    return np.frombuffer(raw, dtype=np.float32)
+
+
+class LocalTier:
+    """LRU bounded by entry count with a per-entry TTL."""
+
+    def __init__(self, max_entries: int, ttl_s: float):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[str, tuple[float, bytes]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires, raw = item
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return raw
+
+    def set(self, key: str, raw: bytes) -> None:
+        self._data[key] = (time.monotonic() + self.ttl_s, raw)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class EmbeddingCache:
+    def __init__(self, local: Optional[LocalTier] = None, redis=None, ttl_s: int = 3600):
+        self.local = local
+        self.redis = redis
+        self.ttl_s = ttl_s
+
+    @classmethod
+    def from_env(cls) -> "EmbeddingCache":
+        ttl_s = int(os.getenv("EMBED_CACHE_TTL_S", "3600"))
+        max_entries = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "20000"))
+        local = LocalTier(max_entries, ttl_s) if max_entries > 0 else None
+        redis = None
+        if os.getenv("REDIS_URL"):
+            import redis.asyncio as aioredis
+
+            redis = aioredis.from_url(os.environ["REDIS_URL"])
+        return cls(local, redis, ttl_s)
+
+    async def get(self, media_id: str) -> Optional[np.ndarray]:
+        if self.local is not None:
+            raw = self.local.get(media_id)
+            if raw is not None:
+                return decode(raw)
+        if self.redis is None:
+            return None
+        try:
+            raw = await self.redis.get(KEY_PREFIX + media_id)
+        except Exception:
+            # the cache must never fail a request; fall through to Postgres
+            return None
+        if raw is None:
+            return None
+        if self.local is not None:
+            self.local.set(media_id, raw)
+        return decode(raw)
+
+    async def set(self, media_id: str, vec: Sequence[float]) -> None:
+        raw = encode(vec)
+        if self.local is not None:
+            self.local.set(media_id, raw)
+        if self.redis is not None:
+            try:
+                await self.redis.set(KEY_PREFIX + media_id, raw, ex=self.ttl_s)
+            except Exception:
+                pass
+
+    async def invalidate(self, media_id: str) -> None:
+        if self.local is not None:
+            self.local.delete(media_id)
+        if self.redis is not None:
+            try:
+                await self.redis.delete(KEY_PREFIX + media_id)
+            except Exception:
+                pass
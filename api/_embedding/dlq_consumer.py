@@ -0,0 +1,285 @@
+"""Batch consumer for the ``embedding_dlq`` Redis stream.
+
+Replaces the ``{ids}`` POST that ``jobs/embed_retry_worker.ts`` makes to an
+endpoint ``api/embed.py`` never implemented. Each consumer in the
+``retry_group`` consumer group:
+
+* reads up to ``batch`` entries with XREADGROUP (and periodically reclaims
+  entries abandoned by dead consumers with XAUTOCLAIM),
+* loads all media rows in one query from a shared asyncpg pool,
+* embeds the distinct texts with one provider call,
+* writes every vector with one ``executemany`` and ACKs the batch.
+
+Failed entries are re-queued with ``retry + 1`` and a ``due`` timestamp
+(exponential backoff); after ``max_retry`` they move to
+``embedding_dlq_dead``, mirroring the TS worker. Entries without a
+``mediaId`` or with an unparseable ``due``/``retry`` go there straight away,
+so a poison entry cannot crash the consumers again each time it is
+reclaimed. A consumer that hits a Redis error logs it and backs off. The
+other consumers keep running. Delivery is at-least-once; the UPDATE is
+idempotent.
+
+    python -m api._embedding.dlq_consumer --consumers 4
+"""
+import argparse
+import asyncio
+import heapq
+import logging
+import os
+import socket
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from api.embed import cache, compose_text, create_embeddings, remaining_budget
+
+log = logging.getLogger(__name__)
+
+Entry = Tuple[str, Dict[str, str]]
+
+
+@dataclass
+class DlqConfig:
+    stream: str = "embedding_dlq"
+    dead_stream: str = "embedding_dlq_dead"
+    group: str = "retry_group"
+    batch: int = 50
+    max_retry: int = 3
+    backoff_base_s: float = 1.0
+    backoff_max_s: float = 30.0
+    # must stay above backoff_max_s so entries we hold for backoff are not
+    # stolen by another consumer's XAUTOCLAIM
+    claim_idle_ms: int = 60_000
+    claim_every_s: float = 15.0
+    block_ms: int = 1000
+
+    @classmethod
+    def from_env(cls) -> "DlqConfig":
+        return cls(
+            batch=int(os.getenv("DLQ_BATCH", "50")),
+            max_retry=int(os.getenv("DLQ_MAX_RETRY", "3")),
+            backoff_base_s=float(os.getenv("DLQ_BACKOFF_BASE_S", "1")),
+            backoff_max_s=float(os.getenv("DLQ_BACKOFF_MAX_S", "30")),
+            claim_idle_ms=int(os.getenv("DLQ_CLAIM_IDLE_MS", "60000")),
+        )
+
+    def backoff_s(self, retry: int) -> float:
+        return min(self.backoff_max_s, self.backoff_base_s * 2 ** (retry - 1))
+
+
+async def ensure_group(redis, cfg: DlqConfig) -> None:
+    try:
+        await redis.xgroup_create(cfg.stream, cfg.group, id="0", mkstream=True)
+    except Exception as err:  # BUSYGROUP: another consumer created it first
+        if "BUSYGROUP" not in str(err):
+            raise
+
+
+class DlqConsumer:
+    def __init__(self, redis, pool, name: str, cfg: Optional[DlqConfig] = None):
+        self.redis = redis
+        self.pool = pool
+        self.name = name
+        self.cfg = cfg or DlqConfig()
+        # entries waiting out their backoff; still pending (un-ACKed) in Redis
+        self._delayed: List[Tuple[float, str, Dict[str, str]]] = []
+        self._last_claim = 0.0
+
+    async def run(self, stop: asyncio.Event) -> None:
+        failures = 0
+        while not stop.is_set():
+            try:
+                await self.run_once()
+                failures = 0
+            except Exception:
+                # one consumer's failure must not cancel the others in ``run_consumers``
+                failures += 1
+                delay = self.cfg.backoff_s(failures)
+                log.exception("dlq consumer %s failed; retrying in %.1fs", self.name, delay)
+                try:
+                    await asyncio.wait_for(stop.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def run_once(self) -> int:
+        entries = self._due()
+        now = time.monotonic()
+        if now - self._last_claim >= self.cfg.claim_every_s:
+            self._last_claim = now
+            entries += await self._claim_stale()
+        room = self.cfg.batch - len(entries)
+        if room > 0:
+            block = None if entries or self._delayed else self.cfg.block_ms
+            resp = await self.redis.xreadgroup(
+                self.cfg.group, self.name, {self.cfg.stream: ">"}, count=room, block=block
+            )
+            for _, messages in resp or []:
+                entries += messages
+        entries = await self._drop_malformed(entries)
+        ready = self._hold_not_due(entries)
+        if ready:
+            await self.process(ready)
+        elif self._delayed and not entries:
+            await asyncio.sleep(min(0.1, max(0.0, self._delayed[0][0] - time.time())))
+        return len(ready)
+
+    async def _claim_stale(self) -> List[Entry]:
+        _, messages, _ = await self.redis.xautoclaim(
+            self.cfg.stream, self.cfg.group, self.name,
+            min_idle_time=self.cfg.claim_idle_ms, start_id="0-0", count=self.cfg.batch,
+        )
+        held = {entry_id for _, entry_id, _ in self._delayed}
+        return [m for m in messages if m[0] not in held]
+
+    async def _drop_malformed(self, entries: List[Entry]) -> List[Entry]:
+        """Dead-letter and ACK entries that cannot be processed; return the rest."""
+        good, bad = [], []
+        for entry_id, fields in entries:
+            problem = _malformed(fields)
+            if problem is None:
+                good.append((entry_id, fields))
+            else:
+                bad.append((entry_id, {**fields, "error": f"malformed entry: {problem}"}))
+        if bad:
+            log.warning("dlq: dead-lettering %d malformed entries", len(bad))
+            pipe = self.redis.pipeline(transaction=False)
+            for _, fields in bad:
+                pipe.xadd(self.cfg.dead_stream, fields)
+            pipe.xack(self.cfg.stream, self.cfg.group, *[entry_id for entry_id, _ in bad])
+            await pipe.execute()
+        return good
+
+    def _hold_not_due(self, entries: List[Entry]) -> List[Entry]:
+        now = time.time()
+        ready = []
+        for entry_id, fields in entries:
+            due = float(fields.get("due") or 0) / 1000
+            if due > now:
+                heapq.heappush(self._delayed, (due, entry_id, fields))
+            else:
+                ready.append((entry_id, fields))
+        return ready
+
+    def _due(self) -> List[Entry]:
+        now = time.time()
+        out = []
+        while self._delayed and self._delayed[0][0] <= now and len(out) < self.cfg.batch:
+            _, entry_id, fields = heapq.heappop(self._delayed)
+            out.append((entry_id, fields))
+        return out
+
+    async def process(self, entries: List[Entry]) -> None:
+        media_ids = list(dict.fromkeys(f["mediaId"] for _, f in entries))
+        try:
+            failed = await self._embed(media_ids)
+        except Exception as err:
+            failed = {mid: f"{type(err).__name__}: {err}" for mid in media_ids}
+        await self._settle(entries, failed)
+
+    async def _embed(self, media_ids: List[str]) -> Dict[str, str]:
+        """Embed and store ``media_ids``; return ``{media_id: error}`` for failures."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT id, title, description, tags, embedding
+                FROM canonical_media
+                WHERE id = ANY($1::text[])
+                """,
+                media_ids,
+            )
+            found = {r["id"] for r in rows}
+            failed = {mid: "media not found" for mid in media_ids if mid not in found}
+            by_text: Dict[str, List[str]] = {}
+            for r in rows:
+                if not r["embedding"]:
+                    by_text.setdefault(compose_text(r), []).append(r["id"])
+            if not by_text:
+                return failed
+            if remaining_budget() < 5.0:
+                failed.update({mid: "budget exhausted" for ids in by_text.values() for mid in ids})
+                return failed
+
+            texts = list(by_text)
+            vecs = await create_embeddings(texts)
+            updates = [
+                (vec.tolist(), mid)
+                for text, vec in zip(texts, vecs)
+                for mid in by_text[text]
+            ]
+            for _, mid in updates:
+                await cache.invalidate(mid)
+            await conn.executemany(
+                "UPDATE canonical_media SET embedding = $1 WHERE id = $2", updates
+            )
+        for vec, mid in updates:
+            await cache.set(mid, vec)
+        return failed
+
+    async def _settle(self, entries: List[Entry], failed: Dict[str, str]) -> None:
+        cfg = self.cfg
+        pipe = self.redis.pipeline(transaction=False)
+        for entry_id, fields in entries:
+            error = failed.get(fields["mediaId"])
+            if error is not None:
+                retry = int(fields.get("retry") or 0) + 1
+                out = {
+                    "mediaId": fields["mediaId"],
+                    "error": error,
+                    "ts": fields.get("ts") or str(int(time.time() * 1000)),
+                    "retry": str(retry),
+                }
+                if retry >= cfg.max_retry:
+                    pipe.xadd(cfg.dead_stream, out)
+                else:
+                    out["due"] = str(int((time.time() + cfg.backoff_s(retry)) * 1000))
+                    pipe.xadd(cfg.stream, out)
+        pipe.xack(cfg.stream, cfg.group, *[entry_id for entry_id, _ in entries])
+        await pipe.execute()
+
+
+def _malformed(fields: Dict[str, str]) -> Optional[str]:
+    if not fields.get("mediaId"):
+        return "no mediaId"
+    try:
+        float(fields.get("due") or 0)
+        int(fields.get("retry") or 0)
+    except ValueError:
+        return f"due={fields.get('due')!r} retry={fields.get('retry')!r}"
+    return None
+
+
+async def run_consumers(n: int, cfg: DlqConfig, stop: asyncio.Event) -> None:
+    import asyncpg
+    import redis.asyncio as aioredis
+
+    redis = aioredis.from_url(os.environ["REDIS_URL"], decode_responses=True)
+    pool = await asyncpg.create_pool(os.environ["DATABASE_URL"], min_size=1, max_size=n)
+    try:
+        await ensure_group(redis, cfg)
+        host = socket.gethostname()
+        consumers = [DlqConsumer(redis, pool, f"{host}-{os.getpid()}-{i}", cfg) for i in range(n)]
+        await asyncio.gather(*(c.run(stop) for c in consumers))
+    finally:
+        await pool.close()
+        await redis.aclose()
+
+
+def main():
+    import signal
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--consumers", type=int, default=int(os.getenv("DLQ_CONSUMERS", "4")))
+    args = parser.parse_args()
+
+    async def _run():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await run_consumers(args.consumers, DlqConfig.from_env(), stop)
+
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Prometheus metrics and sampled structured logging for ``/api/embed``.
+
+Phase timers use histogram children bound once at import, so timing a phase
+costs two ``perf_counter`` calls and one observe.
+
+Sampled request lines go to the ``api.embed`` logger at INFO. Nothing else
+in ``api/`` configures logging (uvicorn only sets up its own loggers), so the
+app calls ``configure_request_log`` at startup to give that logger a stdout
+handler; otherwise the root logger's WARNING level would drop every line.
+"""
+import json
+import logging
+import os
+import random
+import sys
+from time import perf_counter
+from typing import Optional
+
+from prometheus_client import Counter, Histogram
+
+PHASE_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+embed_phase_seconds = Histogram(
+    "embed_phase_seconds",
+    "Time spent in each /api/embed phase",
+    ["phase"],
+    buckets=PHASE_BUCKETS,
+)
+embed_cache_hits_total = Counter(
+    "embed_cache_hits_total", "Embeddings served without a provider call", ["tier"]
+)
+embed_cache_misses_total = Counter(
+    "embed_cache_misses_total", "Requests that needed a fresh embedding"
+)
+embed_budget_rejections_total = Counter(
+    "embed_budget_rejections_total", "Requests rejected because the provider budget is exhausted"
+)
+embed_provider_errors_total = Counter(
+    "embed_provider_errors_total", "Failed embedding provider calls"
+)
+
+LOG_SAMPLE_RATE = float(os.getenv("EMBED_LOG_SAMPLE_RATE", "0.01"))
+log = logging.getLogger("api.embed")
+
+
+PHASES = ("acquire", "fetch", "compose", "provider", "update")
+_observers = {name: embed_phase_seconds.labels(name).observe for name in PHASES}
+
+
+class phase:
+    """``with phase("fetch"): ...`` records the block's duration."""
+
+    __slots__ = ("_observe", "_t0")
+
+    def __init__(self, name: str):
+        self._observe = _observers[name]
+
+    def __enter__(self):
+        self._t0 = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._observe(perf_counter() - self._t0)
+        return False
+
+
+def configure_request_log(stream=None) -> None:
+    """Send ``api.embed`` INFO lines, one JSON object each, to ``stream`` (stdout)."""
+    if log.handlers:
+        return
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    # printed once here, not again by whatever the root logger is given
+    log.propagate = False
+
+
+def log_sampled(event: str, rate: Optional[float] = None, **fields) -> None:
+    """Emit a JSON log line for roughly ``rate`` of calls (``EMBED_LOG_SAMPLE_RATE``)."""
+    if random.random() < (LOG_SAMPLE_RATE if rate is None else rate):
+        log.info(json.dumps({"event": event, **fields}))
@@ -0,0 +1,136 @@
+"""Dimension reduction applied to provider embeddings before they are stored.
+
+Every strategy works on a whole ``(n, dim_in)`` batch at once; the single-text
+path goes through the same code as a one-row batch so both produce identical
+vectors.
+"""
+import json
+import os
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+EMBED_DIM_IN = int(os.getenv("EMBED_DIM_IN", "768"))
+EMBED_DIM_OUT = int(os.getenv("EMBED_DIM_OUT", "256"))
+
+_PCA_BLOCK = 64
+
+
+class Projection:
+    name = "base"
+
+    def __init__(self, dim_in: int = EMBED_DIM_IN, dim_out: int = EMBED_DIM_OUT):
+        if dim_out > dim_in:
+            raise ValueError(f"cannot project {dim_in} → {dim_out}")
+        self.dim_in = dim_in
+        self.dim_out = dim_out
+
+    def __call__(self, batch) -> np.ndarray:
+        arr = np.asarray(batch, dtype=np.float32)
+        if arr.ndim != 2 or arr.shape[1] != self.dim_in:
+            raise ValueError(
+                f"{self.name} projection expects (n, {self.dim_in}) embeddings, got {arr.shape}"
+            )
+        return self._project(arr).astype(np.float16)
+
+    def one(self, vec) -> np.ndarray:
+        return self(np.asarray(vec, dtype=np.float32)[None, :])[0]
+
+    def _project(self, arr: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+
+class MeanPool(Projection):
+    """Average consecutive blocks of ``dim_in // dim_out`` floats."""
+
+    name = "mean"
+
+    def __init__(self, dim_in: int = EMBED_DIM_IN, dim_out: int = EMBED_DIM_OUT):
+        super().__init__(dim_in, dim_out)
+        if dim_in % dim_out:
+            raise ValueError(f"mean pooling needs dim_in divisible by dim_out ({dim_in}, {dim_out})")
+
+    def _project(self, arr):
+        return arr.reshape(len(arr), self.dim_out, self.dim_in // self.dim_out).mean(axis=2)
+
+
+class Truncate(Projection):
+    """Keep the first ``dim_out`` components (text-embedding-3 is Matryoshka-trained)."""
+
+    name = "truncate"
+
+    def _project(self, arr):
+        return arr[:, : self.dim_out]
+
+
+class PCA(Projection):
+    """``(x - mean) @ components.T`` with a ``(dim_out, dim_in)`` component matrix."""
+
+    name = "pca"
+
+    def __init__(self, components: np.ndarray, mean: Optional[np.ndarray] = None):
+        components = np.ascontiguousarray(components, dtype=np.float32)
+        if components.ndim != 2:
+            raise ValueError(f"PCA components must be 2-D, got {components.shape}")
+        super().__init__(components.shape[1], components.shape[0])
+        if mean is not None:
+            mean = np.asarray(mean, dtype=np.float32)
+            if mean.shape != (self.dim_in,):
+                raise ValueError(f"PCA mean must have shape ({self.dim_in},), got {mean.shape}")
+        self.components_t = np.ascontiguousarray(components.T)
+        self.mean = mean
+
+    def _project(self, arr):
+        if self.mean is not None:
+            arr = arr - self.mean
+        # BLAS picks different kernels (and summation orders) for different
+        # shapes, so multiply in fixed-height blocks: a row then projects the
+        # same whether it arrives alone or inside a large batch.
+        n = len(arr)
+        padded = np.zeros((-(-n // _PCA_BLOCK) * _PCA_BLOCK, self.dim_in), dtype=np.float32)
+        padded[:n] = arr
+        out = np.empty((len(padded), self.dim_out), dtype=np.float32)
+        for i in range(0, len(padded), _PCA_BLOCK):
+            np.matmul(padded[i : i + _PCA_BLOCK], self.components_t, out=out[i : i + _PCA_BLOCK])
+        return out[:n]
+
+    @classmethod
+    def from_file(cls, path: str) -> "PCA":
+        """Load ``.npy`` (components), ``.npz`` (components[, mean]) or ``.json``.
+
+        The JSON form is the 256×768 row-major matrix ``jobs/favorites_builder.ts``
+        reads from ``PCA_MATRIX_URL``.
+        """
+        if path.endswith(".npz"):
+            with np.load(path) as data:
+                return cls(data["components"], data["mean"] if "mean" in data else None)
+        if path.endswith(".json"):
+            with open(path) as f:
+                return cls(np.array(json.load(f), dtype=np.float32))
+        return cls(np.load(path))
+
+
+def build_projection(kind: str, pca_path: Optional[str] = None) -> Projection:
+    if kind == "mean":
+        return MeanPool()
+    if kind == "truncate":
+        return Truncate()
+    if kind == "pca":
+        if not pca_path:
+            raise ValueError("EMBED_PCA_MATRIX is required for the pca projection")
+        proj = PCA.from_file(pca_path)
+        if (proj.dim_in, proj.dim_out) != (EMBED_DIM_IN, EMBED_DIM_OUT):
+            raise ValueError(
+                f"PCA matrix is {proj.dim_in}→{proj.dim_out}, expected {EMBED_DIM_IN}→{EMBED_DIM_OUT}"
+            )
+        return proj
+    raise ValueError(f"unknown projection {kind!r}")
+
+
+@lru_cache(maxsize=1)
+def get_projection() -> Projection:
+    """Projection selected by ``EMBED_PROJECTION``; built once per process."""
+    return build_projection(
+        os.getenv("EMBED_PROJECTION", "mean"), os.getenv("EMBED_PCA_MATRIX")
+    )
@@ -7,12 +7,25 @@ from typing import Any, List
 import asyncpg
 import numpy as np
 import openai
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pydantic import BaseModel
 
+from api._embedding import metrics
+from api._embedding.cache import EmbeddingCache
+from api._embedding.metrics import phase
+from api._embedding.projection import EMBED_DIM_IN, get_projection
 
 
 app = FastAPI()
+cache = EmbeddingCache.from_env()
+
+
+@app.on_event("startup")
+def configure_logging():
+    metrics.configure_request_log()
+
+
 class EmbedRequest(BaseModel):
     mediaId: str     
 
@@ -43,16 +56,36 @@ def remaining_budget() -> float:
 #     return down.tolist()
 
 
+async def create_embeddings(texts: List[str]) -> np.ndarray:
+    try:
+        with phase("provider"):
+            resp = await asyncio.to_thread(
+                openai.embeddings.create,
+                input=texts,
+                model="text-embedding-3-large",
+                dimensions=EMBED_DIM_IN,
+            )
+    except Exception as err:
+        metrics.embed_provider_errors_total.inc()
+        metrics.log.warning(json.dumps({"event": "provider_error", "texts": len(texts), "error": str(err)}))
+        raise
+    # project the whole batch at once (768 → 256, see EMBED_PROJECTION)
+    raw = np.array([d.embedding for d in sorted(resp.data, key=lambda d: d.index)], dtype=np.float32)
+    return get_projection()(raw)
+
+
 async def create_embedding(text: str) -> List[float]:
-    resp = await asyncio.to_thread(
-        openai.embeddings.create,
-        input=[text],
-        model="text-embedding-3-large",
+    return (await create_embeddings([text]))[0].tolist()
+
+
+def compose_text(row) -> str:
+    return " ".join(
+        filter(None, [
+            row["title"],
+            row["description"] or "",
+            " ".join((row["tags"] or [])[:3]),
+        ])
     )
-    # down-sample 768 → 256 (mean-pool every 3 floats)
-    vec = resp.data[0].embedding
-    arr = np.array(vec, dtype=np.float32).reshape(256, 3)
-    return arr.mean(axis=1).astype(np.float16).tolist()
 
 # class EmbedRequest(BaseModel):
 #     mediaId: str
@@ -61,46 +94,63 @@ async def create_embedding(text: str) -> List[float]:
 @app.post("/")                          
 async def handle(req: EmbedRequest) -> Any:
     media_id = req.mediaId
-    conn = await db()
+
+    # read-through: hot media never reach Postgres
+    hit = await cache.get(media_id)
+    if hit is not None:
+        metrics.embed_cache_hits_total.labels("cache").inc()
+        return {"embedding": hit.tolist(), "cached": True}
+
+    with phase("acquire"):
+        conn = await get_db()
     try:
-        row = await conn.fetchrow("""
-            SELECT title, description, tags, embedding
-            FROM canonical_media
-            WHERE id = $1
-        """, media_id)
+        with phase("fetch"):
+            row = await conn.fetchrow("""
+                SELECT title, description, tags, embedding
+                FROM canonical_media
+                WHERE id = $1
+            """, media_id)
 
         if not row:
             raise HTTPException(status_code=404, detail="media not found")
 
         # cache hit
         if row["embedding"]:
+            metrics.embed_cache_hits_total.labels("postgres").inc()
+            await cache.set(media_id, row["embedding"])
             return {"embedding": row["embedding"], "cached": True}
 
+        metrics.embed_cache_misses_total.inc()
         if float(os.getenv("OPENAI_BUDGET_REMAINING", "10")) < 5.0:
+            metrics.embed_budget_rejections_total.inc()
             raise HTTPException(status_code=507, detail="budget exhausted")
 
-        text = " ".join(
-            filter(None, [
-                row["title"],
-                row["description"] or "",
-                " ".join((row["tags"] or [])[:3]),
-            ])
-        )
+        with phase("compose"):
+            text = compose_text(row)
 
         t0 = time.perf_counter()
         vec = await create_embedding(text)
         latency_ms = int((time.perf_counter() - t0) * 1000)
 
-        await conn.execute("""
-            UPDATE canonical_media SET embedding = $1 WHERE id = $2
-        """, vec, media_id)
+        await cache.invalidate(media_id)
+        with phase("update"):
+            await conn.execute("""
+                UPDATE canonical_media SET embedding = $1 WHERE id = $2
+            """, vec, media_id)
+        await cache.set(media_id, vec)
 
-        print(json.dumps({"mediaId": media_id, "latency_ms": latency_ms}))
+        metrics.log_sampled("embedded", mediaId=media_id, latency_ms=latency_ms)
         return {"embedding": vec, "cached": False}
 
     finally:
         await conn.close()
 
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 # --- health probe -----------------------------------------------------------
 @app.get("/healthz")
 async def health():
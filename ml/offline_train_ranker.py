@@ -75,10 +75,14 @@ def main():
     os.makedirs(args.output, exist_ok=True)
     today = date.today().isoformat()
     model_path = os.path.join(args.output, f"ranker_v{today}.txt")
-    model.save_model(model_path)
     fmap_path = os.path.join(args.output, "feature_map.json")
-    with open(fmap_path, "w") as f:
+    # running rankers watch this directory: publish the feature map first and
+    # each file with an atomic rename so a half-written model is never seen
+    with open(fmap_path + ".tmp", "w") as f:
         json.dump(feature_map, f)
+    os.replace(fmap_path + ".tmp", fmap_path)
+    model.save_model(model_path + ".tmp")
+    os.replace(model_path + ".tmp", model_path)
 
     mlflow.set_experiment("DiscoveryRanker")
     with mlflow.start_run() as run:
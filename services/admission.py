@@ -0,0 +1,391 @@
+"""Admission control shared by the ranker and embedding services.
+
+Without a bound, a traffic spike piles requests into gRPC's executor queue
+or the event loop; every request waits behind all earlier ones, latency
+grows without limit and the pod is eventually OOM-killed. An
+``AdmissionController`` sits in front of the handlers instead:
+
+* at most ``limit`` requests execute at once;
+* up to ``max_queue`` more wait, first come first served, for a slot;
+* a request is rejected straight away when the queue is full or when its
+  estimated wait - ``(queued + 1) / limit`` service times, by Little's law -
+  exceeds ``target_wait_ms``, and after ``target_wait_ms`` if it is still
+  queued. Rejections are cheap, so the caller can retry elsewhere while the
+  requests already admitted keep their latency.
+
+With ``adaptive`` on, ``limit`` follows observed latency (the gradient
+approach of Netflix's concurrency-limits): a slow-moving baseline of service
+time is compared with a fast one, the limit shrinks when the fast one rises
+above ``tolerance`` times the baseline - the server is queueing internally -
+and grows by about ``sqrt(limit)`` while latency holds, always between
+``min_limit`` and ``max_limit``.
+
+Rejections surface as ``RESOURCE_EXHAUSTED`` with ``retry-after-ms``
+trailing metadata for gRPC (``GrpcAdmissionInterceptor``) and as 503 with a
+``Retry-After`` header for HTTP (``AdmissionMiddleware``). Settings come
+from ``<PREFIX>_ADMISSION_*`` variables, see ``AdmissionController.from_env``.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterable, Optional
+
+import grpc
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram
+except ImportError:  # metrics are optional for services without prometheus
+    Counter = Gauge = Histogram = None
+
+QUEUE_FULL = "queue_full"
+WAIT_TOO_LONG = "wait_too_long"
+TIMEOUT = "timeout"
+
+RETRY_AFTER_KEY = "retry-after-ms"
+
+if Counter is not None:
+    admission_limit = Gauge("admission_limit", "Current admission concurrency limit", ["name"])
+    admission_in_flight = Gauge("admission_in_flight", "Requests executing past admission", ["name"])
+    admission_queued = Gauge("admission_queued", "Requests waiting for admission", ["name"])
+    admission_rejected_total = Counter(
+        "admission_rejected_total", "Requests rejected by admission control", ["name", "reason"]
+    )
+    admission_wait_ms = Histogram(
+        "admission_wait_ms", "Time admitted requests waited in the queue in ms", ["name"],
+        buckets=(0.1, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000),
+    )
+
+
+class Overloaded(Exception):
+    """Raised by ``acquire`` when a request is shed."""
+
+    def __init__(self, reason: str, retry_after_s: float):
+        super().__init__(f"overloaded ({reason}); retry after {retry_after_s:.3f}s")
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+
+class _Waiter:
+    __slots__ = ("event", "loop", "future", "granted")
+
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.event = threading.Event() if loop is None else None
+        self.granted = False
+
+    def grant(self) -> None:
+        self.granted = True
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        name: str,
+        limit: int = 16,
+        min_limit: int = 1,
+        max_limit: int = 256,
+        max_queue: int = 32,
+        target_wait_ms: float = 50.0,
+        adaptive: bool = True,
+        tolerance: float = 1.5,
+        smoothing: float = 0.2,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not 1 <= min_limit <= limit <= max_limit:
+            raise ValueError("admission limits must satisfy 1 <= min_limit <= limit <= max_limit")
+        self.name = name
+        self.limit = float(limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.target_wait_s = target_wait_ms / 1000
+        self.adaptive = adaptive
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.clock = clock
+        self.in_flight = 0
+        # EWMAs of service time in seconds: fast for the gradient and the
+        # wait estimate, slow as the no-queueing baseline
+        self.short_s: Optional[float] = None
+        self.long_s: Optional[float] = None
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+        if Counter is not None:
+            self._limit_gauge = admission_limit.labels(name)
+            self._in_flight_gauge = admission_in_flight.labels(name)
+            self._queued_gauge = admission_queued.labels(name)
+            self._wait = admission_wait_ms.labels(name)
+            self._limit_gauge.set(limit)
+
+    @classmethod
+    def from_env(cls, name: str, prefix: str, **defaults) -> Optional["AdmissionController"]:
+        """Settings from ``<prefix>_ADMISSION_*``; ``<prefix>_ADMISSION_LIMIT=0`` disables.
+
+        ``LIMIT`` (initial), ``MIN_LIMIT``, ``MAX_LIMIT``, ``MAX_QUEUE``,
+        ``TARGET_WAIT_MS`` and ``ADAPTIVE`` (1/0); ``defaults`` are the
+        service's own defaults for the same keyword arguments.
+        """
+        def env(key, cast, default):
+            value = os.getenv(f"{prefix}_ADMISSION_{key.upper()}")
+            return cast(value) if value is not None else defaults.get(key, default)
+
+        limit = env("limit", int, 16)
+        if limit <= 0:
+            return None
+        max_limit = env("max_limit", int, max(256, limit))
+        return cls(
+            name,
+            limit=limit,
+            min_limit=min(env("min_limit", int, 1), limit),
+            max_limit=max(max_limit, limit),
+            max_queue=env("max_queue", int, 32),
+            target_wait_ms=env("target_wait_ms", float, 50.0),
+            adaptive=env("adaptive", lambda v: v == "1", True),
+        )
+
+    # -- admission -----------------------------------------------------------
+
+    def _estimated_wait_s(self, position: int) -> float:
+        service = self.short_s if self.short_s is not None else 0.0
+        return position * service / max(self.limit, 1.0)
+
+    def _try_admit(self, loop=None, max_wait_s: Optional[float] = None):
+        """Under the lock: a start time if admitted now, else a queued waiter; raises if shed."""
+        if self.in_flight < int(self.limit) and not self._queue:
+            self.in_flight += 1
+            return self.clock(), None
+        wait_s = self._estimated_wait_s(len(self._queue) + 1)
+        budget = self.target_wait_s if max_wait_s is None else min(self.target_wait_s, max_wait_s)
+        if len(self._queue) >= self.max_queue:
+            raise self._reject(QUEUE_FULL, wait_s)
+        if wait_s > budget:
+            raise self._reject(WAIT_TOO_LONG, wait_s)
+        waiter = _Waiter(loop)
+        self._queue.append(waiter)
+        return self.clock(), waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Under the lock: take a timed-out waiter off the queue; False if it was granted meanwhile."""
+        if waiter.granted:
+            return False
+        self._queue.remove(waiter)
+        return True
+
+    def _reject(self, reason: str, wait_s: float) -> Overloaded:
+        if Counter is not None:
+            admission_rejected_total.labels(self.name, reason).inc()
+        return Overloaded(reason, max(wait_s, self.target_wait_s))
+
+    def _admitted(self, queued_at: float) -> float:
+        now = self.clock()
+        if Counter is not None:
+            self._wait.observe((now - queued_at) * 1000)
+            self._in_flight_gauge.set(self.in_flight)
+            self._queued_gauge.set(len(self._queue))
+        return now
+
+    def acquire(self, max_wait_s: Optional[float] = None) -> float:
+        """Block until admitted and return a ticket for ``release``; raises ``Overloaded``.
+
+        ``max_wait_s`` caps the wait below ``target_wait_ms``, e.g. at the
+        caller's deadline.
+        """
+        with self._lock:
+            queued_at, waiter = self._try_admit(max_wait_s=max_wait_s)
+        if waiter is not None:
+            budget = self.target_wait_s if max_wait_s is None else min(self.target_wait_s, max_wait_s)
+            if not waiter.event.wait(max(budget, 0.0)):
+                with self._lock:
+                    if self._abandon(waiter):
+                        raise self._reject(TIMEOUT, self._estimated_wait_s(len(self._queue) + 1))
+        return self._admitted(queued_at)
+
+    async def acquire_async(self, max_wait_s: Optional[float] = None) -> float:
+        """``acquire`` for coroutines: waits without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            queued_at, waiter = self._try_admit(loop, max_wait_s)
+        if waiter is not None:
+            budget = self.target_wait_s if max_wait_s is None else min(self.target_wait_s, max_wait_s)
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), max(budget, 0.0))
+            except asyncio.TimeoutError:
+                with self._lock:
+                    if self._abandon(waiter):
+                        raise self._reject(TIMEOUT, self._estimated_wait_s(len(self._queue) + 1))
+            except BaseException:
+                # cancelled while queued (client gone, shutdown): leave the queue,
+                # or hand back the slot if it was granted meanwhile
+                with self._lock:
+                    granted = not self._abandon(waiter)
+                if granted:
+                    self.release(queued_at, ok=False)
+                raise
+        return self._admitted(queued_at)
+
+    def release(self, ticket: float, ok: bool = True) -> None:
+        """Free the slot taken by ``acquire``; successful calls feed the latency estimate."""
+        elapsed = self.clock() - ticket
+        with self._lock:
+            if ok:
+                self._observe(elapsed)
+            self.in_flight -= 1
+            # hand freed slots straight to the oldest waiters, so a new
+            # arrival cannot overtake the queue
+            while self._queue and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                self._queue.popleft().grant()
+            in_flight, queued = self.in_flight, len(self._queue)
+        if Counter is not None:
+            self._in_flight_gauge.set(in_flight)
+            self._queued_gauge.set(queued)
+            self._limit_gauge.set(int(self.limit))
+
+    def _observe(self, elapsed_s: float) -> None:
+        if self.short_s is None:
+            self.short_s = self.long_s = elapsed_s
+            return
+        self.short_s += 0.1 * (elapsed_s - self.short_s)
+        self.long_s += 0.002 * (elapsed_s - self.long_s)
+        if self.long_s > 2 * self.short_s:
+            # latency dropped for good (e.g. a warm cache): let the baseline follow
+            self.long_s *= 0.95
+        if not self.adaptive:
+            return
+        if self.in_flight < self.limit / 2:
+            # the limit is not what holds latency down; leave it alone
+            return
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_s / self.short_s))
+        target = gradient * self.limit + math.sqrt(self.limit)
+        limit = (1 - self.smoothing) * self.limit + self.smoothing * target
+        self.limit = max(float(self.min_limit), min(float(self.max_limit), limit))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "queued": len(self._queue),
+                "service_ms": None if self.short_s is None else self.short_s * 1000,
+            }
+
+
+# -- gRPC --------------------------------------------------------------------
+
+
+class GrpcAdmissionInterceptor(grpc.ServerInterceptor):
+    """Admits unary and client-streaming calls to ``methods`` (all when None).
+
+    Shed calls end with ``RESOURCE_EXHAUSTED`` and ``retry-after-ms`` in the
+    trailing metadata. The wait never outlasts the caller's deadline.
+    Requests beyond the server's thread pool never reach an interceptor, so
+    size the server with ``grpc_server_limits`` to bound that queue too.
+    """
+
+    def __init__(self, controller: AdmissionController, methods: Optional[Iterable[str]] = None):
+        self.controller = controller
+        self.methods = set(methods) if methods is not None else None
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None or (self.methods is not None and handler_call_details.method not in self.methods):
+            return handler
+        if handler.unary_unary is not None:
+            return grpc.unary_unary_rpc_method_handler(
+                self._wrap(handler.unary_unary),
+                request_deserializer=handler.request_deserializer,
+                response_serializer=handler.response_serializer,
+            )
+        if handler.stream_unary is not None:
+            return grpc.stream_unary_rpc_method_handler(
+                self._wrap(handler.stream_unary),
+                request_deserializer=handler.request_deserializer,
+                response_serializer=handler.response_serializer,
+            )
+        return handler
+
+    def _wrap(self, behavior):
+        controller = self.controller
+
+        def admitted(request, context):
+            remaining = context.time_remaining()
+            try:
+                ticket = controller.acquire(remaining if remaining is not None and remaining < 1e6 else None)
+            except Overloaded as err:
+                context.set_trailing_metadata(((RETRY_AFTER_KEY, str(int(err.retry_after_s * 1000))),))
+                context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(err))
+            ok = False
+            try:
+                response = behavior(request, context)
+                ok = True
+                return response
+            finally:
+                controller.release(ticket, ok)
+
+        return admitted
+
+
+def grpc_server_limits(controller: Optional[AdmissionController], workers: int):
+    """``(max_workers, maximum_concurrent_rpcs)`` for ``grpc.server``.
+
+    Every admitted or queued call holds an executor thread, so the pool
+    gets room for ``max_limit + max_queue`` of them, and gRPC itself answers
+    ``RESOURCE_EXHAUSTED`` to anything beyond instead of queueing it
+    unboundedly in the executor. Without a controller nothing changes.
+    """
+    if controller is None:
+        return workers, None
+    threads = max(workers, controller.max_limit + controller.max_queue)
+    return threads, threads
+
+
+# -- HTTP --------------------------------------------------------------------
+
+
+class AdmissionMiddleware:
+    """ASGI middleware: 503 with ``Retry-After`` when ``controller`` sheds a request.
+
+    ``exclude`` paths (health checks, metrics) bypass admission so a busy
+    pod is not restarted or blinded for being busy.
+    """
+
+    def __init__(self, app, controller: AdmissionController, exclude: Iterable[str] = ("/healthz", "/health", "/metrics")):
+        self.app = app
+        self.controller = controller
+        self.exclude = set(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+        try:
+            ticket = await self.controller.acquire_async()
+        except Overloaded as err:
+            from starlette.responses import JSONResponse
+
+            response = JSONResponse(
+                {"detail": "overloaded", "reason": err.reason},
+                status_code=503,
+                headers={"Retry-After": str(max(1, math.ceil(err.retry_after_s)))},
+            )
+            await response(scope, receive, send)
+            return
+        ok = False
+        try:
+            await self.app(scope, receive, send)
+            ok = True
+        finally:
+            self.controller.release(ticket, ok)
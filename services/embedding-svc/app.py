@@ -1,5 +1,7 @@
 import json
 import hashlib
+import os
+import sys
 from typing import List
 
 import numpy as np
@@ -11,6 +13,16 @@ from concurrent import futures
 import embedding_pb2
 import embedding_pb2_grpc
 
+try:
+    from services.admission import (
+        AdmissionController, AdmissionMiddleware, GrpcAdmissionInterceptor, grpc_server_limits,
+    )
+except ImportError:  # ``python app.py`` from this directory in a repo checkout
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    from services.admission import (
+        AdmissionController, AdmissionMiddleware, GrpcAdmissionInterceptor, grpc_server_limits,
+    )
+
 # Dummy user interests lookup
 USER_INTERESTS = {
     "1": ["music", "ai", "sports"],
@@ -37,6 +49,13 @@ def embed_user(user_id: str) -> List[float]:
 
 
 app = FastAPI()
+# EMBEDDING_ADMISSION_* tunes it; EMBEDDING_ADMISSION_LIMIT=0 turns it off.
+# HTTP and gRPC share the limit: both run embed_user on the same CPU.
+admission = AdmissionController.from_env(
+    "embedding-svc", "EMBEDDING", limit=8, max_limit=32, max_queue=32, target_wait_ms=100.0
+)
+if admission is not None:
+    app.add_middleware(AdmissionMiddleware, controller=admission)
 
 
 @app.get("/embed")
@@ -69,7 +88,12 @@ class EmbedderServicer(embedding_pb2_grpc.EmbedderServicer):
 
 
 def serve_grpc():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    threads, max_rpcs = grpc_server_limits(admission, 2)
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=threads),
+        interceptors=[GrpcAdmissionInterceptor(admission)] if admission is not None else None,
+        maximum_concurrent_rpcs=max_rpcs,
+    )
     embedding_pb2_grpc.add_EmbedderServicer_to_server(EmbedderServicer(), server)
     server.add_insecure_port("[::]:50051")
     server.start()
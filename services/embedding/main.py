@@ -3,9 +3,17 @@ from pydantic import BaseModel, UUID4
 from typing import List
 import numpy as np
 
+from services.admission import AdmissionController, AdmissionMiddleware
+
 from . import model
 
 app = FastAPI()
+# EMBEDDING_ADMISSION_* tunes it; EMBEDDING_ADMISSION_LIMIT=0 turns it off
+admission = AdmissionController.from_env(
+    "embedding", "EMBEDDING", limit=8, max_limit=32, max_queue=32, target_wait_ms=100.0
+)
+if admission is not None:
+    app.add_middleware(AdmissionMiddleware, controller=admission)
 
 
 class EmbedRequest(BaseModel):
@@ -0,0 +1,77 @@
+"""Import time and per-explanation latency of the explainer backends.
+
+    python -m services.explainer.bench
+    python -m services.explainer.bench --synthetic --batch 1 16 256
+
+Import time is measured in a fresh interpreter per backend (``import`` of
+the explainer module plus whatever the backend pulls in, e.g. ``shap``) and
+load time as building an ``Explainer``. Latency is the median over
+``--repeat`` calls of ``Explainer.contributions`` on a ``--batch`` row
+matrix, divided per explanation. ``--synthetic`` uses the ranker's
+production-shape benchmark model (300 trees of 255 leaves) instead of
+``services/explainer/model.txt``.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from services.explainer.explainer import BACKENDS, FMAP_PATH, MODEL_PATH, Explainer
+
+IMPORT_SNIPPET = """
+import time
+t0 = time.perf_counter()
+from services.explainer.explainer import BACKENDS
+{extra}
+print(time.perf_counter() - t0)
+"""
+
+
+def import_seconds(backend: str) -> float:
+    extra = "import shap" if backend == "shap" else ""
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(extra=extra)],
+        capture_output=True, text=True, check=True, cwd=os.getcwd(),
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", nargs="+", default=sorted(BACKENDS))
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 16, 256])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--synthetic", action="store_true")
+    args = parser.parse_args()
+
+    model_path, fmap_path = MODEL_PATH, FMAP_PATH
+    if args.synthetic:
+        from services.ranker.bench.synthetic import synthetic_model
+
+        model_path = synthetic_model()
+        fmap_path = os.path.join(os.path.dirname(model_path), "feature_map.json")
+
+    rng = np.random.default_rng(0)
+    for backend in args.backend:
+        row = {"backend": backend, "import_s": round(import_seconds(backend), 3)}
+        t0 = time.perf_counter()
+        explainer = Explainer(model_path, fmap_path, backend)
+        row["load_s"] = round(time.perf_counter() - t0, 3)
+        for batch in args.batch:
+            X = rng.standard_normal((batch, len(explainer.names)))
+            explainer.contributions(X)  # warm-up
+            times = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                explainer.contributions(X)
+                times.append(time.perf_counter() - t0)
+            row[f"ms_per_explanation@{batch}"] = round(float(np.median(times)) * 1000 / batch, 4)
+        print(json.dumps(row), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Cache of SHAP contributions.
+
+Contributions depend only on the model and the feature row, and people open
+the explanation for the same recommendation over and over, so they are
+memoized under a digest of the model file's SHA-256 and the feature row
+quantized to ``EXPLAINER_CACHE_QUANTUM`` (NaN kept distinct). Rows closer
+than the quantum share an entry; keep it well below the resolution the
+features are computed at.
+
+The in-process tier is an LRU of ``EXPLAINER_CACHE_MAX_ENTRIES`` rows (0
+disables the cache). With ``EXPLAINER_CACHE_REDIS_URL`` a Redis tier behind
+it is shared by all replicas; its entries expire after
+``EXPLAINER_CACHE_REDIS_TTL_S``. Redis errors never fail a request: reads
+fall back to the in-process tier and writes are skipped, counted in
+``explain_cache_redis_errors_total``. A new model has a new hash, so entries of
+the old one are simply never hit again; the service also clears the
+in-process tier when it swaps models.
+
+Hit rate: ``sum(rate(explain_cache_hits_total[5m])) /
+(sum(rate(explain_cache_hits_total[5m])) + rate(explain_cache_misses_total[5m]))``.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+try:
+    from redis.exceptions import RedisError
+except ImportError:  # the Redis tier is optional
+    RedisError = OSError
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = "explain:"
+
+explain_cache_hits_total = Counter("explain_cache_hits_total", "Explanations served from the cache", ["tier"])
+explain_cache_misses_total = Counter("explain_cache_misses_total", "Explanations computed because no tier had them")
+explain_cache_entries = Gauge("explain_cache_entries", "Explanations held in the in-process cache")
+explain_cache_redis_errors_total = Counter(
+    "explain_cache_redis_errors_total", "Redis tier calls that failed and were skipped", ["op"]
+)
+_memory_hits = explain_cache_hits_total.labels("memory")
+_redis_hits = explain_cache_hits_total.labels("redis")
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ExplanationCache:
+    def __init__(self, max_entries: int = 100_000, quantum: float = 1e-6, redis=None, redis_ttl_s: int = 86_400):
+        self.max_entries = max_entries
+        self.quantum = quantum
+        self.redis = redis
+        self.redis_ttl_s = redis_ttl_s
+        self._data: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["ExplanationCache"]:
+        max_entries = int(os.getenv("EXPLAINER_CACHE_MAX_ENTRIES", "100000"))
+        if max_entries <= 0:
+            return None
+        redis = None
+        url = os.getenv("EXPLAINER_CACHE_REDIS_URL")
+        if url:
+            import redis as redis_lib
+
+            redis = redis_lib.Redis.from_url(url)
+        return cls(
+            max_entries,
+            float(os.getenv("EXPLAINER_CACHE_QUANTUM", "1e-6")),
+            redis,
+            int(os.getenv("EXPLAINER_CACHE_REDIS_TTL_S", "86400")),
+        )
+
+    def keys(self, model_hash: str, X: np.ndarray) -> List[bytes]:
+        """One key per row of ``X``: model hash + quantized row."""
+        X = np.asarray(X, dtype=np.float64)
+        q = np.clip(np.round(X / self.quantum), -(2.0**62), 2.0**62)
+        # NaN (missing) must not collide with any real value
+        q = np.where(np.isnan(X), np.iinfo(np.int64).min, q).astype(np.int64)
+        prefix = model_hash.encode()
+        return [hashlib.blake2b(prefix + row.tobytes(), digest_size=16).digest() for row in q]
+
+    def get(self, keys: Sequence[bytes], width: int) -> Tuple[np.ndarray, np.ndarray]:
+        """``(rows, miss_idx)``; rows at ``miss_idx`` are uninitialised."""
+        out = np.empty((len(keys), width), dtype=np.float64)
+        miss = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                row = self._data.get(key)
+                if row is None:
+                    miss.append(i)
+                    continue
+                self._data.move_to_end(key)
+                out[i] = row
+        _memory_hits.inc(len(keys) - len(miss))
+        found = None
+        if miss and self.redis is not None:
+            try:
+                found = self.redis.mget([KEY_PREFIX + keys[i].hex() for i in miss])
+            except RedisError as err:
+                # the cache must never fail a request; treat the tier as a miss
+                explain_cache_redis_errors_total.labels("get").inc()
+                log.warning("explanation cache: Redis read failed: %s", err)
+        if found is not None:
+            still = []
+            promoted = []
+            for i, raw in zip(miss, found):
+                if raw is None or len(raw) != 8 * width:
+                    still.append(i)
+                    continue
+                out[i] = np.frombuffer(raw, dtype=np.float64)
+                promoted.append(i)
+            _redis_hits.inc(len(promoted))
+            self._remember([keys[i] for i in promoted], out[promoted])
+            miss = still
+        explain_cache_misses_total.inc(len(miss))
+        return out, np.asarray(miss, dtype=np.intp)
+
+    def put(self, keys: Sequence[bytes], rows: np.ndarray) -> None:
+        if not len(keys):
+            return
+        rows = np.asarray(rows, dtype=np.float64)
+        self._remember(keys, rows)
+        if self.redis is not None:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, row in zip(keys, rows):
+                pipe.set(KEY_PREFIX + key.hex(), row.tobytes(), ex=self.redis_ttl_s)
+            try:
+                pipe.execute()
+            except RedisError as err:
+                explain_cache_redis_errors_total.labels("put").inc()
+                log.warning("explanation cache: Redis write failed: %s", err)
+
+    def _remember(self, keys: Sequence[bytes], rows: np.ndarray) -> None:
+        with self._lock:
+            for key, row in zip(keys, rows):
+                self._data[key] = row.copy()
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            explain_cache_entries.set(len(self._data))
+
+    def clear(self) -> None:
+        """Drop the in-process tier; Redis entries die with their model hash."""
+        with self._lock:
+            self._data.clear()
+            explain_cache_entries.set(0)
+
+    def __len__(self) -> int:
+        return len(self._data)
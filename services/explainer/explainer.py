@@ -0,0 +1,134 @@
+"""SHAP explanations for ranker (viewer, target) pairs.
+
+``Explainer`` loads ``model.txt`` and ``feature_map.json`` once and explains
+batches: pairs are grouped by viewer so each viewer costs one
+``fetch_features`` call, the rows of all groups are stacked into one matrix
+and SHAP runs once over it. Contributions come back keyed by the
+``feature_map.json`` names, with the model's expected output as
+``base_value``; ``base_value`` plus the contributions is the raw (log-odds)
+score of the pair.
+
+Two backends compute the same tree-path-dependent TreeSHAP values
+(``EXPLAINER_BACKEND``):
+
+* ``native`` (default) - LightGBM's own ``predict(pred_contrib=True)``;
+  nothing beyond lightgbm to import and multi-threaded C++ per batch
+* ``shap``             - the ``shap`` package's ``TreeExplainer``; slow to
+  import, kept for comparison and for its plotting tools
+"""
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import lightgbm as lgb
+import numpy as np
+
+from services.ranker.feature_fetcher import feature_names, fetch_features
+
+from .cache import ExplanationCache, file_sha256
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(HERE, "model.txt")
+FMAP_PATH = os.path.join(HERE, "feature_map.json")
+
+
+class NativeBackend:
+    name = "native"
+
+    def __init__(self, booster: lgb.Booster, num_threads: int = 0):
+        self.booster = booster
+        # 0 lets LightGBM use every core; pool workers pass 1
+        self.params = {"num_threads": num_threads} if num_threads > 0 else {}
+        # the bias column is the expected raw score, the same for every row
+        self.base_value = float(self.booster.predict(np.zeros((1, booster.num_feature())), pred_contrib=True)[0, -1])
+
+    def contributions(self, X: np.ndarray) -> np.ndarray:
+        return np.asarray(self.booster.predict(X, pred_contrib=True, **self.params), dtype=np.float64)[:, :-1]
+
+
+class ShapBackend:
+    name = "shap"
+
+    def __init__(self, booster: lgb.Booster):
+        import shap
+
+        self.tree_explainer = shap.TreeExplainer(booster, feature_perturbation="tree_path_dependent")
+        self.base_value = float(np.ravel(self.tree_explainer.expected_value)[-1])
+
+    def contributions(self, X: np.ndarray) -> np.ndarray:
+        values = self.tree_explainer.shap_values(X)
+        if isinstance(values, list):  # older shap: one array per class
+            values = values[-1]
+        return np.asarray(values, dtype=np.float64)
+
+
+BACKENDS = {b.name: b for b in (NativeBackend, ShapBackend)}
+
+
+class Explainer:
+    """Explains pairs with one model; with a ``cache``, rows explained before are not recomputed."""
+
+    def __init__(
+        self,
+        model_path: str = MODEL_PATH,
+        feature_map_path: str = FMAP_PATH,
+        backend: str = "native",
+        cache: Optional[ExplanationCache] = None,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown explainer backend {backend!r}; expected one of {sorted(BACKENDS)}")
+        self.model_path = model_path
+        self.feature_map_path = feature_map_path
+        self.cache = cache
+        # hashed before loading, so a file replaced in between is not cached under the old hash
+        self.model_hash = file_sha256(model_path)
+        self.booster = lgb.Booster(model_file=model_path)
+        with open(feature_map_path) as f:
+            self.feature_map: Dict[str, int] = json.load(f)
+        self.names = feature_names(self.feature_map)
+        if len(self.names) != self.booster.num_feature():
+            raise ValueError(
+                f"{feature_map_path} names {len(self.names)} features, "
+                f"{model_path} takes {self.booster.num_feature()}"
+            )
+        self.backend = BACKENDS[backend](self.booster)
+        self.base_value = self.backend.base_value
+
+    @classmethod
+    def from_env(cls, cache: Optional[ExplanationCache] = None) -> "Explainer":
+        return cls(
+            os.getenv("EXPLAINER_MODEL_PATH", MODEL_PATH),
+            os.getenv("EXPLAINER_FEATURE_MAP", FMAP_PATH),
+            os.getenv("EXPLAINER_BACKEND", "native"),
+            cache,
+        )
+
+    def contributions(self, X: np.ndarray) -> np.ndarray:
+        """``(rows, features)`` SHAP values, one vectorized call."""
+        return self.backend.contributions(np.asarray(X, dtype=np.float64))
+
+    def features(self, pairs: Sequence[Tuple[str, str]]) -> np.ndarray:
+        """Feature rows for ``pairs`` in order, with one fetch per distinct viewer."""
+        by_viewer: "OrderedDict[str, List[int]]" = OrderedDict()
+        for i, (viewer, _) in enumerate(pairs):
+            by_viewer.setdefault(viewer, []).append(i)
+        X = np.empty((len(pairs), len(self.names)), dtype=np.float64)
+        for viewer, idx in by_viewer.items():
+            X[idx] = fetch_features(viewer, [pairs[i][1] for i in idx])
+        return X
+
+    def explain(self, pairs: Sequence[Tuple[str, str]]) -> List[Dict[str, float]]:
+        """Per-feature contributions for each ``(viewer_id, target_id)``, in order."""
+        if not pairs:
+            return []
+        X = self.features(pairs)
+        if self.cache is None:
+            values = self.contributions(X)
+        else:
+            keys = self.cache.keys(self.model_hash, X)
+            values, miss = self.cache.get(keys, len(self.names))
+            if len(miss):
+                values[miss] = self.contributions(X[miss])
+                self.cache.put([keys[i] for i in miss], values[miss])
+        return [dict(zip(self.names, row.tolist())) for row in values]
@@ -0,0 +1,246 @@
+"""Global feature attribution over logged feature rows.
+
+    python -m services.explainer.global_importance --input impressions.parquet \
+        --output importance.json --workers 8
+
+Streams the ``feature_map.json`` columns of a Parquet file in chunks of
+``--chunk-rows``, computes SHAP contributions for each chunk in a process
+pool (native backend, one LightGBM thread per worker) and folds each
+chunk's partial aggregates into running totals as it comes back. Per
+feature it reports the mean contribution, the mean absolute contribution
+(the usual global importance), the standard deviation and quantiles of the
+contribution, features ordered by mean absolute contribution.
+
+Memory does not grow with the input: at most ``2 * --workers`` chunks are in
+flight, and quantiles come from mergeable log-bucket sketches (DDSketch,
+relative value error ``--relative-accuracy``) whose size depends on the
+range of the values, not their number.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import lightgbm as lgb
+import numpy as np
+
+from services.ranker.feature_fetcher import feature_names
+
+from .cache import file_sha256
+from .explainer import FMAP_PATH, MODEL_PATH, NativeBackend
+
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+class QuantileSketch:
+    """DDSketch: counts in log-spaced buckets, exactly mergeable.
+
+    A value ``x`` goes to bucket ``ceil(log_gamma(|x|))`` on its sign's side,
+    with ``gamma = (1 + a) / (1 - a)``; any quantile is returned within
+    relative error ``a`` of the true value. Values below ``min_value`` in
+    magnitude count as zero.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-9):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+
+    def add(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        small = np.abs(values) < self.min_value
+        self.zero += int(np.count_nonzero(small))
+        self.count += len(values)
+        sides = ((self.positive, values[~small & (values > 0)]), (self.negative, -values[~small & (values < 0)]))
+        for side, part in sides:
+            if len(part):
+                idx, counts = np.unique(np.ceil(np.log(part) / self._log_gamma).astype(np.int64), return_counts=True)
+                for i, c in zip(idx.tolist(), counts.tolist()):
+                    side[i] = side.get(i, 0) + c
+
+    def merge(self, other: "QuantileSketch") -> None:
+        for side, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for i, c in theirs.items():
+                side[i] = side.get(i, 0) + c
+        self.zero += other.zero
+        self.count += other.count
+
+    def _value(self, index: int) -> float:
+        # midpoint of (gamma^(i-1), gamma^i] in relative terms
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for i in sorted(self.negative, reverse=True):  # most negative first
+            seen += self.negative[i]
+            if seen > rank:
+                return -self._value(i)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for i in sorted(self.positive):
+            seen += self.positive[i]
+            if seen > rank:
+                return self._value(i)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+
+class Attribution:
+    """Running per-feature aggregates of contribution matrices.
+
+    Mean and spread are kept as ``(rows, mean, m2)`` (``m2`` the sum of
+    squared deviations from the mean) and combined with Chan et al.'s
+    parallel update, which, unlike ``E[x^2] - E[x]^2``, does not cancel when a
+    contribution's mean is large next to its spread.
+    """
+
+    def __init__(self, names: Sequence[str], relative_accuracy: float = 0.01):
+        self.names = list(names)
+        n = len(self.names)
+        self.rows = 0
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+        self.abs_sum = np.zeros(n)
+        self.sketches = [QuantileSketch(relative_accuracy) for _ in range(n)]
+
+    def add(self, values: np.ndarray) -> None:
+        if not len(values):
+            return
+        mean = values.mean(axis=0)
+        self._combine(len(values), mean, np.square(values - mean).sum(axis=0))
+        self.abs_sum += np.abs(values).sum(axis=0)
+        for j, sketch in enumerate(self.sketches):
+            sketch.add(values[:, j])
+
+    def merge(self, other: "Attribution") -> None:
+        self._combine(other.rows, other.mean, other.m2)
+        self.abs_sum += other.abs_sum
+        for mine, theirs in zip(self.sketches, other.sketches):
+            mine.merge(theirs)
+
+    def _combine(self, rows: int, mean: np.ndarray, m2: np.ndarray) -> None:
+        if rows == 0:
+            return
+        total = self.rows + rows
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (rows / total)
+        self.m2 = self.m2 + m2 + np.square(delta) * (self.rows * rows / total)
+        self.rows = total
+
+    def report(self) -> List[dict]:
+        n = max(self.rows, 1)
+        mean = self.mean
+        std = np.sqrt(self.m2 / n)
+        out = [
+            {
+                "feature": name,
+                "mean": float(mean[j]),
+                "mean_abs": float(self.abs_sum[j] / n),
+                "std": float(std[j]),
+                "quantiles": {f"p{round(q * 100):02d}": self.sketches[j].quantile(q) for q in QUANTILES},
+            }
+            for j, name in enumerate(self.names)
+        ]
+        return sorted(out, key=lambda r: r["mean_abs"], reverse=True)
+
+
+_backend: Optional[NativeBackend] = None
+
+
+def _init_worker(model_path: str) -> None:
+    global _backend
+    _backend = NativeBackend(lgb.Booster(model_file=model_path), num_threads=1)
+
+
+def _explain_chunk(X: np.ndarray, names: List[str], relative_accuracy: float) -> Attribution:
+    part = Attribution(names, relative_accuracy)
+    part.add(_backend.contributions(X))
+    return part
+
+
+def read_chunks(path: str, names: Sequence[str], chunk_rows: int) -> Iterator[np.ndarray]:
+    """``(rows, features)`` float64 blocks of ``names`` in ``path``, ``chunk_rows`` at a time."""
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    missing = set(names) - set(pf.schema_arrow.names)
+    if missing:
+        raise ValueError(f"{path} lacks feature columns {sorted(missing)}")
+    for batch in pf.iter_batches(batch_size=chunk_rows, columns=list(names)):
+        yield np.column_stack(
+            [batch.column(i).to_numpy(zero_copy_only=False).astype(np.float64) for i in range(len(names))]
+        )
+
+
+def run(
+    input_path: str,
+    model_path: str = MODEL_PATH,
+    feature_map_path: str = FMAP_PATH,
+    workers: int = 0,
+    chunk_rows: int = 50_000,
+    relative_accuracy: float = 0.01,
+) -> dict:
+    with open(feature_map_path) as f:
+        names = feature_names(json.load(f))
+    workers = workers or os.cpu_count() or 1
+    total = Attribution(names, relative_accuracy)
+    start = time.time()
+    in_flight: deque = deque()
+    # spawn, not fork: LightGBM's OpenMP runtime is not fork-safe once initialised
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker, initargs=(model_path,)) as pool:
+        for X in read_chunks(input_path, names, chunk_rows):
+            in_flight.append(pool.submit(_explain_chunk, X, names, relative_accuracy))
+            # reading stays at most two chunks per worker ahead of the pool
+            while len(in_flight) >= 2 * workers:
+                total.merge(in_flight.popleft().result())
+        while in_flight:
+            total.merge(in_flight.popleft().result())
+    return {
+        "input": os.path.abspath(input_path),
+        "model": os.path.abspath(model_path),
+        "model_sha256": file_sha256(model_path),
+        "base_value": NativeBackend(lgb.Booster(model_file=model_path)).base_value,
+        "rows": total.rows,
+        "seconds": round(time.time() - start, 3),
+        "relative_accuracy": relative_accuracy,
+        "features": total.report(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", required=True, help="parquet with a column per feature_map.json name")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--feature-map", default=FMAP_PATH)
+    parser.add_argument("--output", default="feature-importance.json")
+    parser.add_argument("--workers", type=int, default=0, help="processes; 0 means one per core")
+    parser.add_argument("--chunk-rows", type=int, default=50_000)
+    parser.add_argument("--relative-accuracy", type=float, default=0.01)
+    args = parser.parse_args()
+    report = run(args.input, args.model, args.feature_map, args.workers, args.chunk_rows, args.relative_accuracy)
+    tmp = args.output + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, args.output)
+    for row in report["features"]:
+        print(f"{row['feature']:<32} mean|shap| {row['mean_abs']:.6f}  mean {row['mean']:+.6f}")
+    print(f"{report['rows']} rows in {report['seconds']}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
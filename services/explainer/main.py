@@ -0,0 +1,168 @@
+"""Resident explainer service.
+
+    python -m services.explainer.main
+
+Loads the model, feature map and SHAP backend (``EXPLAINER_BACKEND``) once
+at startup and answers ``POST /explain`` with a batch of ``(viewer_id,
+target_id)`` pairs, so a "why am I seeing this" tap costs a feature fetch
+and a SHAP pass rather than a Python start-up. Features come from the
+ranker's Redis feature store (``REDIS_URL``, see
+``services.ranker.feature_fetcher``). Requests are admitted through
+``services.admission`` (``EXPLAINER_ADMISSION_*``).
+
+Explanations are cached (``services.explainer.cache``). Every
+``EXPLAINER_MODEL_WATCH_S`` seconds (default 30, 0 disables) the model file
+is checked; when its content changes a new ``Explainer`` is built and
+swapped in and the in-process cache is cleared. A model that fails to load
+leaves the old one serving.
+"""
+import logging
+import os
+import threading
+import time
+from typing import List
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from prometheus_client import REGISTRY, Histogram
+from prometheus_client.exposition import choose_encoder
+from pydantic import BaseModel
+
+from services.admission import AdmissionController, AdmissionMiddleware
+from services.ranker import feature_fetcher
+
+from .cache import ExplanationCache, file_sha256
+from .explainer import Explainer
+
+log = logging.getLogger(__name__)
+
+MAX_BATCH = int(os.getenv("EXPLAINER_MAX_BATCH", "256"))
+
+explain_latency_ms = Histogram(
+    "explain_latency_ms", "POST /explain latency in ms", buckets=(1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+explain_batch_pairs = Histogram(
+    "explain_batch_pairs", "Pairs per POST /explain", buckets=(1, 2, 5, 10, 25, 50, 100, 256)
+)
+
+app = FastAPI()
+explainer: Explainer | None = None
+cache = ExplanationCache.from_env()
+_watch_stop = threading.Event()
+_watcher: threading.Thread | None = None
+
+admission = AdmissionController.from_env(
+    "explainer", "EXPLAINER", limit=4, max_limit=16, max_queue=16, target_wait_ms=200.0
+)
+if admission is not None:
+    app.add_middleware(AdmissionMiddleware, controller=admission)
+
+
+class Pair(BaseModel):
+    viewer_id: str
+    target_id: str
+
+
+class ExplainRequest(BaseModel):
+    pairs: List[Pair]
+
+
+class Explanation(BaseModel):
+    viewer_id: str
+    target_id: str
+    contributions: dict[str, float]
+
+
+class ExplainResponse(BaseModel):
+    base_value: float
+    explanations: List[Explanation]
+
+
+@app.on_event("startup")
+def load_explainer():
+    global explainer, _watcher
+    if explainer is None:
+        explainer = Explainer.from_env(cache)
+        feature_fetcher.configure(explainer.feature_map)
+    poll_s = float(os.getenv("EXPLAINER_MODEL_WATCH_S", "30"))
+    if poll_s > 0 and _watcher is None:
+        _watch_stop.clear()
+        _watcher = threading.Thread(target=_watch_model, args=(poll_s,), name="explainer-model", daemon=True)
+        _watcher.start()
+
+
+@app.on_event("shutdown")
+def stop_watching():
+    global _watcher
+    _watch_stop.set()
+    if _watcher is not None:
+        _watcher.join()
+        _watcher = None
+
+
+def reload_explainer() -> bool:
+    """Swap in a new ``Explainer`` if the model file's content changed; True if swapped."""
+    global explainer
+    current = explainer
+    if file_sha256(current.model_path) == current.model_hash:
+        return False
+    fresh = Explainer(current.model_path, current.feature_map_path, current.backend.name, cache)
+    if fresh.feature_map != current.feature_map:
+        feature_fetcher.configure(fresh.feature_map)
+    explainer = fresh
+    if cache is not None:
+        cache.clear()
+    log.info("explainer model %s reloaded (sha256 %s)", fresh.model_path, fresh.model_hash[:12])
+    return True
+
+
+def _watch_model(poll_s: float) -> None:
+    last = None
+    while not _watch_stop.wait(poll_s):
+        try:
+            st = os.stat(explainer.model_path)
+        except OSError:
+            continue
+        # only hash the file when its stat changed
+        if (st.st_mtime_ns, st.st_size) == last:
+            continue
+        last = (st.st_mtime_ns, st.st_size)
+        try:
+            reload_explainer()
+        except Exception:
+            log.exception("explainer model %s could not be loaded; keeping the old one", explainer.model_path)
+
+
+@app.post("/explain", response_model=ExplainResponse)
+def explain(req: ExplainRequest):
+    if len(req.pairs) > MAX_BATCH:
+        raise HTTPException(status_code=422, detail=f"at most {MAX_BATCH} pairs per request")
+    # one model for the whole request, even if the watcher swaps it meanwhile
+    current = explainer
+    start = time.perf_counter()
+    pairs = [(p.viewer_id, p.target_id) for p in req.pairs]
+    contributions = current.explain(pairs)
+    explain_batch_pairs.observe(len(pairs))
+    explain_latency_ms.observe((time.perf_counter() - start) * 1000)
+    return {
+        "base_value": current.base_value,
+        "explanations": [
+            {"viewer_id": v, "target_id": t, "contributions": c} for (v, t), c in zip(pairs, contributions)
+        ],
+    }
+
+
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok" if explainer is not None else "loading"}
+
+
+@app.get("/metrics")
+def prometheus_metrics(request: Request):
+    encoder, content_type = choose_encoder(request.headers.get("accept"))
+    return Response(encoder(REGISTRY), media_type=content_type)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("EXPLAINER_PORT", "8000")))
@@ -0,0 +1,39 @@
+import lightgbm as lgb
+import numpy as np
+import pytest
+
+from services.explainer.explainer import MODEL_PATH, NativeBackend, ShapBackend
+
+pytest.importorskip("shap")
+
+
+def rows(n_features, n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(scale=1.5, size=(n, n_features))
+    X[::7, 0] = np.nan  # missing values follow each split's default direction
+    return X
+
+
+def assert_parity(booster, X):
+    native, reference = NativeBackend(booster), ShapBackend(booster)
+    assert native.base_value == pytest.approx(reference.base_value, abs=1e-9)
+    np.testing.assert_allclose(native.contributions(X), reference.contributions(X), atol=1e-9)
+    raw = booster.predict(X, raw_score=True)
+    np.testing.assert_allclose(native.base_value + native.contributions(X).sum(axis=1), raw, atol=1e-9)
+
+
+def test_native_matches_shap_on_shipped_model():
+    booster = lgb.Booster(model_file=MODEL_PATH)
+    assert_parity(booster, rows(booster.num_feature()))
+
+
+def test_native_matches_shap_on_deep_trees():
+    rng = np.random.default_rng(1)
+    X = rng.standard_normal((4000, 8))
+    y = (X[:, :3].sum(axis=1) + rng.standard_normal(4000) > 0).astype(int)
+    booster = lgb.train(
+        {"objective": "binary", "num_leaves": 255, "min_data_in_leaf": 2, "verbose": -1},
+        lgb.Dataset(X, y),
+        num_boost_round=30,
+    )
+    assert_parity(booster, rows(8, seed=2))
@@ -0,0 +1,116 @@
+import shutil
+
+import fakeredis
+import lightgbm as lgb
+import numpy as np
+import pytest
+import redis as redis_lib
+from prometheus_client import REGISTRY
+
+from services.explainer import explainer as explainer_mod
+from services.explainer.cache import ExplanationCache
+from services.explainer.explainer import FMAP_PATH, MODEL_PATH, Explainer
+
+
+def hits(tier):
+    return REGISTRY.get_sample_value("explain_cache_hits_total", {"tier": tier}) or 0.0
+
+
+def test_keys_quantize_rows_and_keep_nan_and_model_apart():
+    cache = ExplanationCache(quantum=1e-3)
+    X = np.array([[0.5, 1.0], [0.5001, 1.0], [0.502, 1.0], [np.nan, 1.0], [0.0, 1.0]])
+    k = cache.keys("m1", X)
+    assert k[0] == k[1]
+    assert len({k[0], k[2], k[3], k[4]}) == 4
+    assert cache.keys("m2", X[:1])[0] != k[0]
+
+
+def test_memory_tier_is_a_bounded_lru():
+    cache = ExplanationCache(max_entries=2)
+    keys = cache.keys("m", np.arange(3, dtype=np.float64).reshape(3, 1))
+    cache.put(keys[:2], np.array([[1.0], [2.0]]))
+    cache.get(keys[:1], 1)  # keys[0] is now most recent
+    cache.put(keys[2:], np.array([[3.0]]))
+    rows, miss = cache.get(keys, 1)
+    assert miss.tolist() == [1]
+    assert rows[[0, 2], 0].tolist() == [1.0, 3.0]
+
+
+def test_redis_tier_is_shared_and_promoted_to_memory():
+    redis = fakeredis.FakeRedis()
+    writer, reader = ExplanationCache(redis=redis), ExplanationCache(redis=redis)
+    keys = writer.keys("m", np.array([[1.0, 2.0]]))
+    writer.put(keys, np.array([[0.25, -0.5]]))
+    before = hits("redis")
+    rows, miss = reader.get(keys, 2)
+    assert len(miss) == 0 and rows.tolist() == [[0.25, -0.5]]
+    assert hits("redis") == before + 1
+    assert len(reader) == 1
+    assert 0 < redis.ttl(b"explain:" + keys[0].hex().encode()) <= 86_400
+
+
+def test_explainer_computes_each_row_once(monkeypatch):
+    rng = np.random.default_rng(0)
+    rows = {f"t{i}": rng.standard_normal(4) for i in range(3)}
+    monkeypatch.setattr(
+        explainer_mod, "fetch_features", lambda v, cids: np.array([rows[c] for c in cids], dtype=np.float32)
+    )
+    ex = Explainer(cache=ExplanationCache())
+    computed = []
+    compute = ex.backend.contributions
+    ex.backend.contributions = lambda X: computed.append(len(X)) or compute(X)
+    first = ex.explain([("v", "t0"), ("v", "t1")])
+    again = ex.explain([("v", "t1"), ("v", "t2"), ("v", "t0")])
+    assert computed == [2, 1]
+    assert again[0] == first[1] and again[2] == first[0]
+    assert again[1] == pytest.approx(Explainer().explain([("v", "t2")])[0])
+
+
+def test_model_change_swaps_explainer_and_clears_cache(tmp_path, monkeypatch):
+    from services.explainer import main
+
+    model_path = tmp_path / "model.txt"
+    shutil.copy(MODEL_PATH, model_path)
+    cache = ExplanationCache()
+    monkeypatch.setattr(main, "cache", cache)
+    monkeypatch.setattr(main, "explainer", Explainer(str(model_path), FMAP_PATH, cache=cache))
+    monkeypatch.setattr(explainer_mod, "fetch_features", lambda v, cids: np.ones((len(cids), 4), dtype=np.float32))
+    old = main.explainer.explain([("v", "t")])[0]
+    assert len(cache) == 1
+    assert main.reload_explainer() is False
+
+    rng = np.random.default_rng(3)
+    X = rng.standard_normal((500, 4))
+    lgb.train({"objective": "binary", "verbose": -1}, lgb.Dataset(X, (X[:, 3] > 0).astype(int)), 5).save_model(
+        str(model_path)
+    )
+    assert main.reload_explainer() is True
+    assert len(cache) == 0
+    assert main.explainer.explain([("v", "t")])[0] != pytest.approx(old)
+
+
+class DownRedis:
+    def mget(self, keys):
+        raise redis_lib.ConnectionError("connection refused")
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def set(self, *args, **kwargs):
+        pass
+
+    def execute(self):
+        raise redis_lib.ConnectionError("connection refused")
+
+
+def test_unreachable_redis_never_fails_a_request():
+    cache = ExplanationCache(redis=DownRedis())
+    keys = cache.keys("m", np.array([[1.0], [2.0]]))
+    errors = lambda op: REGISTRY.get_sample_value("explain_cache_redis_errors_total", {"op": op}) or 0.0
+    before = errors("get"), errors("put")
+    rows, miss = cache.get(keys, 1)
+    assert miss.tolist() == [0, 1]
+    cache.put(keys[:1], np.array([[0.5]]))
+    rows, miss = cache.get(keys, 1)  # the in-process tier still serves
+    assert miss.tolist() == [1] and rows[0, 0] == 0.5
+    assert (errors("get"), errors("put")) == (before[0] + 2, before[1] + 1)
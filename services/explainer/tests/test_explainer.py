@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from services.explainer import explainer as explainer_mod
+from services.explainer.explainer import Explainer
+
+
+def fake_fetch(calls):
+    def fetch(viewer_id, candidate_ids):
+        calls.append((viewer_id, list(candidate_ids)))
+        # row = (viewer number, target number, 0, 0)
+        return np.array([[float(viewer_id[1:]), float(c[1:]), 0, 0] for c in candidate_ids], dtype=np.float32)
+    return fetch
+
+
+def test_features_fetches_once_per_viewer_and_keeps_pair_order(monkeypatch):
+    calls = []
+    monkeypatch.setattr(explainer_mod, "fetch_features", fake_fetch(calls))
+    ex = Explainer.__new__(Explainer)
+    ex.names = ["a", "b", "c", "d"]
+    pairs = [("v1", "t1"), ("v2", "t2"), ("v1", "t3"), ("v2", "t4"), ("v3", "t5")]
+    X = ex.features(pairs)
+    assert calls == [("v1", ["t1", "t3"]), ("v2", ["t2", "t4"]), ("v3", ["t5"])]
+    assert X[:, :2].tolist() == [[1, 1], [2, 2], [1, 3], [2, 4], [3, 5]]
+
+
+def test_batch_matches_single_pair_explanations(monkeypatch):
+    pytest.importorskip("shap")
+    monkeypatch.setattr(explainer_mod, "fetch_features", fake_fetch([]))
+    ex = Explainer()
+    pairs = [("v1", "t1"), ("v2", "t2"), ("v1", "t3")]
+    batch = ex.explain(pairs)
+    assert [list(b) for b in batch] == [ex.names] * 3
+    for pair, got in zip(pairs, batch):
+        one = ex.explain([pair])[0]
+        assert got == pytest.approx(one)
+    # contributions add up to the raw score
+    X = ex.features(pairs)
+    raw = ex.booster.predict(X, raw_score=True)
+    assert [ex.base_value + sum(b.values()) for b in batch] == pytest.approx(raw, abs=1e-6)
+
+
+def test_explain_endpoint(monkeypatch):
+    pytest.importorskip("shap")
+    from fastapi.testclient import TestClient
+
+    from services.explainer import main
+
+    monkeypatch.setattr(explainer_mod, "fetch_features", fake_fetch([]))
+    monkeypatch.setattr(main, "MAX_BATCH", 2)
+    with TestClient(main.app) as client:
+        body = {"pairs": [{"viewer_id": "v1", "target_id": "t1"}, {"viewer_id": "v2", "target_id": "t2"}]}
+        resp = client.post("/explain", json=body)
+        assert resp.status_code == 200
+        out = resp.json()
+        assert [(e["viewer_id"], e["target_id"]) for e in out["explanations"]] == [("v1", "t1"), ("v2", "t2")]
+        assert set(out["explanations"][0]["contributions"]) == set(main.explainer.names)
+        body["pairs"].append({"viewer_id": "v3", "target_id": "t3"})
+        assert client.post("/explain", json=body).status_code == 422
+        watcher = main._watcher
+        assert watcher.is_alive()
+    # shutdown stops the model watcher; the next startup starts exactly one again
+    assert not watcher.is_alive() and main._watcher is None
+    with TestClient(main.app):
+        assert main._watcher is not None and main._watcher is not watcher
+    assert main._watcher is None
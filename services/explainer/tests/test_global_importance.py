@@ -0,0 +1,76 @@
+import json
+
+import lightgbm as lgb
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from services.explainer import global_importance as gi
+from services.explainer.explainer import FMAP_PATH, MODEL_PATH, NativeBackend
+
+
+def test_sketch_quantiles_are_within_relative_accuracy_and_merge_exactly():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.normal(0, 2, 20_000), np.zeros(500)])
+    whole = gi.QuantileSketch(0.01)
+    whole.add(values)
+    merged = gi.QuantileSketch(0.01)
+    for part in np.array_split(values, 7):
+        piece = gi.QuantileSketch(0.01)
+        piece.add(part)
+        merged.merge(piece)
+    assert (merged.positive, merged.negative, merged.zero, merged.count) == (
+        whole.positive, whole.negative, whole.zero, whole.count,
+    )
+    for q in gi.QUANTILES:
+        exact = np.quantile(values, q, method="lower")
+        assert merged.quantile(q) == pytest.approx(exact, rel=0.011, abs=1e-9)
+
+
+def test_job_matches_single_pass_over_the_whole_file(tmp_path):
+    with open(FMAP_PATH) as f:
+        fmap = json.load(f)
+    names = sorted(fmap, key=fmap.get)
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(5_000, len(names)))
+    X[::11, 1] = np.nan
+    path = tmp_path / "rows.parquet"
+    table = pa.table({n: X[:, j] for j, n in enumerate(names)} | {"viewer_id": [f"v{i}" for i in range(len(X))]})
+    pq.write_table(table, path, row_group_size=1_000)
+
+    report = gi.run(str(path), workers=2, chunk_rows=700)
+
+    contrib = NativeBackend(lgb.Booster(model_file=MODEL_PATH)).contributions(X)
+    assert report["rows"] == len(X)
+    by_name = {r["feature"]: r for r in report["features"]}
+    for j, name in enumerate(names):
+        assert by_name[name]["mean"] == pytest.approx(contrib[:, j].mean(), abs=1e-9)
+        assert by_name[name]["mean_abs"] == pytest.approx(np.abs(contrib[:, j]).mean(), abs=1e-9)
+        assert by_name[name]["std"] == pytest.approx(contrib[:, j].std(), rel=1e-6)
+        assert by_name[name]["quantiles"]["p50"] == pytest.approx(
+            np.quantile(contrib[:, j], 0.5, method="lower"), rel=0.011, abs=1e-9
+        )
+    assert [r["mean_abs"] for r in report["features"]] == sorted(by_name[n]["mean_abs"] for n in names)[::-1]
+
+
+def test_missing_feature_column_is_an_error(tmp_path):
+    path = tmp_path / "rows.parquet"
+    pq.write_table(pa.table({"OTHER": [1.0]}), path)
+    with pytest.raises(ValueError, match="lacks feature columns"):
+        list(gi.read_chunks(str(path), ["OTHER", "TREND"], 10))
+
+
+def test_std_survives_a_large_mean_across_merged_chunks():
+    rng = np.random.default_rng(2)
+    values = 1e6 + rng.standard_normal((40_000, 2)) * [1e-3, 1.0]
+    total = gi.Attribution(["a", "b"])
+    for chunk in np.array_split(values, 7):
+        part = gi.Attribution(["a", "b"])
+        part.add(chunk)
+        total.merge(part)
+    report = {r["feature"]: r for r in total.report()}
+    expected = values.std(axis=0)
+    assert report["a"]["std"] == pytest.approx(expected[0], rel=1e-6)
+    assert report["b"]["std"] == pytest.approx(expected[1], rel=1e-6)
+    assert report["a"]["mean"] == pytest.approx(values[:, 0].mean(), rel=1e-12)
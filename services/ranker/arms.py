@@ -0,0 +1,147 @@
+"""Experiment arms: several models in one ranker process.
+
+``RANKER_ARMS`` lists the arms as ``name=weight:model_path`` separated by
+commas, e.g. ``control=90:/models/ranker_v2024-05-01.txt,
+treatment=10:/models/ranker_v2024-06-01.txt``. Each model is loaded with the
+``feature_map.json`` next to it (see ``model_store``). A viewer is assigned to
+an arm by a hash of ``RANKER_ARMS_SALT`` + ``viewer_id``, so assignment is
+stable across requests, pods and restarts and only reshuffles when the salt
+changes.
+
+The feature fetcher is configured once with the union of the arms' feature
+maps, so a request fetches every feature name once no matter how many arms
+use it and all arms share the row cache and snapshot; each arm then selects
+its own columns from that matrix.
+"""
+import hashlib
+import os
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from prometheus_client import Counter, Gauge, Histogram
+
+from . import model_store
+from .batcher import MicroBatcher
+from .feature_fetcher import feature_names
+from .metrics import LATENCY_BUCKETS_MS
+from .model_store import ServedModel
+
+BUCKETS = 10_000
+
+arm_requests_total = Counter("rank_arm_requests_total", "Rank requests per experiment arm", ["arm"])
+arm_latency_ms = Histogram(
+    "rank_arm_latency_ms", "Rank latency per experiment arm in ms", ["arm"], buckets=LATENCY_BUCKETS_MS
+)
+arm_model_bytes = Gauge(
+    "ranker_arm_model_bytes", "Resident memory added by loading the arm's model (approximate)", ["arm"]
+)
+arm_info = Gauge("ranker_arm_info", "Model version and traffic share per arm", ["arm", "version", "weight"])
+
+
+def parse_arms(spec: str) -> List[Tuple[str, float, str]]:
+    arms = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, rest = part.partition("=")
+        weight, _, path = rest.partition(":")
+        if not name or not path:
+            raise ValueError(f"bad RANKER_ARMS entry {part!r}; expected name=weight:model_path")
+        arms.append((name.strip(), float(weight), path.strip()))
+    if not arms:
+        raise ValueError("RANKER_ARMS lists no arms")
+    if len({a[0] for a in arms}) != len(arms):
+        raise ValueError("RANKER_ARMS has duplicate arm names")
+    return arms
+
+
+def union_feature_map(maps: List[Dict[str, int]]) -> Dict[str, int]:
+    """The first map's columns in order, then names only later maps use."""
+    union: Dict[str, int] = {}
+    for fmap in maps:
+        for name in feature_names(fmap):
+            union.setdefault(name, len(union))
+    return union
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+
+@dataclass
+class Arm:
+    name: str
+    weight: float
+    served: ServedModel
+    # the arm's columns within the shared feature matrix; None if identical
+    columns: Optional[np.ndarray] = None
+    batcher: Optional[MicroBatcher] = None
+
+    def __post_init__(self):
+        self._requests = arm_requests_total.labels(self.name)
+        self._latency = arm_latency_ms.labels(self.name)
+
+    def features(self, feats):
+        if self.columns is None:
+            return feats
+        return np.ascontiguousarray(np.asarray(feats)[:, self.columns])
+
+    def predict(self, X) -> np.ndarray:
+        if self.batcher is not None:
+            return self.batcher.predict(X)
+        return self.served.predict(X)
+
+    def observe(self, elapsed_ms: float) -> None:
+        self._requests.inc()
+        self._latency.observe(elapsed_ms)
+
+
+class ArmRouter:
+    def __init__(self, arms: List[Arm], salt: str = ""):
+        total = sum(a.weight for a in arms)
+        if total <= 0:
+            raise ValueError("arm weights must add up to more than 0")
+        self.arms = arms
+        self.salt = salt.encode()
+        self.feature_map = union_feature_map([a.served.feature_map for a in arms])
+        # arm i owns hash buckets [bounds[i-1], bounds[i])
+        cumulative = np.cumsum([a.weight for a in arms]) / total
+        self._bounds = [int(round(c * BUCKETS)) for c in cumulative]
+        for arm in arms:
+            names = feature_names(arm.served.feature_map)
+            columns = np.array([self.feature_map[n] for n in names], dtype=np.intp)
+            if not np.array_equal(columns, np.arange(len(self.feature_map))):
+                arm.columns = columns
+            arm_info.labels(arm.name, arm.served.version, f"{arm.weight / total:g}").set(1)
+
+    def bucket(self, viewer_id: str) -> int:
+        digest = hashlib.blake2b(self.salt + viewer_id.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") % BUCKETS
+
+    def route(self, viewer_id: str) -> Arm:
+        return self.arms[min(bisect_right(self._bounds, self.bucket(viewer_id)), len(self.arms) - 1)]
+
+    @classmethod
+    def load(cls, spec: str, num_threads: int = 0, salt: str = "") -> "ArmRouter":
+        arms = []
+        for name, weight, path in parse_arms(spec):
+            before = _rss_bytes()
+            # arms serve Rank like the primary: cascade and deadline fallback included
+            served = model_store.load(path, num_threads, cascade=True, fallback=True)
+            arm_model_bytes.labels(name).set(max(0, _rss_bytes() - before) or os.path.getsize(path))
+            arms.append(Arm(name, weight, served, batcher=MicroBatcher.from_env(served.predict)))
+        return cls(arms, salt)
+
+    @classmethod
+    def from_env(cls, num_threads: int = 0) -> Optional["ArmRouter"]:
+        spec = os.getenv("RANKER_ARMS")
+        if not spec:
+            return None
+        return cls.load(spec, num_threads, os.getenv("RANKER_ARMS_SALT", ""))
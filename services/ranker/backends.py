@@ -0,0 +1,168 @@
+"""Inference backends for the ranker booster.
+
+All backends score the same LightGBM model file and return raw scores as a
+1-D float64 array:
+
+* ``lightgbm`` - ``lgb.Booster.predict`` (always available)
+* ``treelite`` - the ensemble compiled to a shared library with treelite /
+  tl2cgen; needs a C toolchain at startup
+* ``onnx``     - the model converted with onnxmltools and run on the ONNX
+  Runtime CPU provider
+
+``RANKER_BACKEND=auto`` builds every backend whose dependencies are installed,
+checks it against the native booster on synthetic rows and keeps the fastest.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, Iterable, List, Optional
+
+import lightgbm as lgb
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+BACKENDS = ("lightgbm", "treelite", "onnx")
+PARITY_ATOL = 1e-4
+
+
+class Backend:
+    name = "base"
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+
+class LightGBMBackend(Backend):
+    name = "lightgbm"
+
+    def __init__(self, booster: lgb.Booster, num_threads: int = 0):
+        self.booster = booster
+        self.num_threads = num_threads
+
+    def predict(self, X):
+        if self.num_threads:
+            return self.booster.predict(X, num_threads=self.num_threads)
+        return self.booster.predict(X)
+
+
+class TreeliteBackend(Backend):
+    name = "treelite"
+
+    def __init__(self, booster: lgb.Booster, num_threads: int = 0, cache_dir: Optional[str] = None):
+        import tl2cgen
+        import treelite
+
+        model_str = booster.model_to_string()
+        digest = hashlib.sha256(model_str.encode()).hexdigest()[:16]
+        cache_dir = cache_dir or os.getenv("RANKER_BACKEND_CACHE_DIR") or tempfile.gettempdir()
+        libpath = os.path.join(cache_dir, f"ranker-{digest}.so")
+        if not os.path.exists(libpath):
+            tl_model = treelite.frontend.from_lightgbm(booster)
+            tmp = f"{libpath}.{os.getpid()}.tmp.so"
+            tl2cgen.export_lib(tl_model, toolchain="gcc", libpath=tmp, params={"parallel_comp": os.cpu_count() or 1})
+            os.replace(tmp, libpath)
+        self._dmatrix = tl2cgen.DMatrix
+        self.predictor = tl2cgen.Predictor(libpath, nthread=num_threads or None)
+
+    def predict(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        return self.predictor.predict(self._dmatrix(X)).reshape(-1).astype(np.float64)
+
+
+class OnnxBackend(Backend):
+    name = "onnx"
+
+    def __init__(self, booster: lgb.Booster, num_threads: int = 0):
+        import onnxruntime as ort
+        from onnxmltools import convert_lightgbm
+        from onnxmltools.convert.common.data_types import FloatTensorType
+
+        n_features = booster.num_feature()
+        onx = convert_lightgbm(
+            booster, initial_types=[("input", FloatTensorType([None, n_features]))], target_opset=15
+        )
+        opts = ort.SessionOptions()
+        if num_threads:
+            opts.intra_op_num_threads = num_threads
+            opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            onx.SerializeToString(), opts, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        return self.session.run(None, {self.input_name: X})[0].reshape(-1).astype(np.float64)
+
+
+_CLASSES = {"lightgbm": LightGBMBackend, "treelite": TreeliteBackend, "onnx": OnnxBackend}
+
+
+def build_backend(name: str, booster: lgb.Booster, num_threads: int = 0) -> Backend:
+    try:
+        cls = _CLASSES[name]
+    except KeyError:
+        raise ValueError(f"unknown ranker backend {name!r}; expected one of {BACKENDS}") from None
+    return cls(booster, num_threads=num_threads)
+
+
+def synthetic_rows(booster: lgb.Booster, n: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((n, booster.num_feature())).astype(np.float32)
+
+
+def benchmark(backend: Backend, X: np.ndarray, repeat: int = 20) -> float:
+    """Median seconds per ``predict`` call on ``X``."""
+    backend.predict(X)
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        backend.predict(X)
+        samples.append(time.perf_counter() - t0)
+    return float(np.median(samples))
+
+
+def select_backend(
+    booster: lgb.Booster,
+    candidates: Iterable[str] = BACKENDS,
+    batch_rows: int = 200,
+    num_threads: int = 0,
+    repeat: int = 20,
+) -> Backend:
+    """Build each available backend, drop those that disagree with LightGBM, keep the fastest."""
+    reference = LightGBMBackend(booster, num_threads)
+    X = synthetic_rows(booster, batch_rows)
+    expected = reference.predict(X)
+    timings: Dict[str, float] = {}
+    built: List[Backend] = []
+    for name in candidates:
+        try:
+            backend = reference if name == "lightgbm" else build_backend(name, booster, num_threads)
+        except Exception as err:  # missing optional dependency or toolchain
+            log.info("ranker backend %s unavailable: %s", name, err)
+            continue
+        if not np.allclose(backend.predict(X), expected, atol=PARITY_ATOL):
+            log.warning("ranker backend %s disagrees with lightgbm; skipping", name)
+            continue
+        timings[name] = benchmark(backend, X, repeat)
+        built.append(backend)
+    if not built:
+        return reference
+    best = min(built, key=lambda b: timings[b.name])
+    log.info("ranker backend timings (s/call at %d rows): %s -> %s", batch_rows, timings, best.name)
+    return best
+
+
+def load_backend(booster: lgb.Booster, name: Optional[str] = None, num_threads: int = 0) -> Backend:
+    name = name or os.getenv("RANKER_BACKEND", "auto")
+    if name == "auto":
+        candidates = os.getenv("RANKER_BACKEND_CANDIDATES", ",".join(BACKENDS)).split(",")
+        return select_backend(
+            booster,
+            candidates=[c.strip() for c in candidates if c.strip()],
+            batch_rows=int(os.getenv("RANKER_BACKEND_BENCH_ROWS", "200")),
+            num_threads=num_threads,
+        )
+    return build_backend(name, booster, num_threads)
@@ -0,0 +1,103 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+Item = Tuple[np.ndarray, Callable[[np.ndarray], np.ndarray], Future]
+
+
+class MicroBatcher:
+    """Coalesces ``predict`` calls from concurrent Rank requests.
+
+    The first waiting request opens a window of ``max_wait_s``; everything
+    that arrives before it closes (up to ``max_rows`` rows) is concatenated
+    into one matrix, scored with a single ``predict_fn`` call and the scores
+    are scattered back to the callers. A request larger than ``max_rows`` is
+    scored on its own.
+
+    A caller may pass its own ``predict_fn`` (the model it captured before a
+    hot swap); a batch only holds requests for one model, so every caller is
+    scored by the model it asked for.
+    """
+
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray], max_rows: int = 4096, max_wait_s: float = 0.0005):
+        self.predict_fn = predict_fn
+        self.max_rows = max_rows
+        self.max_wait_s = max_wait_s
+        self._queue: "queue.SimpleQueue[Optional[Item]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._carry: Optional[Item] = None
+
+    @classmethod
+    def from_env(cls, predict_fn) -> Optional["MicroBatcher"]:
+        """``RANKER_BATCH_MAX_WAIT_US`` > 0 enables batching."""
+        wait_us = float(os.getenv("RANKER_BATCH_MAX_WAIT_US", "0"))
+        if wait_us <= 0:
+            return None
+        return cls(predict_fn, int(os.getenv("RANKER_BATCH_MAX_ROWS", "4096")), wait_us / 1e6)
+
+    def predict(self, X, predict_fn: Optional[Callable[[np.ndarray], np.ndarray]] = None) -> np.ndarray:
+        self._ensure_started()
+        fut: Future = Future()
+        self._queue.put((np.asarray(X, dtype=np.float32), predict_fn or self.predict_fn, fut))
+        return fut.result()
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="rank-batcher", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            first = self._carry or self._queue.get()
+            self._carry = None
+            if first is None:
+                return
+            batch: List[Item] = [first]
+            rows = len(first[0])
+            deadline = time.perf_counter() + self.max_wait_s
+            while rows < self.max_rows:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._flush(batch)
+                    return
+                # a different model (hot swap): it starts the next batch
+                if rows + len(item[0]) > self.max_rows or item[1] != first[1]:
+                    self._carry = item
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            self._flush(batch)
+
+    def _flush(self, batch: List[Item]) -> None:
+        predict_fn = batch[0][1]
+        try:
+            if len(batch) == 1:
+                scores = np.asarray(predict_fn(batch[0][0]))
+            else:
+                scores = np.asarray(predict_fn(np.concatenate([x for x, _, _ in batch])))
+        except Exception as err:
+            for _, _, fut in batch:
+                fut.set_exception(err)
+            return
+        offset = 0
+        for x, _, fut in batch:
+            fut.set_result(scores[offset : offset + len(x)])
+            offset += len(x)
@@ -0,0 +1,70 @@
+"""Throughput / latency curve for cross-request micro-batching.
+
+    python -m services.ranker.bench.batching --clients 16 --rows 200 \
+        --max-wait-us 0 100 250 500 1000 2000
+
+``--max-wait-us 0`` is the unbatched baseline (one predict per request).
+Each client thread issues back-to-back predicts of ``--rows`` rows against a
+synthetic production-shape model for ``--seconds``.
+"""
+import argparse
+import json
+import threading
+import time
+
+import lightgbm as lgb
+import numpy as np
+
+from services.ranker.batcher import MicroBatcher
+from services.ranker.bench.synthetic import synthetic_model
+
+
+def run(booster, clients, rows, seconds, max_wait_us, max_rows):
+    batcher = MicroBatcher(booster.predict, max_rows, max_wait_us / 1e6) if max_wait_us > 0 else None
+    predict = batcher.predict if batcher else booster.predict
+    X = np.random.default_rng(0).standard_normal((rows, booster.num_feature())).astype(np.float32)
+    latencies = [[] for _ in range(clients)]
+    stop = time.perf_counter() + seconds
+
+    def client(out):
+        while time.perf_counter() < stop:
+            t0 = time.perf_counter()
+            predict(X)
+            out.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=client, args=(latencies[i],)) for i in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    if batcher:
+        batcher.close()
+    lat = np.concatenate([np.asarray(x) for x in latencies]) * 1000
+    return {
+        "max_wait_us": max_wait_us,
+        "rps": round(len(lat) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(lat, 50)), 3),
+        "p99_ms": round(float(np.percentile(lat, 99)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--max-wait-us", type=float, nargs="+", default=[0, 100, 250, 500, 1000, 2000])
+    parser.add_argument("--max-rows", type=int, default=4096)
+    parser.add_argument("--trees", type=int, default=300)
+    parser.add_argument("--leaves", type=int, default=255)
+    args = parser.parse_args()
+
+    booster = lgb.Booster(model_file=synthetic_model(trees=args.trees, leaves=args.leaves))
+    curve = [run(booster, args.clients, args.rows, args.seconds, w, args.max_rows) for w in args.max_wait_us]
+    print(json.dumps({"clients": args.clients, "rows": args.rows, "curve": curve}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
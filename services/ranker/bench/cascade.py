@@ -0,0 +1,119 @@
+"""NDCG cost and latency win of cascade settings.
+
+    python -m services.ranker.bench.cascade --trees 25 50 100 --rescore 100 200
+    python -m services.ranker.bench.cascade --model models/ranker_v2024-06-01.txt \
+        --input /data/training/features.parquet --trees 50 --rescore 200
+
+With ``--input`` (the ``ml/offline_train_ranker.py`` layout: ``label``,
+``viewer_id``, ``candidate_id`` and feature columns) every viewer is one
+ranking request; without it, ``--groups`` requests of ``--candidates``
+synthetic rows are scored with the synthetic production-shape model.
+``--light-model`` evaluates a separately trained stage-one model instead of
+tree prefixes. NDCG@k uses linear gain, like the trainer's validation metric.
+"""
+import argparse
+import json
+import time
+
+import lightgbm as lgb
+import numpy as np
+
+from services.ranker import backends, cascade
+from services.ranker.bench.synthetic import synthetic_data, synthetic_model
+from services.ranker.ranking import top_k_order
+
+
+def ndcg_at_k(labels: np.ndarray, order: np.ndarray, k: int) -> float:
+    discount = 1 / np.log2(np.arange(2, k + 2))
+    ideal = np.sort(labels)[::-1][:k]
+    idcg = float((ideal * discount[: len(ideal)]).sum())
+    if idcg == 0:
+        return 1.0
+    got = labels[order[:k]]
+    return float((got * discount[: len(got)]).sum()) / idcg
+
+
+def load_groups(path):
+    import pandas as pd
+
+    df = pd.read_parquet(path)
+    labels = df.pop("label").to_numpy()
+    viewers = df.pop("viewer_id").to_numpy()
+    df.pop("candidate_id")
+    X = df.to_numpy(dtype=np.float32)
+    return [(X[viewers == v], labels[viewers == v]) for v in np.unique(viewers)]
+
+
+def evaluate(groups, rank_fn, k, repeat):
+    ndcgs, latencies = [], []
+    for X, y in groups:
+        samples = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            order = rank_fn(X)
+            samples.append(time.perf_counter() - t0)
+        latencies.append(min(samples) * 1000)
+        ndcgs.append(ndcg_at_k(y, order, k))
+    return float(np.mean(ndcgs)), float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", help="ranker model; default: synthetic 300x255")
+    parser.add_argument("--input", help="labelled parquet in the trainer's layout")
+    parser.add_argument("--light-model", help="separately trained stage-one model")
+    parser.add_argument("--trees", type=int, nargs="+", default=[25, 50, 100])
+    parser.add_argument("--rescore", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--groups", type=int, default=50)
+    parser.add_argument("--candidates", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backend", default="lightgbm")
+    parser.add_argument("--threads", type=int, default=0)
+    args = parser.parse_args()
+
+    booster = lgb.Booster(model_file=args.model or synthetic_model())
+    if args.input:
+        groups = load_groups(args.input)
+    else:
+        X, y = synthetic_data(args.groups * args.candidates, booster.num_feature(), seed=1)
+        groups = [
+            (X[i : i + args.candidates], y[i : i + args.candidates])
+            for i in range(0, len(X), args.candidates)
+        ]
+    full = backends.build_backend(args.backend, booster, args.threads)
+    base_ndcg, base_p50, base_p99 = evaluate(groups, lambda X: top_k_order(full.predict(X), args.k), args.k, args.repeat)
+
+    settings = []
+    stages = [("model", args.light_model)] if args.light_model else [("trees", n) for n in args.trees]
+    for kind, value in stages:
+        for m in args.rescore:
+            c = cascade.build(
+                booster,
+                trees=value if kind == "trees" else 0,
+                rescore=m,
+                model_path=value if kind == "model" else None,
+                num_threads=args.threads,
+                backend=args.backend,
+            )
+            if c is None:
+                continue
+            ndcg, p50, p99 = evaluate(groups, lambda X: c.rank(X, full.predict, args.k)[0], args.k, args.repeat)
+            settings.append({
+                "stage_one": c.label,
+                "rescore": m,
+                f"ndcg@{args.k}": round(ndcg, 4),
+                "ndcg_loss": round(base_ndcg - ndcg, 4),
+                "p50_ms": round(p50, 3),
+                "p99_ms": round(p99, 3),
+                "speedup_p50": round(base_p50 / p50, 2),
+            })
+    print(json.dumps({
+        "requests": len(groups),
+        "full": {f"ndcg@{args.k}": round(base_ndcg, 4), "p50_ms": round(base_p50, 3), "p99_ms": round(base_p99, 3)},
+        "cascade": settings,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
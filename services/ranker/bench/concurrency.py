@@ -0,0 +1,67 @@
+"""Sweep ranker concurrency settings and report the best one for this host.
+
+    python -m services.ranker.bench.concurrency --p99-ms 50 \
+        --grpc-workers 1 2 4 8 --predict-threads 1 2 0 --processes 1 2 4
+
+Every combination starts a real gRPC server (``bench.serve``) on a synthetic
+production-shape model and drives it closed-loop with ``--clients`` threads.
+The winner is the highest throughput whose p99 stays under ``--p99-ms``.
+"""
+import argparse
+import itertools
+import json
+import os
+
+from services.ranker.bench.load import closed_loop, make_requests, spawn_server, wait_ready
+from services.ranker.bench.synthetic import synthetic_model
+from services.ranker.concurrency import available_cores
+
+
+def main():
+    cores = len(available_cores())
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--grpc-workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--predict-threads", type=int, nargs="+", default=[1, 2, 0])
+    parser.add_argument("--processes", type=int, nargs="+", default=sorted({1, max(1, cores // 2), cores}))
+    parser.add_argument("--clients", type=int, default=2 * cores + 2)
+    parser.add_argument("--candidates", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--p99-ms", type=float, default=50.0)
+    parser.add_argument("--port", type=int, default=50071)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    model_path = synthetic_model()
+    requests = make_requests(256, args.candidates)
+    results = []
+    for workers, threads, procs in itertools.product(args.grpc_workers, args.predict_threads, args.processes):
+        env = {
+            "MODEL_PATH": model_path,
+            "RANKER_BACKEND": os.getenv("RANKER_BACKEND", "lightgbm"),
+            "RANKER_GRPC_WORKERS": str(workers),
+            "RANKER_PREDICT_THREADS": str(threads),
+            "RANKER_PROCESSES": str(procs),
+        }
+        server = spawn_server(args.port, env)
+        try:
+            wait_ready(f"localhost:{args.port}")
+            closed_loop(f"localhost:{args.port}", args.clients, 1.0, requests)  # warm-up
+            stats = closed_loop(f"localhost:{args.port}", args.clients, args.seconds, requests)
+        finally:
+            server.terminate()
+            server.wait()
+        row = {"grpc_workers": workers, "predict_threads": threads, "processes": procs, **stats}
+        print(json.dumps(row), flush=True)
+        results.append(row)
+
+    within = [r for r in results if r.get("p99_ms", float("inf")) <= args.p99_ms]
+    best = max(within, key=lambda r: r["rps"]) if within else None
+    report = {"cores": cores, "p99_target_ms": args.p99_ms, "best": best, "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps({"best": best}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
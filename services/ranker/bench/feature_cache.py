@@ -0,0 +1,69 @@
+"""Hit rate and latency of the candidate feature cache under Zipfian popularity.
+
+    python -m services.ranker.bench.feature_cache --catalogue 1000000 --zipf 1.1
+
+Requests draw ``--candidates`` ids from a Zipf(``--zipf``) distribution over
+the catalogue. Misses go to an in-memory stand-in for Redis that sleeps
+``--store-us`` per row, so the report shows both the hit rate and how much
+store time the cache saves at a given capacity.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from services.ranker.feature_cache import CandidateFeatureCache
+from services.ranker.feature_fetcher import FeatureFetcher
+
+
+class StubStore(FeatureFetcher):
+    def __init__(self, width, store_us, cache):
+        super().__init__(None, {f"f{i}": i for i in range(width)}, cache=cache)
+        self.store_s = store_us / 1e6
+        self.rows_fetched = 0
+
+    def fetch_raw(self, viewer_id, candidate_ids):
+        self.rows_fetched += len(candidate_ids)
+        time.sleep(self.store_s * len(candidate_ids))
+        return np.full(self.width, np.nan, np.float32), np.ones((len(candidate_ids), self.width), np.float32)
+
+
+def run(args, cache):
+    rng = np.random.default_rng(0)
+    store = StubStore(args.features, args.store_us, cache)
+    samples = np.empty(args.requests)
+    for r in range(args.requests):
+        ids = (rng.zipf(args.zipf, args.candidates) - 1) % args.catalogue
+        cids = [f"c{i}" for i in ids]
+        t0 = time.perf_counter()
+        store.fetch("v", cids)
+        samples[r] = (time.perf_counter() - t0) * 1000
+    total = args.requests * args.candidates
+    return {
+        "hit_rate": round(1 - store.rows_fetched / total, 4),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--catalogue", type=int, default=1_000_000)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--candidates", type=int, default=200)
+    parser.add_argument("--features", type=int, default=40)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--cache-mb", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--store-us", type=float, default=2.0)
+    args = parser.parse_args()
+
+    report = {"no_cache": run(args, None)}
+    for mb in args.cache_mb:
+        cache = CandidateFeatureCache(args.features, mb << 20, ttl_s=3600)
+        report[f"{mb}MB"] = {**run(args, cache), "capacity_rows": cache.capacity}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
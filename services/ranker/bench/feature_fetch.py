@@ -0,0 +1,88 @@
+"""Benchmark ``FeatureFetcher.fetch`` against a local Redis.
+
+    redis-server --save "" &
+    python -m services.ranker.bench.feature_fetch --features 40 --sizes 100 1000 10000
+
+Seeds ``feat:cand:bench-<i>`` hashes (a fraction left empty to exercise the
+default path) and reports per-call latency for each candidate-set size.
+``--fake`` runs against fakeredis, which only checks the harness works.
+``--snapshot DIR`` also publishes the candidates as a feature snapshot in
+``DIR`` and times the snapshot path (only the viewer hash goes to Redis).
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from services.ranker.feature_fetcher import CANDIDATE_PREFIX, VIEWER_PREFIX, FeatureFetcher
+from services.ranker.feature_snapshot import SnapshotStore, write_snapshot
+
+
+def seed(client, names, n, missing=0.05):
+    rng = np.random.default_rng(0)
+    pipe = client.pipeline(transaction=False)
+    pipe.hset(VIEWER_PREFIX + "bench", mapping={names[0]: 1.0})
+    for i in range(n):
+        if rng.random() < missing:
+            continue
+        pipe.hset(CANDIDATE_PREFIX + f"bench-{i}", mapping=dict(zip(names, rng.random(len(names)).tolist())))
+        if i % 1000 == 999:
+            pipe.execute()
+    pipe.execute()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--features", type=int, default=40)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--fake", action="store_true")
+    parser.add_argument("--snapshot", metavar="DIR")
+    args = parser.parse_args()
+
+    if args.fake:
+        import fakeredis
+
+        client = fakeredis.FakeRedis()
+    else:
+        import redis
+
+        client = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+
+    feature_map = {f"f{i}": i for i in range(args.features)}
+    fetchers = {"redis": FeatureFetcher(client, feature_map)}
+    n = max(args.sizes)
+    seed(client, fetchers["redis"].names, n)
+    if args.snapshot:
+        rng = np.random.default_rng(1)
+        write_snapshot(
+            args.snapshot, [f"bench-{i}" for i in range(n)],
+            {name: rng.random(n) for name in feature_map}, feature_map,
+        )
+        store = SnapshotStore(args.snapshot, feature_map, poll_s=0).start()
+        fetchers["snapshot"] = FeatureFetcher(client, feature_map, snapshots=store)
+
+    results = []
+    for source, fetcher in fetchers.items():
+        for size in args.sizes:
+            cids = [f"bench-{i}" for i in range(size)]
+            fetcher.fetch("bench", cids)  # warm the pool
+            samples = np.empty(args.repeat)
+            for r in range(args.repeat):
+                t0 = time.perf_counter()
+                fetcher.fetch("bench", cids)
+                samples[r] = (time.perf_counter() - t0) * 1000
+            results.append({
+                "source": source,
+                "candidates": size,
+                "features": args.features,
+                "p50_ms": round(float(np.percentile(samples, 50)), 3),
+                "p99_ms": round(float(np.percentile(samples, 99)), 3),
+            })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""gRPC load generation shared by the ranker benchmarks."""
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List
+
+import grpc
+import numpy as np
+
+from services.ranker import ranker_pb2, ranker_pb2_grpc
+
+
+def make_requests(n: int, candidates: int, top_k: int = 0, seed: int = 0) -> List[ranker_pb2.RankRequest]:
+    rng = np.random.default_rng(seed)
+    return [
+        ranker_pb2.RankRequest(
+            viewer_id=f"v{rng.integers(1_000_000)}",
+            candidate_ids=[f"c{i}" for i in rng.integers(0, 1_000_000, candidates)],
+            top_k=top_k,
+        )
+        for _ in range(n)
+    ]
+
+
+def wait_ready(target: str, timeout_s: float = 120.0) -> None:
+    channel = grpc.insecure_channel(target)
+    grpc.channel_ready_future(channel).result(timeout=timeout_s)
+    channel.close()
+
+
+def closed_loop(target: str, clients: int, seconds: float, requests: List[ranker_pb2.RankRequest]) -> Dict:
+    """``clients`` threads each send back-to-back requests for ``seconds``."""
+    channel = grpc.insecure_channel(
+        target, options=[("grpc.max_send_message_length", 64 << 20), ("grpc.max_receive_message_length", 64 << 20)]
+    )
+    stub = ranker_pb2_grpc.RankerStub(channel)
+    latencies: List[List[float]] = [[] for _ in range(clients)]
+    errors = [0] * clients
+    stop = time.perf_counter() + seconds
+
+    def client(i):
+        j = i
+        while time.perf_counter() < stop:
+            t0 = time.perf_counter()
+            try:
+                stub.Rank(requests[j % len(requests)], timeout=10)
+                latencies[i].append(time.perf_counter() - t0)
+            except grpc.RpcError:
+                errors[i] += 1
+            j += clients
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    channel.close()
+    return summarize(np.concatenate([np.asarray(x) for x in latencies]), elapsed, sum(errors))
+
+
+def open_loop(
+    target: str, qps: float, seconds: float, requests: List[ranker_pb2.RankRequest], max_in_flight: int = 1000
+) -> Dict:
+    """Send at a fixed ``qps`` regardless of how fast responses come back.
+
+    Latency is measured from each request's scheduled send time, so a server
+    that falls behind shows it in the percentiles instead of silently
+    lowering the offered load. Requests that would exceed ``max_in_flight``
+    are not sent and count as ``dropped``.
+    """
+    channel = grpc.insecure_channel(
+        target, options=[("grpc.max_send_message_length", 64 << 20), ("grpc.max_receive_message_length", 64 << 20)]
+    )
+    stub = ranker_pb2_grpc.RankerStub(channel)
+    latencies: List[float] = []
+    errors = [0]
+    in_flight = [0]
+    dropped = 0
+    lock = threading.Lock()
+    done = threading.Condition(lock)
+
+    def finished(scheduled):
+        def callback(fut):
+            now = time.perf_counter()
+            with lock:
+                if fut.exception() is None:
+                    latencies.append(now - scheduled)
+                else:
+                    errors[0] += 1
+                in_flight[0] -= 1
+                done.notify_all()
+        return callback
+
+    interval = 1.0 / qps
+    total = int(qps * seconds)
+    t0 = time.perf_counter()
+    for i in range(total):
+        scheduled = t0 + i * interval
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        with lock:
+            if in_flight[0] >= max_in_flight:
+                dropped += 1
+                continue
+            in_flight[0] += 1
+        fut = stub.Rank.future(requests[i % len(requests)], timeout=10)
+        fut.add_done_callback(finished(scheduled))
+    with lock:
+        done.wait_for(lambda: in_flight[0] == 0, timeout=15)
+    elapsed = time.perf_counter() - t0
+    channel.close()
+    stats = summarize(np.asarray(latencies), elapsed, errors[0])
+    stats.update(offered_qps=qps, dropped=dropped)
+    return stats
+
+
+def process_cpu_seconds(pid: int) -> float:
+    """User + system CPU of ``pid`` and its direct children (Linux ``/proc``)."""
+    ticks = os.sysconf("SC_CLK_TCK")
+    total = 0.0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # the command name may contain spaces; fields follow the last ')'
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(entry) == pid or int(fields[1]) == pid:
+            total += (int(fields[11]) + int(fields[12])) / ticks
+    return total
+
+
+def summarize(latencies_s: np.ndarray, elapsed_s: float, errors: int = 0) -> Dict:
+    ms = latencies_s * 1000
+    if not len(ms):
+        return {"requests": 0, "errors": errors, "rps": 0.0}
+    return {
+        "requests": int(len(ms)),
+        "errors": errors,
+        "rps": round(len(ms) / elapsed_s, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def spawn_server(port: int, env: Dict[str, str]) -> subprocess.Popen:
+    """Start ``services.ranker.bench.serve`` in a subprocess with ``env`` overrides."""
+    return subprocess.Popen(
+        [sys.executable, "-m", "services.ranker.bench.serve", "--port", str(port)],
+        env={**os.environ, **env},
+    )
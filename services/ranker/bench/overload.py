@@ -0,0 +1,72 @@
+"""Tail latency of the ranker under overload, with and without admission control.
+
+    python -m services.ranker.bench.overload --load 0.8 2 4 --candidates 200
+
+Measures the server's capacity closed-loop, then offers ``--load`` times that
+capacity open-loop, once with admission control off
+(``RANKER_ADMISSION_LIMIT=0``) and once with the defaults. Without it p99
+grows with the length of the run as gRPC's executor queue fills; with it the
+excess is shed as ``RESOURCE_EXHAUSTED`` and the p99 of the calls that are
+served stays near the service time plus ``RANKER_ADMISSION_TARGET_WAIT_MS``.
+Each row is printed as JSON; ``shed`` is the fraction of calls rejected.
+"""
+import argparse
+import json
+import os
+
+from services.ranker.bench.load import closed_loop, make_requests, open_loop, spawn_server, wait_ready
+from services.ranker.bench.synthetic import synthetic_model
+
+
+def run(port, env, requests, loads, capacity, seconds):
+    server = spawn_server(port, env)
+    target = f"localhost:{port}"
+    rows = []
+    try:
+        wait_ready(target)
+        open_loop(target, capacity * 0.5, 1.0, requests)  # warm-up
+        for load in loads:
+            stats = open_loop(target, capacity * load, seconds, requests, max_in_flight=10_000)
+            sent = stats["requests"] + stats["errors"]
+            stats["shed"] = round(stats["errors"] / sent, 3) if sent else 0.0
+            rows.append({"load": load, **stats})
+    finally:
+        server.terminate()
+        server.wait()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--load", type=float, nargs="+", default=[0.8, 2.0, 4.0])
+    parser.add_argument("--candidates", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--trees", type=int, default=300)
+    parser.add_argument("--leaves", type=int, default=255)
+    parser.add_argument("--port", type=int, default=50073)
+    args = parser.parse_args()
+
+    model_path = synthetic_model(trees=args.trees, leaves=args.leaves)
+    base = {
+        "MODEL_PATH": model_path,
+        "RANKER_BACKEND": os.getenv("RANKER_BACKEND", "lightgbm"),
+        "RANKER_RESULT_CACHE_MAX_IDS": "0",
+    }
+    requests = make_requests(256, args.candidates, seed=args.candidates)
+
+    server = spawn_server(args.port, {**base, "RANKER_ADMISSION_LIMIT": "0"})
+    try:
+        wait_ready(f"localhost:{args.port}")
+        capacity = closed_loop(f"localhost:{args.port}", 4, 3.0, requests)["rps"]
+    finally:
+        server.terminate()
+        server.wait()
+    print(json.dumps({"capacity_rps": capacity}), flush=True)
+
+    for mode, env in (("unbounded", {"RANKER_ADMISSION_LIMIT": "0"}), ("admission", {})):
+        for row in run(args.port, {**base, **env}, requests, args.load, capacity, args.seconds):
+            print(json.dumps({"mode": mode, **row}), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Ranker load test with a latency regression check.
+
+    python -m services.ranker.bench.regression --qps 50 100 200 --candidates 200 1000 \
+        --results ranker-load.json --baseline ranker-load-baseline.json
+
+Starts the real gRPC server (``bench.serve``) on the synthetic production
+shape model (300 trees, 255 leaves), drives it open-loop at each ``--qps``
+for each ``--candidates`` count and writes throughput, p50/p95/p99 and
+server CPU milliseconds per request to ``--results``.
+
+Each scenario is compared with the same (candidates, qps) scenario in
+``--baseline``. A p50/p95/p99 or CPU-per-request more than ``--tolerance``
+above the baseline, or a throughput that much below it, is reported as a
+regression and the command exits 1. So is a metric the baseline has and the
+run lacks (no request succeeded), and a share of failed or dropped requests
+more than ``--error-tolerance`` (default 0) above the baseline's.
+``--save-baseline`` writes the run as the new baseline instead; baselines
+only compare on the host they were recorded on.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import lightgbm as lgb
+
+from services.ranker.bench.load import make_requests, open_loop, process_cpu_seconds, spawn_server, wait_ready
+from services.ranker.bench.synthetic import synthetic_model
+from services.ranker.concurrency import available_cores
+
+HIGHER_IS_WORSE = ("p50_ms", "p95_ms", "p99_ms", "cpu_ms_per_request")
+LOWER_IS_WORSE = ("rps",)
+
+
+def run_scenario(target, pid, qps, candidates, seconds, warmup_s):
+    requests = make_requests(256, candidates, seed=candidates)
+    open_loop(target, qps, warmup_s, requests)
+    cpu0 = process_cpu_seconds(pid)
+    stats = open_loop(target, qps, seconds, requests)
+    cpu = process_cpu_seconds(pid) - cpu0
+    stats["cpu_ms_per_request"] = round(cpu * 1000 / stats["requests"], 3) if stats["requests"] else None
+    return {"candidates": candidates, "qps": qps, **stats}
+
+
+def error_rate(s) -> float:
+    """Share of the scenario's sent requests that failed or were dropped."""
+    failed = s.get("errors", 0) + s.get("dropped", 0)
+    total = s.get("requests", 0) + failed
+    return failed / total if total else 0.0
+
+
+def compare(results, baseline, tolerance, error_tolerance=0.0):
+    """Human-readable regressions of ``results`` against ``baseline``."""
+    base = {(s["candidates"], s["qps"]): s for s in baseline["scenarios"]}
+    problems = []
+    for s in results["scenarios"]:
+        ref = base.get((s["candidates"], s["qps"]))
+        if ref is None:
+            continue
+        where = f"{s['candidates']} candidates @ {s['qps']} qps"
+        new_rate, old_rate = error_rate(s), error_rate(ref)
+        if new_rate > old_rate + error_tolerance:
+            problems.append(f"{where}: error rate {old_rate:.2%} -> {new_rate:.2%}")
+        for metric in HIGHER_IS_WORSE + LOWER_IS_WORSE:
+            new, old = s.get(metric), ref.get(metric)
+            if not old:
+                continue
+            if not new:
+                # every request failed: no latency, no CPU per request, no throughput
+                problems.append(f"{where}: {metric} {old} -> {new}")
+                continue
+            worse = new > old * (1 + tolerance) if metric in HIGHER_IS_WORSE else new < old * (1 - tolerance)
+            if worse:
+                problems.append(f"{where}: {metric} {old} -> {new} ({(new / old - 1) * 100:+.0f}%)")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--qps", type=float, nargs="+", default=[50, 100, 200])
+    parser.add_argument("--candidates", type=int, nargs="+", default=[200, 1000])
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--trees", type=int, default=300)
+    parser.add_argument("--leaves", type=int, default=255)
+    parser.add_argument("--port", type=int, default=50072)
+    parser.add_argument("--results", default="ranker-load.json")
+    parser.add_argument("--baseline", default="ranker-load-baseline.json")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--error-tolerance", type=float, default=0.0, help="allowed rise in the error rate")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    model_path = synthetic_model(trees=args.trees, leaves=args.leaves)
+    env = {
+        "MODEL_PATH": model_path,
+        "RANKER_BACKEND": os.getenv("RANKER_BACKEND", "lightgbm"),
+        # repeated requests would otherwise be answered from the result cache
+        "RANKER_RESULT_CACHE_MAX_IDS": "0",
+    }
+    server = spawn_server(args.port, env)
+    target = f"localhost:{args.port}"
+    try:
+        wait_ready(target)
+        scenarios = []
+        for candidates in args.candidates:
+            for qps in args.qps:
+                row = run_scenario(target, server.pid, qps, candidates, args.seconds, args.warmup)
+                print(json.dumps(row), flush=True)
+                scenarios.append(row)
+    finally:
+        server.terminate()
+        server.wait()
+
+    results = {
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "host": {
+            "cores": len(available_cores()),
+            "machine": platform.machine(),
+            "python": platform.python_version(),
+            "lightgbm": lgb.__version__,
+        },
+        "model": {"trees": args.trees, "leaves": args.leaves, "backend": env["RANKER_BACKEND"]},
+        "scenarios": scenarios,
+    }
+    with open(args.baseline if args.save_baseline else args.results, "w") as f:
+        json.dump(results, f, indent=2)
+    if args.save_baseline:
+        print(f"baseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; record one with --save-baseline")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("host") != results["host"] or baseline.get("model") != results["model"]:
+        print("warning: baseline was recorded on a different host or model shape", file=sys.stderr)
+    problems = compare(results, baseline, args.tolerance, args.error_tolerance)
+    for p in problems:
+        print(f"REGRESSION {p}")
+    if problems:
+        sys.exit(1)
+    print(f"no regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""gRPC-only ranker process for benchmarks (no FastAPI / uvicorn).
+
+Reads the same environment as ``services.ranker.server``.
+"""
+import argparse
+import signal
+
+from services.ranker.concurrency import ConcurrencyConfig, available_cores, start_workers, stop_workers
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=50051)
+    args = parser.parse_args()
+
+    cfg = ConcurrencyConfig.from_env()
+    if cfg.processes > 1:
+        workers = start_workers(args.port, cfg)
+        signal.signal(signal.SIGTERM, lambda *_: stop_workers(workers))
+        for w in workers:
+            w.join()
+        return
+
+    from services.ranker import main as ranker
+
+    ranker.load_model(cfg, cores=len(available_cores()))
+    server = ranker.serve_grpc(args.port, workers=cfg.grpc_workers)
+    signal.signal(signal.SIGTERM, lambda *_: server.stop(grace=1))
+    server.wait_for_termination()
+
+
+if __name__ == "__main__":
+    main()
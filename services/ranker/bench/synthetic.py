@@ -0,0 +1,57 @@
+"""Synthetic LightGBM ranker of production shape for benchmarks.
+
+``ml/offline_train_ranker.py`` trains 300 trees with 255 leaves; inference
+cost is dominated by that shape rather than by what the trees learned, so
+benchmarks train the same shape on random data and cache it on disk.
+"""
+import json
+import os
+import tempfile
+from typing import Optional
+
+import lightgbm as lgb
+import numpy as np
+
+
+def synthetic_data(rows: int, n_features: int, seed: int = 0):
+    """Features and 0-3 relevance labels driven by the first five columns."""
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((rows, n_features)).astype(np.float32)
+    signal = X[:, : min(5, n_features)].sum(axis=1) + rng.standard_normal(rows)
+    y = np.digitize(signal, np.quantile(signal, [0.5, 0.8, 0.95]))
+    return X, y
+
+
+def synthetic_model(
+    n_features: int = 40,
+    trees: int = 300,
+    leaves: int = 255,
+    rows: int = 50_000,
+    cache_dir: Optional[str] = None,
+) -> str:
+    """Path to a cached ``ranker_synthetic-*.txt`` model (trained on first use).
+
+    A ``feature_map.json`` for the ``f0..fN`` columns is written next to it.
+    """
+    cache_dir = cache_dir or os.getenv("RANKER_BENCH_DIR") or os.path.join(tempfile.gettempdir(), "ranker-bench")
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"ranker_synthetic-{n_features}f-{trees}t-{leaves}l.txt")
+    with open(os.path.join(cache_dir, "feature_map.json"), "w") as f:
+        json.dump({f"f{i}": i for i in range(n_features)}, f)
+    if os.path.exists(path):
+        return path
+    X, y = synthetic_data(rows, n_features)
+    model = lgb.LGBMRanker(
+        objective="lambdarank",
+        num_leaves=leaves,
+        n_estimators=trees,
+        learning_rate=0.05,
+        min_data_in_bin=1,
+        min_data_in_leaf=1,
+        verbose=-1,
+    )
+    model.fit(X, y, group=[100] * (rows // 100))
+    tmp = f"{path}.{os.getpid()}.tmp"
+    model.booster_.save_model(tmp)
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,45 @@
+"""Full tuple sort vs ``top_k_order`` for large Rank requests.
+
+    python -m services.ranker.bench.top_k --candidates 10000 --top-k 20 50
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from services.ranker.ranking import top_k_order
+
+
+def timed(fn, repeat):
+    samples = np.empty(repeat)
+    for r in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples[r] = (time.perf_counter() - t0) * 1000
+    return {"p50_ms": round(float(np.percentile(samples, 50)), 4), "p99_ms": round(float(np.percentile(samples, 99)), 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--candidates", type=int, default=10_000)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[20, 50])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    scores = rng.random(args.candidates)
+    cids = [f"c{i}" for i in range(args.candidates)]
+
+    def legacy():
+        return [cid for _, cid in sorted(zip(scores, cids), reverse=True)]
+
+    report = {"candidates": args.candidates, "sorted_zip": timed(legacy, args.repeat)}
+    report["top_k_order[all]"] = timed(lambda: [cids[i] for i in top_k_order(scores)], args.repeat)
+    for k in args.top_k:
+        report[f"top_k_order[{k}]"] = timed(lambda: [cids[i] for i in top_k_order(scores, k)], args.repeat)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
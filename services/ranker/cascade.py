@@ -0,0 +1,81 @@
+"""Two-stage cascade scoring.
+
+Stage one scores every candidate with a cheap model: either the first
+``RANKER_CASCADE_TREES`` trees of the served booster or a separately trained
+``RANKER_CASCADE_MODEL``. Only the stage-one top ``RANKER_CASCADE_RESCORE``
+are re-scored with the full model and ranked by it; the remaining candidates
+follow in stage-one order, carrying their stage-one scores.
+
+``python -m services.ranker.bench.cascade`` reports the NDCG cost and latency
+win of a setting before it is turned on.
+"""
+import os
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+import lightgbm as lgb
+import numpy as np
+
+from . import backends
+from .ranking import top_k_order
+
+
+@dataclass(frozen=True)
+class Cascade:
+    first: backends.Backend
+    rescore: int
+    label: str
+
+    def rank(
+        self, feats, full_predict: Callable[[np.ndarray], np.ndarray], k: int = 0
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """``(order, scores)`` like ``top_k_order`` + ``scores[order]`` on the full model."""
+        X = np.asarray(feats, dtype=np.float32)
+        first = np.asarray(self.first.predict(X), dtype=np.float64)
+        head = top_k_order(first, self.rescore)
+        full = np.asarray(full_predict(X[head]), dtype=np.float64)
+        by_full = top_k_order(full)
+        order, scores = head[by_full], full[by_full]
+        if 0 < k <= len(order):
+            return order[:k], scores[:k]
+        rest = top_k_order(first)[len(head):]
+        if k > 0:
+            rest = rest[: k - len(order)]
+        return np.concatenate((order, rest)), np.concatenate((scores, first[rest]))
+
+
+def truncated(booster: lgb.Booster, trees: int) -> lgb.Booster:
+    """A booster holding only the first ``trees`` iterations of ``booster``."""
+    return lgb.Booster(model_str=booster.model_to_string(num_iteration=trees))
+
+
+def build(
+    booster: lgb.Booster,
+    trees: int = 0,
+    rescore: int = 200,
+    model_path: Optional[str] = None,
+    num_threads: int = 0,
+    backend: Optional[str] = None,
+) -> Optional[Cascade]:
+    """Stage one from ``model_path`` if given, else from the first ``trees`` trees; None if neither."""
+    if model_path:
+        light = lgb.Booster(model_file=model_path)
+        if light.num_feature() != booster.num_feature():
+            raise ValueError(f"cascade model has {light.num_feature()} features, ranker has {booster.num_feature()}")
+        label = os.path.splitext(os.path.basename(model_path))[0]
+    elif 0 < trees < booster.current_iteration():
+        light = truncated(booster, trees)
+        label = f"first-{trees}-trees"
+    else:
+        return None
+    return Cascade(backends.load_backend(light, backend, num_threads), rescore, label)
+
+
+def from_env(booster: lgb.Booster, num_threads: int = 0) -> Optional[Cascade]:
+    return build(
+        booster,
+        trees=int(os.getenv("RANKER_CASCADE_TREES", "0")),
+        rescore=int(os.getenv("RANKER_CASCADE_RESCORE", "200")),
+        model_path=os.getenv("RANKER_CASCADE_MODEL") or None,
+        num_threads=num_threads,
+    )
@@ -0,0 +1,123 @@
+"""How the ranker spreads work over the host's cores.
+
+Three knobs interact: gRPC handler threads (requests in flight per process),
+LightGBM/OpenMP threads per ``predict`` call, and the number of server
+processes. Leaving all of them at their defaults oversubscribes the host
+(every in-flight request starts an OpenMP team the size of the machine), so
+they are configured together:
+
+* ``RANKER_GRPC_WORKERS``    - handler threads per process (default 2)
+* ``RANKER_PREDICT_THREADS`` - threads per predict; 0 means cores per process
+  divided by handler threads, at least 1
+* ``RANKER_PROCESSES``       - >1 starts that many gRPC processes sharing the
+  port via SO_REUSEPORT, each pinned to its own slice of the cores
+
+In multi-process mode the workers write their metrics to files under
+``PROMETHEUS_MULTIPROC_DIR`` (a fresh temporary directory unless set; emptied
+on start) and the supervisor's ``/metrics`` sums them across workers. Gauges
+carry a ``pid`` label, and exemplars and the ``ranker_model`` info metric are
+not exported in this mode. The supervisor itself serves only ``/healthz`` and
+``/metrics`` and never loads a model. The ``ReloadModel`` RPC only reaches the process that accepted the call; use
+``RANKER_MODEL_WATCH_S`` to roll a new model out to all of them.
+
+Admission control (``RANKER_ADMISSION_*``, see ``services.admission``) sits on
+top: it starts at ``RANKER_GRPC_WORKERS`` concurrent Rank calls, adapts the
+limit to observed latency and sheds calls that would queue too long.
+"""
+import multiprocessing
+import os
+import signal
+import tempfile
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+def available_cores() -> List[int]:
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:  # not Linux
+        return list(range(os.cpu_count() or 1))
+
+
+@dataclass
+class ConcurrencyConfig:
+    grpc_workers: int = 2
+    predict_threads: int = 0
+    processes: int = 1
+
+    @classmethod
+    def from_env(cls) -> "ConcurrencyConfig":
+        return cls(
+            grpc_workers=int(os.getenv("RANKER_GRPC_WORKERS", "2")),
+            predict_threads=int(os.getenv("RANKER_PREDICT_THREADS", "0")),
+            processes=int(os.getenv("RANKER_PROCESSES", "1")),
+        )
+
+    def core_slices(self, cores: Optional[List[int]] = None) -> List[List[int]]:
+        """Split ``cores`` into ``processes`` contiguous, near-equal slices."""
+        cores = cores if cores is not None else available_cores()
+        n = max(1, min(self.processes, len(cores)))
+        return [list(s) for s in _split(cores, n)]
+
+    def threads_per_predict(self, cores: int) -> int:
+        if self.predict_threads > 0:
+            return self.predict_threads
+        return max(1, cores // max(1, self.grpc_workers))
+
+
+def _split(items: List[int], n: int):
+    k, extra = divmod(len(items), n)
+    start = 0
+    for i in range(n):
+        end = start + k + (1 if i < extra else 0)
+        yield items[start:end]
+        start = end
+
+
+def _worker(port: int, cfg: ConcurrencyConfig, cores: List[int]) -> None:
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    from . import main
+
+    main.load_model(cfg, cores=len(cores))
+    server = main.serve_grpc(port, workers=cfg.grpc_workers)
+    signal.signal(signal.SIGTERM, lambda *_: server.stop(grace=5))
+    server.wait_for_termination()
+
+
+def prepare_metrics_dir() -> str:
+    """Point ``PROMETHEUS_MULTIPROC_DIR`` at an empty directory and return it.
+
+    Files left by an earlier run would otherwise be summed into the new one.
+    """
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR") or tempfile.mkdtemp(prefix="ranker-metrics-")
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    return path
+
+
+def start_workers(port: int, cfg: ConcurrencyConfig) -> List[multiprocessing.Process]:
+    """Spawn one pinned gRPC process per core slice.
+
+    ``spawn`` rather than ``fork``: the OpenMP runtime LightGBM uses is not
+    fork-safe once initialised. A spawned worker imports ``prometheus_client``
+    afresh, after ``prepare_metrics_dir`` has set the directory it writes to.
+    """
+    prepare_metrics_dir()
+    ctx = multiprocessing.get_context("spawn")
+    procs = []
+    for cores in cfg.core_slices():
+        proc = ctx.Process(target=_worker, args=(port, cfg, cores), daemon=True)
+        proc.start()
+        procs.append(proc)
+    return procs
+
+
+def stop_workers(procs: List[multiprocessing.Process]) -> None:
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        proc.join()
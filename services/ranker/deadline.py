@@ -0,0 +1,91 @@
+"""Deadline-aware shortcuts for ``Rank``.
+
+When the caller set a gRPC deadline, ``Rank`` checks the time left before
+fetching and before scoring against what those phases have recently cost
+per candidate (an EWMA kept by ``CostModel``). Each ``ServedModel`` (so each
+experiment arm) has its own ``CostModel``, and cascade scoring is tracked
+apart from full-model predicts. When the full path would not fit it
+degrades instead of running into DEADLINE_EXCEEDED:
+
+* ``truncated``      - only a prefix of the candidates is fetched / scored
+* ``fallback_model`` - scores come from a cheaper model: the cascade's stage
+  one if there is one, else the first ``RANKER_FALLBACK_TREES`` trees
+* ``unscored``       - no time for anything: candidates in request order
+
+Degraded responses carry ``degraded=True`` and the reason, and are counted
+in ``rank_degraded_total{reason}``. ``RANKER_DEADLINE_RESERVE_MS`` is kept
+back for sorting, serialising and the network.
+"""
+import os
+import threading
+from typing import Optional
+
+import lightgbm as lgb
+from prometheus_client import Counter
+
+from . import backends
+from .cascade import truncated
+
+TRUNCATED = "truncated"
+FALLBACK_MODEL = "fallback_model"
+UNSCORED = "unscored"
+
+RESERVE_MS = float(os.getenv("RANKER_DEADLINE_RESERVE_MS", "2"))
+
+rank_degraded_total = Counter("rank_degraded_total", "Rank calls that degraded to meet the deadline", ["reason"])
+
+
+def remaining_ms(context) -> Optional[float]:
+    """Milliseconds left before the caller's deadline minus the reserve; None without a deadline."""
+    left = context.time_remaining() if context is not None else None
+    if left is None or left > 1e6:  # grpc reports "no deadline" as a huge number
+        return None
+    return left * 1000 - RESERVE_MS
+
+
+class CostModel:
+    """Per-candidate cost of each phase, as an EWMA over requests (truncated ones included).
+
+    Phases are ``fetch``, ``predict`` (full model) and ``cascade`` (stage one
+    plus rescoring its head); the cascade starts at the full predict's prior.
+    """
+
+    def __init__(self, fetch_ms: float = 0.02, predict_ms: float = 0.05, alpha: float = 0.05):
+        self.per_candidate = {"fetch": fetch_ms, "predict": predict_ms, "cascade": predict_ms}
+        self.alpha = alpha
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "CostModel":
+        return cls(
+            float(os.getenv("RANKER_FETCH_MS_PER_CANDIDATE", "0.02")),
+            float(os.getenv("RANKER_PREDICT_MS_PER_CANDIDATE", "0.05")),
+        )
+
+    def observe(self, phase: str, candidates: int, elapsed_ms: float) -> None:
+        if candidates <= 0:
+            return
+        with self._lock:
+            prev = self.per_candidate[phase]
+            self.per_candidate[phase] = prev + self.alpha * (elapsed_ms / candidates - prev)
+
+    def estimate(self, *phases: str, candidates: int) -> float:
+        return sum(self.per_candidate[p] for p in phases) * candidates
+
+    def fits(self, budget_ms: float, *phases: str) -> int:
+        """How many candidates ``phases`` can handle within ``budget_ms``."""
+        per = sum(self.per_candidate[p] for p in phases)
+        return int(budget_ms / per) if per > 0 else 1 << 30
+
+
+def degraded(reason: str) -> str:
+    rank_degraded_total.labels(reason).inc()
+    return reason
+
+
+def fallback_backend(booster: lgb.Booster, backend_name: str, num_threads: int = 0) -> Optional[backends.Backend]:
+    """First ``RANKER_FALLBACK_TREES`` trees (default 50, 0 disables) on the served backend."""
+    trees = int(os.getenv("RANKER_FALLBACK_TREES", "50"))
+    if not 0 < trees < booster.current_iteration():
+        return None
+    return backends.build_backend(backend_name, truncated(booster, trees), num_threads)
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Sequence, Tuple
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+feature_cache_hits_total = Counter("feature_cache_hits_total", "Candidate feature rows served from the in-process cache")
+feature_cache_misses_total = Counter("feature_cache_misses_total", "Candidate feature rows fetched from the feature store")
+feature_cache_evictions_total = Counter("feature_cache_evictions_total", "Candidate feature rows evicted (LRU)")
+feature_cache_rows = Gauge("feature_cache_rows", "Candidate feature rows currently cached")
+
+
+class CandidateFeatureCache:
+    """Bounded LRU of raw candidate feature rows.
+
+    Rows live in one preallocated ``(capacity, width)`` float32 slab; the only
+    per-key Python object is the ``id -> slot`` entry that tracks LRU order.
+    Rows expire ``ttl_s`` after they were fetched, which should match how
+    often the candidate features are recomputed upstream.
+    """
+
+    def __init__(self, width: int, max_bytes: int, ttl_s: float):
+        self.width = width
+        self.capacity = max(1, max_bytes // (4 * max(width, 1)))
+        self.ttl_s = ttl_s
+        self._slab = np.empty((self.capacity, width), dtype=np.float32)
+        self._expires = np.zeros(self.capacity, dtype=np.float64)
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._free = list(range(self.capacity - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def get(self, keys: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return ``(rows, miss_idx)``; rows at ``miss_idx`` are uninitialised."""
+        n = len(keys)
+        out = np.empty((n, self.width), dtype=np.float32)
+        now = time.monotonic()
+        size = None
+        with self._lock:
+            get = self._slots.get
+            slots = np.fromiter((get(k, -1) for k in keys), dtype=np.int64, count=n)
+            hit = slots >= 0
+            stale = hit & (self._expires[np.where(hit, slots, 0)] < now)
+            if stale.any():
+                for i in np.flatnonzero(stale):
+                    slot = self._slots.pop(keys[i], None)
+                    if slot is not None:
+                        self._free.append(slot)
+                hit &= ~stale
+                size = len(self._slots)
+            hit_idx = np.flatnonzero(hit)
+            for i in hit_idx:
+                self._slots.move_to_end(keys[i])
+            out[hit_idx] = self._slab[slots[hit_idx]]
+        feature_cache_hits_total.inc(len(hit_idx))
+        feature_cache_misses_total.inc(n - len(hit_idx))
+        if size is not None:
+            # expired rows left the cache too
+            feature_cache_rows.set(size)
+        return out, np.flatnonzero(~hit)
+
+    def put(self, keys: Sequence[str], rows: np.ndarray) -> None:
+        if not len(keys):
+            return
+        expires = time.monotonic() + self.ttl_s
+        slots = np.empty(len(keys), dtype=np.int64)
+        evicted = 0
+        with self._lock:
+            for i, key in enumerate(keys):
+                slot = self._slots.get(key)
+                if slot is None:
+                    if self._free:
+                        slot = self._free.pop()
+                    else:
+                        _, slot = self._slots.popitem(last=False)
+                        evicted += 1
+                    self._slots[key] = slot
+                else:
+                    self._slots.move_to_end(key)
+                slots[i] = slot
+            self._slab[slots] = rows
+            self._expires[slots] = expires
+            size = len(self._slots)
+        feature_cache_evictions_total.inc(evicted)
+        feature_cache_rows.set(size)
@@ -1,12 +1,173 @@
-from typing import List
+import logging
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
 import numpy as np
+from prometheus_client import Counter
+
+from .feature_cache import CandidateFeatureCache
+
+log = logging.getLogger(__name__)
+
+VIEWER_PREFIX = "feat:viewer:"
+CANDIDATE_PREFIX = "feat:cand:"
+
+feature_missing_values_total = Counter(
+    "feature_missing_values_total", "Candidate feature values absent from Redis, by fallback used", ["fallback"]
+)
+feature_missing_rows_total = Counter(
+    "feature_missing_rows_total", "Candidates with no features in Redis at all"
+)
+_filled_from_viewer = feature_missing_values_total.labels("viewer")
+_filled_from_default = feature_missing_values_total.labels("default")
+
+
+def feature_names(feature_map: Dict[str, int]) -> List[str]:
+    """Feature names in model column order."""
+    return sorted(feature_map, key=feature_map.__getitem__)
+
+
+class FeatureFetcher:
+    """Reads ranker features from Redis hashes.
+
+    Viewer features live in ``feat:viewer:<id>`` and candidate features in
+    ``feat:cand:<id>``, one hash field per ``feature_map.json`` name. A value on
+    the candidate hash wins over the viewer hash; anything missing from both
+    falls back to ``defaults`` (or ``default``).
+
+    With a ``cache``, candidate rows are served from it where possible and
+    only the misses go to Redis.
+    """
+
+    def __init__(
+        self,
+        redis,
+        feature_map: Dict[str, int],
+        defaults: Optional[Dict[str, float]] = None,
+        default: float = 0.0,
+        cache: Optional[CandidateFeatureCache] = None,
+        snapshots=None,
+    ):
+        self.redis = redis
+        self.cache = cache
+        self.snapshots = snapshots
+        self.names = feature_names(feature_map)
+        defaults = defaults or {}
+        self.defaults = np.array([defaults.get(n, default) for n in self.names], dtype=np.float32)
+
+    @property
+    def width(self) -> int:
+        return len(self.names)
+
+    def fetch(self, viewer_id: str, candidate_ids: Sequence[str]) -> np.ndarray:
+        """Viewer + candidate features in one pipelined round trip.
+
+        Candidate rows come from the feature snapshot, then the cache, and
+        only what neither has goes to Redis.
+        """
+        snapshot = self.snapshots.current if self.snapshots is not None else None
+        if snapshot is None and self.cache is None:
+            viewer, out = self.fetch_raw(viewer_id, candidate_ids)
+            return self.assemble(viewer, out)
+        if snapshot is not None:
+            out, miss = snapshot.lookup(candidate_ids)
+        else:
+            out = np.empty((len(candidate_ids), self.width), dtype=np.float32)
+            miss = np.arange(len(candidate_ids))
+        if self.cache is not None and len(miss):
+            cached, cache_miss = self.cache.get([candidate_ids[i] for i in miss])
+            out[miss] = cached
+            miss = miss[cache_miss]
+        missing = [candidate_ids[i] for i in miss]
+        viewer, fetched = self.fetch_raw(viewer_id, missing)
+        out[miss] = fetched
+        if self.cache is not None:
+            self.cache.put(missing, fetched)
+        return self.assemble(viewer, out)
+
+    def fetch_raw(self, viewer_id: str, candidate_ids: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """``(viewer_row, candidate_rows)`` with NaN where Redis has no value."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hmget(VIEWER_PREFIX + viewer_id, self.names)
+        for cid in candidate_ids:
+            pipe.hmget(CANDIDATE_PREFIX + cid, self.names)
+        rows = pipe.execute()
+        return self.decode(rows[:1])[0], self.decode(rows[1:])
+
+    def fetch_viewer(self, viewer_id: str) -> np.ndarray:
+        return self.decode([self.redis.hmget(VIEWER_PREFIX + viewer_id, self.names)])[0]
+
+    def decode(self, rows: List[List[Optional[bytes]]]) -> np.ndarray:
+        out = np.empty((len(rows), self.width), dtype=np.float32)
+        if rows:
+            flat = [b"nan" if v is None else v for row in rows for v in row]
+            # numpy parses the byte strings while casting into ``out``
+            out[:] = np.array(flat, dtype=np.bytes_).reshape(out.shape)
+        return out
+
+    def assemble(self, viewer: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        """Fill NaNs in ``candidates`` in place: viewer values first, then defaults."""
+        missing = np.isnan(candidates)
+        n_missing = int(np.count_nonzero(missing))
+        if not n_missing:
+            return candidates
+        feature_missing_rows_total.inc(int(np.count_nonzero(missing.all(axis=1))))
+        np.copyto(candidates, viewer, where=missing)
+        missing = np.isnan(candidates, out=missing)
+        n_default = int(np.count_nonzero(missing))
+        _filled_from_viewer.inc(n_missing - n_default)
+        if n_default:
+            _filled_from_default.inc(n_default)
+            np.copyto(candidates, self.defaults, where=missing)
+        return candidates
+
+
+_fetcher: Optional[FeatureFetcher] = None
+_placeholder_width = 4
+
+
+def configure(feature_map: Dict[str, int], redis_url: Optional[str] = None) -> Optional[FeatureFetcher]:
+    """Point ``fetch_features`` at Redis; without ``REDIS_URL`` keep the placeholder."""
+    global _fetcher, _placeholder_width
+    _placeholder_width = len(feature_map)
+    redis_url = redis_url or os.getenv("REDIS_URL")
+    if not redis_url:
+        log.warning("REDIS_URL not set; ranker features are random placeholders")
+        _fetcher = None
+        return None
+    import redis
+
+    pool = redis.ConnectionPool.from_url(
+        redis_url, max_connections=int(os.getenv("FEATURE_REDIS_POOL_SIZE", "16"))
+    )
+    cache = None
+    cache_mb = int(os.getenv("FEATURE_CACHE_MAX_MB", "256"))
+    if cache_mb > 0:
+        cache = CandidateFeatureCache(
+            len(feature_map),
+            cache_mb << 20,
+            ttl_s=float(os.getenv("FEATURE_CACHE_TTL_S", "300")),
+        )
+    snapshots = None
+    snapshot_dir = os.getenv("FEATURE_SNAPSHOT_DIR")
+    if snapshot_dir:
+        from .feature_snapshot import SnapshotStore
+
+        snapshots = SnapshotStore(
+            snapshot_dir, feature_map, poll_s=float(os.getenv("FEATURE_SNAPSHOT_POLL_S", "30"))
+        ).start()
+    _fetcher = FeatureFetcher(redis.Redis(connection_pool=pool), feature_map, cache=cache, snapshots=snapshots)
+    return _fetcher
 
 
 def fetch_features(viewer_id: str, candidate_ids: List[str]) -> np.ndarray:
-    """Placeholder feature store lookup.
+    """Feature matrix for ``candidate_ids``, columns ordered by ``feature_map``.
 
-    Production implementation should query Redis. Tests may monkeypatch this
+    Uses the fetcher installed by ``configure``. Without one (local dev, no
+    Redis) it returns seeded random numbers; tests may monkeypatch this
     function to provide deterministic features.
     """
+    if _fetcher is not None:
+        return _fetcher.fetch(viewer_id, candidate_ids)
     rng = np.random.default_rng(abs(hash(viewer_id)) % 2**32)
-    return rng.random((len(candidate_ids), 4), dtype=np.float32)
+    return rng.random((len(candidate_ids), _placeholder_width), dtype=np.float32)
@@ -0,0 +1,223 @@
+"""Memory-mapped snapshot of candidate features.
+
+Candidate features change slowly, so instead of one Redis ``HMGET`` per
+candidate on every Rank they can be served from a snapshot file built
+offline. A snapshot is a directory holding
+
+* ``ids.npy``      - candidate ids, sorted (fixed-width unicode)
+* ``columns.npy``  - float32 ``(n_columns, n_rows)``, one contiguous column per
+  candidate feature, rows in ``ids`` order, NaN where a value is unknown
+* ``meta.json``    - column names (in ``feature_map.json`` order) and build time
+
+Snapshots are published under a root directory and ``CURRENT`` names the live
+one; both the directory and ``CURRENT`` are replaced with atomic renames, so
+readers never see a half-written snapshot. The ranker memory-maps the live
+snapshot, resolves a request's ids with one ``searchsorted`` and gathers the
+rows with one fancy index. For candidates it contains, Redis is only asked
+for the viewer hash, so the snapshot should carry every candidate feature;
+columns it lacks are filled from the viewer hash and defaults. Candidates
+missing from the snapshot are fetched from Redis as before.
+
+Build one from a parquet file with a ``candidate_id`` column and a column per
+candidate feature::
+
+    python -m services.ranker.feature_snapshot --input candidates.parquet \
+        --feature-map models/feature_map.json --root /data/feature-snapshots
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+from .feature_fetcher import feature_names
+
+log = logging.getLogger(__name__)
+
+CURRENT = "CURRENT"
+
+snapshot_hits_total = Counter("feature_snapshot_hits_total", "Candidate rows served from the feature snapshot")
+snapshot_misses_total = Counter("feature_snapshot_misses_total", "Candidates not in the feature snapshot")
+snapshot_rows = Gauge("feature_snapshot_rows", "Candidates in the live feature snapshot")
+snapshot_built_timestamp = Gauge("feature_snapshot_built_timestamp_seconds", "Build time of the live feature snapshot")
+
+
+def write_snapshot(
+    root: str,
+    ids: Sequence[str],
+    columns: Mapping[str, np.ndarray],
+    feature_map: Dict[str, int],
+    keep: int = 2,
+) -> str:
+    """Write and publish a snapshot under ``root``; returns its directory.
+
+    ``columns`` maps feature names to per-id values and must be a subset of
+    ``feature_map``. The ``keep`` newest snapshots are kept; rankers still
+    mapping an older one keep reading it until they swap.
+    """
+    unknown = set(columns) - set(feature_map)
+    if unknown:
+        raise ValueError(f"columns not in feature_map: {sorted(unknown)}")
+    names = [n for n in feature_names(feature_map) if n in columns]
+    ids = np.asarray(ids, dtype=np.str_)
+    order = np.argsort(ids, kind="stable")
+    ids = ids[order]
+    if len(ids) > 1 and (ids[1:] == ids[:-1]).any():
+        raise ValueError("duplicate candidate ids")
+
+    os.makedirs(root, exist_ok=True)
+    now = time.time_ns()
+    name = time.strftime("snapshot-%Y%m%dT%H%M%S", time.gmtime(now / 1e9)) + f".{now % 10**9:09d}"
+    tmp = os.path.join(root, name + ".tmp")
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, "ids.npy"), ids)
+    out = np.lib.format.open_memmap(
+        os.path.join(tmp, "columns.npy"), mode="w+", dtype=np.float32, shape=(len(names), len(ids))
+    )
+    for i, n in enumerate(names):
+        # one column at a time so peak memory is one column, not the table
+        out[i] = np.asarray(columns[n], dtype=np.float32)[order]
+    out.flush()
+    del out
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"columns": names, "rows": int(len(ids)), "built_at": time.time()}, f)
+    final = os.path.join(root, name)
+    os.rename(tmp, final)
+    with open(os.path.join(root, CURRENT + ".tmp"), "w") as f:
+        f.write(name)
+    os.replace(os.path.join(root, CURRENT + ".tmp"), os.path.join(root, CURRENT))
+    _prune(root, keep)
+    return final
+
+
+def _prune(root: str, keep: int) -> None:
+    snapshots = sorted(d for d in os.listdir(root) if d.startswith("snapshot-") and not d.endswith(".tmp"))
+    for old in snapshots[:-keep]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+
+
+class CandidateSnapshot:
+    """A published snapshot, memory-mapped and laid out for one feature map."""
+
+    def __init__(self, path: str, feature_map: Dict[str, int]):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.built_at = meta["built_at"]
+        self.ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        self.columns = np.load(os.path.join(path, "columns.npy"), mmap_mode="r")
+        missing = set(meta["columns"]) - set(feature_map)
+        if missing:
+            raise ValueError(f"snapshot columns not in feature_map: {sorted(missing)}")
+        self.width = len(feature_map)
+        # where each snapshot column goes in the fetcher's row
+        self.column_idx = np.array([feature_map[n] for n in meta["columns"]], dtype=np.intp)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def lookup(self, candidate_ids: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """``(rows, miss_idx)``: rows are NaN outside the snapshot's columns and at ``miss_idx``."""
+        n = len(candidate_ids)
+        out = np.full((n, self.width), np.nan, dtype=np.float32)
+        if n == 0 or len(self.ids) == 0:
+            return out, np.arange(n)
+        q = np.asarray(candidate_ids, dtype=np.str_)
+        pos = np.minimum(np.searchsorted(self.ids, q), len(self.ids) - 1)
+        found = self.ids[pos] == q
+        hit = np.flatnonzero(found)
+        out[hit[:, None], self.column_idx] = self.columns[:, pos[hit]].T
+        miss = np.flatnonzero(~found)
+        snapshot_hits_total.inc(len(hit))
+        snapshot_misses_total.inc(len(miss))
+        return out, miss
+
+
+class SnapshotStore:
+    """Follows ``root/CURRENT`` and swaps ``current`` when it changes.
+
+    The swap is a single reference assignment; a request that already took
+    ``current`` finishes on the old mapping.
+    """
+
+    def __init__(self, root: str, feature_map: Dict[str, int], poll_s: float = 30.0):
+        self.root = root
+        self.feature_map = feature_map
+        self.poll_s = poll_s
+        self.current: Optional[CandidateSnapshot] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh(self) -> bool:
+        """Load the snapshot ``CURRENT`` names if it is new; True if swapped."""
+        try:
+            with open(os.path.join(self.root, CURRENT)) as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            return False
+        path = os.path.join(self.root, name)
+        if self.current is not None and self.current.path == path:
+            return False
+        try:
+            snapshot = CandidateSnapshot(path, self.feature_map)
+        except Exception:
+            log.exception("feature snapshot %s could not be loaded", path)
+            return False
+        self.current = snapshot
+        snapshot_rows.set(len(snapshot))
+        snapshot_built_timestamp.set(snapshot.built_at)
+        log.info("feature snapshot %s live with %d candidates", name, len(snapshot))
+        return True
+
+    def start(self) -> "SnapshotStore":
+        self.refresh()
+        if self.poll_s > 0:
+            self._thread = threading.Thread(target=self._run, name="feature-snapshot", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_s):
+            self.refresh()
+
+
+def build_from_parquet(path: str, feature_map: Dict[str, int], root: str, keep: int = 2) -> str:
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    names = [n for n in pf.schema_arrow.names if n in feature_map]
+    ids = pf.read(columns=["candidate_id"]).column(0).to_numpy(zero_copy_only=False)
+
+    class Columns(dict):
+        # read each column only when write_snapshot asks for it
+        def __getitem__(self, name):
+            return pf.read(columns=[name]).column(0).to_numpy(zero_copy_only=False)
+
+    return write_snapshot(root, ids, Columns.fromkeys(names), feature_map, keep=keep)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", required=True, help="parquet with candidate_id and candidate feature columns")
+    parser.add_argument("--feature-map", required=True)
+    parser.add_argument("--root", required=True, help="snapshot root the rankers watch (FEATURE_SNAPSHOT_DIR)")
+    parser.add_argument("--keep", type=int, default=2)
+    args = parser.parse_args()
+    with open(args.feature_map) as f:
+        feature_map = json.load(f)
+    print(build_from_parquet(args.input, feature_map, args.root, keep=args.keep))
+
+
+if __name__ == "__main__":
+    main()
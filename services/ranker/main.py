@@ -1,35 +1,136 @@
-import json
+import logging
 import os
+import threading
 import time
 from typing import List
 
-import lightgbm as lgb
 import numpy as np
-from fastapi import FastAPI
-from prometheus_client import Counter, Histogram
+from fastapi import FastAPI, Request, Response
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, multiprocess
+from prometheus_client.exposition import choose_encoder
 
+from services.admission import AdmissionController, GrpcAdmissionInterceptor, grpc_server_limits
+
+from . import deadline, feature_fetcher, model_store
+from .arms import ArmRouter
+from .batcher import MicroBatcher
+from .concurrency import ConcurrencyConfig, available_cores
 from .feature_fetcher import fetch_features
+from .metrics import LATENCY_BUCKETS_MS, phase, rank_candidates, request_exemplar
+from .model_store import ServedModel
+from .ranking import top_k_order
+from .result_cache import RankResultCache
+from .shadow import ShadowScorer
+from .streaming import StreamingTopK, prefetch
 from . import ranker_pb2, ranker_pb2_grpc
 import grpc
 from concurrent import futures
 
+log = logging.getLogger(__name__)
+
 app = FastAPI()
-model: lgb.Booster | None = None
+# the live model; replaced as a whole by ``reload_model``
+model: ServedModel | None = None
 feature_map: dict | None = None
+model_dir: str = "."
+predict_threads: int = 0
+watcher: model_store.ModelWatcher | None = None
+shadow: ShadowScorer | None = None
+# experiment arms (RANKER_ARMS); None serves ``model`` to everyone
+arms: ArmRouter | None = None
+_reload_lock = threading.Lock()
+# admission control for Rank/RankStream, built by ``serve_grpc``
+admission: AdmissionController | None = None
 
 rank_requests_total = Counter("rank_requests_total", "Total rank requests")
-rank_latency_ms = Histogram("rank_latency_ms", "Rank latency in ms")
-shadow_served_total = Counter("shadow_served_total", "Shadow traffic served")
+rank_latency_ms = Histogram("rank_latency_ms", "Rank latency in ms", buckets=LATENCY_BUCKETS_MS)
+rank_stream_candidates = Histogram(
+    "rank_stream_candidates", "Candidates received per RankStream call",
+    buckets=(1000, 2500, 5000, 10000, 20000, 50000, 100000, 250000),
+)
 
+# RankStream keeps at most this many candidates between chunks
+STREAM_MAX_TOP_K = int(os.getenv("RANKER_STREAM_MAX_TOP_K", "1000"))
 
-@app.on_event("startup")
-def load_model():
+# cross-request batching of predict (RANKER_BATCH_MAX_WAIT_US > 0 enables it)
+batcher = MicroBatcher.from_env(lambda X: model.predict(X))
+result_cache = RankResultCache.from_env()
+# phase costs for a model that does not carry its own (ServedModel does)
+default_costs = deadline.CostModel.from_env()
+
+
+def predict(feats, served=None) -> np.ndarray:
+    served = served or model
+    if batcher is not None:
+        # batched with other requests for the same model only
+        return batcher.predict(feats, served.predict)
+    return served.predict(feats)
+
+
+def install_model(served: ServedModel) -> None:
     global model, feature_map
+    model = served
+    feature_map = served.feature_map
+    if result_cache is not None:
+        result_cache.clear()
+    model_store.mark_served(served)
+
+
+def reload_model(path: str | None = None) -> bool:
+    """Load ``path`` (default: newest model in ``model_dir``) and swap it in.
+
+    Loading, validation and warm-up happen before the swap, so a bad model
+    leaves the live one serving. Returns False if ``path`` is already live.
+    """
+    path = path or model_store.latest_model(model_dir)
+    if path is None:
+        raise FileNotFoundError(f"no ranker model in {model_dir}")
+    path = os.path.abspath(path)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"no ranker model at {path}")
+    with _reload_lock:
+        if model is not None and model.path == path:
+            return False
+        try:
+            served = model_store.load(
+                path, predict_threads, live_feature_map=feature_map, cascade=True, fallback=True
+            )
+        except Exception:
+            model_store.model_reloads_total.labels("error").inc()
+            raise
+        install_model(served)
+    model_store.model_reloads_total.labels("ok").inc()
+    return True
+
+
+@app.on_event("startup")
+def load_model(cfg: ConcurrencyConfig | None = None, cores: int | None = None):
+    """Load ``MODEL_PATH`` and, with ``RANKER_MODEL_WATCH_S`` > 0, watch its directory.
+
+    ``RANKER_MODEL_DIR`` overrides the watched directory.
+    """
+    global model_dir, predict_threads, watcher, shadow, arms, feature_map
+    cfg = cfg or ConcurrencyConfig.from_env()
+    predict_threads = cfg.threads_per_predict(cores or len(available_cores()))
     model_path = os.getenv("MODEL_PATH", "ranker.txt")
-    model = lgb.Booster(model_file=model_path)
-    fmap_path = os.getenv("FEATURE_MAP", os.path.join(os.path.dirname(model_path), "feature_map.json"))
-    with open(fmap_path) as f:
-        feature_map = json.load(f)
+    model_dir = os.getenv("RANKER_MODEL_DIR") or os.path.dirname(os.path.abspath(model_path))
+    arms = ArmRouter.from_env(predict_threads)
+    if arms is not None:
+        # the first arm stands in for ``model`` (shadow comparisons, /metrics info)
+        install_model(arms.arms[0].served)
+        feature_map = arms.feature_map
+    else:
+        install_model(model_store.load(model_path, predict_threads, cascade=True, fallback=True))
+    feature_fetcher.configure(feature_map)
+    if shadow is None:
+        shadow = ShadowScorer.from_env(model.feature_map)
+    poll_s = float(os.getenv("RANKER_MODEL_WATCH_S", "0"))
+    if poll_s > 0 and arms is not None:
+        log.warning("RANKER_MODEL_WATCH_S ignored: experiment arms are fixed at startup")
+    elif poll_s > 0 and watcher is None:
+        watcher = model_store.ModelWatcher(
+            model_dir, reload_model, lambda: model.path if model else None, poll_s=poll_s
+        ).start()
 
 
 @app.get("/healthz")
@@ -37,20 +138,193 @@ def healthz():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def prometheus_metrics(request: Request):
+    # OpenMetrics when the scraper accepts it: exemplars only exist there
+    encoder, content_type = choose_encoder(request.headers.get("accept"))
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # RANKER_PROCESSES > 1: the totals of every worker's metric files
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(encoder(registry), media_type=content_type)
+
+
+def _scoring(cascade, candidates: int) -> str:
+    """The ``CostModel`` phase scoring ``candidates`` takes."""
+    return "cascade" if cascade is not None and candidates > cascade.rescore else "predict"
+
+
 class RankerServicer(ranker_pb2_grpc.RankerServicer):
     def Rank(self, request: ranker_pb2.RankRequest, context):
         start = time.time()
+        exemplar = request_exemplar(context)
         cids = list(request.candidate_ids)
-        feats = fetch_features(request.viewer_id, cids)
-        scores = model.predict(feats)
-        ranked = [cid for _, cid in sorted(zip(scores, cids), reverse=True)]
+        rank_candidates.observe(len(cids))
+        arm = arms.route(request.viewer_id) if arms is not None else None
+        served = arm.served if arm is not None else model
+        version = getattr(served, "version", "")
+        key = None
+        if result_cache is not None:
+            with phase("cache", exemplar):
+                key = result_cache.key(request.viewer_id, cids, request.top_k, version)
+                hit = result_cache.get(key)
+            if hit is not None:
+                return self._done(
+                    ranker_pb2.RankResponse(ranked_ids=hit[0], scores=hit[1], model_version=version),
+                    start, exemplar, arm,
+                )
+
+        reasons = []
+        # the served model's own costs: arms and cascades score at different speeds
+        costs = getattr(served, "costs", default_costs)
+        cascade = getattr(served, "cascade", None)
+        budget = deadline.remaining_ms(context)
+        fit = costs.fits(budget, "fetch", _scoring(cascade, len(cids))) if budget is not None else len(cids)
+        if fit <= 0:
+            return self._unscored(cids, request.top_k, version, start, exemplar, arm)
+        if fit < len(cids):
+            cids = cids[:fit]
+            reasons.append(deadline.degraded(deadline.TRUNCATED))
+        t0 = time.perf_counter()
+        with phase("fetch", exemplar):
+            feats = fetch_features(request.viewer_id, cids)
+            if arm is not None:
+                feats = arm.features(feats)
+        # truncated runs count too: otherwise a pessimistic estimate never recovers
+        costs.observe("fetch", len(cids), (time.perf_counter() - t0) * 1000)
+
+        score = arm.predict if arm is not None else (lambda X: predict(X, served))
+        budget = deadline.remaining_ms(context)
+        if budget is not None and costs.estimate(_scoring(cascade, len(cids)), candidates=len(cids)) > budget:
+            fallback = getattr(served, "fallback", None)
+            if fallback is not None:
+                score, cascade = fallback.predict, None
+                reasons.append(deadline.degraded(deadline.FALLBACK_MODEL))
+            else:
+                fit = costs.fits(budget, _scoring(cascade, len(cids)))
+                if fit <= 0:
+                    return self._unscored(cids, request.top_k, version, start, exemplar, arm)
+                cids, feats = cids[:fit], np.asarray(feats)[:fit]
+                if deadline.TRUNCATED not in reasons:
+                    reasons.append(deadline.degraded(deadline.TRUNCATED))
+        order = None
+        scoring = _scoring(cascade, len(cids))
+        t0 = time.perf_counter()
+        with phase("predict", exemplar):
+            if scoring == "cascade":
+                # no shadow here: the primary has no full-model score per candidate
+                order, ranked_scores = cascade.rank(feats, score, request.top_k)
+            else:
+                scores = np.asarray(score(feats), dtype=np.float64)
+        if deadline.FALLBACK_MODEL not in reasons:
+            costs.observe(scoring, len(cids), (time.perf_counter() - t0) * 1000)
+        if order is None and shadow is not None and served is model and not reasons:
+            shadow.submit(feats, scores)
+        with phase("sort", exemplar):
+            if order is None:
+                order = top_k_order(scores, request.top_k)
+                ranked_scores = scores[order]
+            ranked = [cids[i] for i in order]
+            ranked_scores = ranked_scores.tolist()
+            response = ranker_pb2.RankResponse(
+                ranked_ids=ranked, scores=ranked_scores, model_version=version,
+                degraded=bool(reasons), degraded_reason=",".join(reasons),
+            )
+        if key is not None and not reasons:
+            result_cache.put(key, ranked, ranked_scores, (time.time() - start) * 1000)
+        return self._done(response, start, exemplar, arm)
+
+    def _unscored(self, cids, top_k, version, start, exemplar, arm):
+        deadline.degraded(deadline.UNSCORED)
+        response = ranker_pb2.RankResponse(
+            ranked_ids=cids[:top_k] if top_k else cids, model_version=version,
+            degraded=True, degraded_reason=deadline.UNSCORED,
+        )
+        return self._done(response, start, exemplar, arm)
+
+    def _done(self, response, start, exemplar, arm):
+        elapsed_ms = (time.time() - start) * 1000
+        rank_requests_total.inc()
+        rank_latency_ms.observe(elapsed_ms, exemplar)
+        if arm is not None:
+            arm.observe(elapsed_ms)
+        return response
+
+    def RankStream(self, request_iterator, context):
+        start = time.time()
+        first = next(request_iterator, None)
+        if first is None:
+            return ranker_pb2.RankResponse(model_version=getattr(model, "version", ""))
+        viewer_id = first.viewer_id
+        arm = arms.route(viewer_id) if arms is not None else None
+        served = arm.served if arm is not None else model
+        score = arm.predict if arm is not None else (lambda X: predict(X, served))
+
+        def fetch(chunk):
+            feats = fetch_features(viewer_id, list(chunk.candidate_ids))
+            return arm.features(feats) if arm is not None else feats
+        k = min(first.top_k or STREAM_MAX_TOP_K, STREAM_MAX_TOP_K)
+        best = StreamingTopK(k)
+
+        def chunks():
+            yield first
+            yield from request_iterator
+
+        # features for the next chunk are fetched while this one is scored
+        for chunk, feats in prefetch(chunks(), fetch):
+            if len(chunk.candidate_ids):
+                best.push(list(chunk.candidate_ids), score(feats))
+        ranked, scores = best.result()
+        elapsed_ms = (time.time() - start) * 1000
         rank_requests_total.inc()
-        rank_latency_ms.observe((time.time() - start) * 1000)
-        return ranker_pb2.RankResponse(ranked_ids=ranked)
+        rank_stream_candidates.observe(best.seen)
+        rank_latency_ms.observe(elapsed_ms)
+        if arm is not None:
+            arm.observe(elapsed_ms)
+        return ranker_pb2.RankResponse(
+            ranked_ids=ranked, scores=scores.tolist(),
+            model_version=getattr(served, "version", ""),
+        )
+
+    def ReloadModel(self, request: ranker_pb2.ReloadModelRequest, context):
+        # only a file name: the RPC must not load arbitrary paths
+        name = os.path.basename(request.model_file)
+        if arms is not None:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, "experiment arms are fixed at startup")
+        try:
+            swapped = reload_model(os.path.join(model_dir, name) if name else None)
+        except FileNotFoundError as err:
+            context.abort(grpc.StatusCode.NOT_FOUND, str(err))
+        except Exception as err:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, f"model rejected: {err}")
+        return ranker_pb2.ReloadModelResponse(model_version=model.version, swapped=swapped)
+
+
+# RPCs behind admission control; ReloadModel stays reachable under load
+ADMITTED_METHODS = ("/Ranker/Rank", "/Ranker/RankStream")
+
 
+def serve_grpc(port: int = 50051, workers: int | None = None):
+    """Start the gRPC server with admission control (``RANKER_ADMISSION_*``).
 
-def serve_grpc(port: int = 50051):
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    The limit starts at ``workers`` and adapts between 1 and twice that,
+    with up to four times ``workers`` calls queued for at most 20ms.
+    """
+    global admission
+    workers = workers or ConcurrencyConfig.from_env().grpc_workers
+    admission = AdmissionController.from_env(
+        "ranker", "RANKER",
+        limit=workers, max_limit=2 * workers, max_queue=4 * workers, target_wait_ms=20.0,
+    )
+    threads, max_rpcs = grpc_server_limits(admission, workers)
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=threads),
+        interceptors=[GrpcAdmissionInterceptor(admission, ADMITTED_METHODS)] if admission is not None else None,
+        # several RANKER_PROCESSES workers bind the same port
+        options=[("grpc.so_reuseport", 1)],
+        maximum_concurrent_rpcs=max_rpcs,
+    )
     ranker_pb2_grpc.add_RankerServicer_to_server(RankerServicer(), server)
     server.add_insecure_port(f"[::]:{port}")
     server.start()
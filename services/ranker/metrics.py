@@ -0,0 +1,66 @@
+"""Per-phase Prometheus metrics for ``Rank``.
+
+A Rank call is split into ``cache`` (result cache lookup), ``fetch``
+(feature fetch), ``predict`` (model scoring, cascade included) and ``sort``
+(top-k selection and building the response). Buckets run from 50µs to
+250ms, where ranker latencies live.
+
+With ``RANKER_METRICS_EXEMPLARS=1`` each observation carries the caller's
+``x-request-id`` metadata as an exemplar, so a slow bucket in Grafana links
+to the trace of a request that landed there. Exemplars are only exposed in
+the OpenMetrics format, which ``/metrics`` serves when the scraper asks
+for it.
+"""
+import os
+from time import perf_counter
+from typing import Dict, Optional
+
+from prometheus_client import Histogram
+
+LATENCY_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250)
+CANDIDATE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000)
+
+EXEMPLARS = os.getenv("RANKER_METRICS_EXEMPLARS", "0") == "1"
+REQUEST_ID_KEY = "x-request-id"
+
+rank_phase_ms = Histogram(
+    "rank_phase_ms", "Time spent in each Rank phase in ms", ["phase"], buckets=LATENCY_BUCKETS_MS
+)
+rank_candidates = Histogram(
+    "rank_candidates", "Candidates per Rank request", buckets=CANDIDATE_BUCKETS
+)
+
+PHASES = ("cache", "fetch", "predict", "sort")
+_observers = {name: rank_phase_ms.labels(name).observe for name in PHASES}
+
+
+def request_exemplar(context) -> Optional[Dict[str, str]]:
+    """``{"request_id": ...}`` from the gRPC metadata, when exemplars are on."""
+    if not EXEMPLARS or context is None:
+        return None
+    for key, value in context.invocation_metadata() or ():
+        if key == REQUEST_ID_KEY:
+            return {"request_id": value}
+    return None
+
+
+class phase:
+    """``with phase("fetch", exemplar): ...`` records the block's duration in ms."""
+
+    __slots__ = ("_observe", "_exemplar", "_t0")
+
+    def __init__(self, name: str, exemplar: Optional[Dict[str, str]] = None):
+        self._observe = _observers[name]
+        self._exemplar = exemplar
+
+    def __enter__(self):
+        self._t0 = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = (perf_counter() - self._t0) * 1000
+        if self._exemplar is None:
+            self._observe(elapsed)
+        else:
+            self._observe(elapsed, self._exemplar)
+        return False
@@ -0,0 +1,205 @@
+"""Loading, validating and hot-swapping ranker models.
+
+``ml/offline_train_ranker.py`` writes ``ranker_v<date>.txt`` and
+``feature_map.json`` into the model directory. ``load`` turns such a pair into
+a ``ServedModel``: the booster wrapped in an inference backend, checked
+against the feature map the service is already fetching with, and warmed up
+with synthetic predicts so the first real requests do not pay for cold
+caches or a JIT-compiled backend.
+
+The service holds the live model in a single module attribute; a swap is one
+reference assignment, so a request that already picked up the old model
+finishes with it.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Sequence
+
+import lightgbm as lgb
+import numpy as np
+from prometheus_client import Counter, Gauge, Info
+
+from . import backends
+from .cascade import Cascade
+from .cascade import from_env as cascade_from_env
+from .deadline import CostModel, fallback_backend
+from .feature_fetcher import feature_names
+
+log = logging.getLogger(__name__)
+
+MODEL_PATTERN = re.compile(r"^ranker_v.+\.txt$")
+WARMUP_ROWS = (1, 64, 512)
+
+served_model_info = Info("ranker_model", "Model version currently served")
+model_loaded_timestamp = Gauge("ranker_model_loaded_timestamp_seconds", "When the served model was swapped in")
+model_reloads_total = Counter("ranker_model_reloads_total", "Model reload attempts", ["result"])
+
+
+class FeatureMismatch(ValueError):
+    """The new model does not score the features the service fetches."""
+
+
+@dataclass(frozen=True)
+class ServedModel:
+    backend: backends.Backend
+    feature_map: Dict[str, int]
+    version: str
+    path: str
+    cascade: Optional[Cascade] = None
+    # cheaper scorer for requests about to miss their deadline
+    fallback: Optional[backends.Backend] = None
+    # what this model's phases cost per candidate, for deadline checks
+    costs: CostModel = field(default_factory=CostModel.from_env, compare=False)
+
+    def predict(self, X):
+        return self.backend.predict(X)
+
+
+def version_of(model_path: str) -> str:
+    return os.path.splitext(os.path.basename(model_path))[0]
+
+
+def feature_map_path(model_path: str) -> str:
+    return os.getenv("FEATURE_MAP") or os.path.join(os.path.dirname(model_path), "feature_map.json")
+
+
+def validate(booster: lgb.Booster, feature_map: Dict[str, int], live_feature_map: Optional[Dict[str, int]] = None) -> None:
+    if booster.num_feature() != len(feature_map):
+        raise FeatureMismatch(f"model has {booster.num_feature()} features, feature_map has {len(feature_map)}")
+    names = booster.feature_name()
+    # models trained from a bare matrix only know Column_<i>
+    if not all(n == f"Column_{i}" for i, n in enumerate(names)) and names != feature_names(feature_map):
+        raise FeatureMismatch("model feature names differ from feature_map order")
+    if live_feature_map is not None and feature_map != live_feature_map:
+        # the fetcher and its row cache are laid out for the live map
+        raise FeatureMismatch("feature_map changed; restart the ranker to pick it up")
+
+
+def warm_up(backend: backends.Backend, n_features: int, rows: Sequence[int] = WARMUP_ROWS, rounds: int = 3) -> None:
+    rng = np.random.default_rng(0)
+    for n in rows:
+        X = rng.standard_normal((n, n_features)).astype(np.float32)
+        for _ in range(rounds):
+            backend.predict(X)
+
+
+def load(
+    model_path: str,
+    num_threads: int = 0,
+    live_feature_map: Optional[Dict[str, int]] = None,
+    cascade: bool = False,
+    fallback: bool = False,
+) -> ServedModel:
+    """Load, validate and warm up ``model_path``; raises without touching the live model.
+
+    ``cascade`` builds the ``RANKER_CASCADE_*`` stage one and ``fallback`` the
+    deadline fallback scorer; only models that serve ``Rank`` need them, so a
+    shadow model skips building and warming both.
+    """
+    booster = lgb.Booster(model_file=model_path)
+    with open(feature_map_path(model_path)) as f:
+        feature_map = json.load(f)
+    validate(booster, feature_map, live_feature_map)
+    backend = backends.load_backend(booster, num_threads=num_threads)
+    warm_up(backend, booster.num_feature())
+    stage_one = cascade_from_env(booster, num_threads) if cascade else None
+    cheaper = None
+    if stage_one is not None:
+        warm_up(stage_one.first, booster.num_feature())
+        cheaper = stage_one.first if fallback else None
+    elif fallback:
+        cheaper = fallback_backend(booster, backend.name, num_threads)
+        if cheaper is not None:
+            warm_up(cheaper, booster.num_feature())
+    return ServedModel(
+        backend, feature_map, version_of(model_path), os.path.abspath(model_path), stage_one, cheaper
+    )
+
+
+def mark_served(served: ServedModel) -> None:
+    served_model_info.info({
+        "version": served.version,
+        "backend": served.backend.name,
+        "cascade": served.cascade.label if served.cascade else "",
+    })
+    model_loaded_timestamp.set(time.time())
+
+
+def latest_model(model_dir: str, settle_s: float = 0.0) -> Optional[str]:
+    """Newest ``ranker_v*.txt`` in ``model_dir`` (dates sort lexically).
+
+    Files modified within the last ``settle_s`` seconds are skipped so a
+    model that is still being written is not picked up.
+    """
+    try:
+        names = sorted(n for n in os.listdir(model_dir) if MODEL_PATTERN.match(n))
+    except FileNotFoundError:
+        return None
+    now = time.time()
+    for name in reversed(names):
+        path = os.path.join(model_dir, name)
+        try:
+            if now - os.path.getmtime(path) >= settle_s:
+                return os.path.abspath(path)
+        except FileNotFoundError:
+            continue
+    return None
+
+
+class ModelWatcher:
+    """Polls ``model_dir`` and calls ``reload(path)`` when a newer model lands.
+
+    A model that fails to load is not retried until its file changes.
+    """
+
+    def __init__(
+        self,
+        model_dir: str,
+        reload: Callable[[str], object],
+        current: Callable[[], Optional[str]],
+        poll_s: float = 30.0,
+        settle_s: float = 5.0,
+    ):
+        self.model_dir = model_dir
+        self.reload = reload
+        self.current = current
+        self.poll_s = poll_s
+        self.settle_s = settle_s
+        self._failed: Optional[tuple] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self) -> bool:
+        """One poll; True if a new model was swapped in."""
+        path = latest_model(self.model_dir, self.settle_s)
+        if path is None or path == self.current():
+            return False
+        stamp = (path, os.path.getmtime(path))
+        if stamp == self._failed:
+            return False
+        try:
+            self.reload(path)
+        except Exception:
+            log.exception("ranker model reload from %s failed", path)
+            self._failed = stamp
+            return False
+        return True
+
+    def start(self) -> "ModelWatcher":
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_s):
+            self.check()
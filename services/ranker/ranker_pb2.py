@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0cranker.proto\"7\n\x0bRankRequest\x12\x11\n\tviewer_id\x18\x01 \x01(\t\x12\x15\n\rcandidate_ids\x18\x02 \x03(\t\"\"\n\x0cRankResponse\x12\x12\n\nranked_ids\x18\x01 \x03(\t2-\n\x06Ranker\x12#\n\x04Rank\x12\x0c.RankRequest\x1a\r.RankResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0cranker.proto\"F\n\x0bRankRequest\x12\x11\n\tviewer_id\x18\x01 \x01(\t\x12\x15\n\rcandidate_ids\x18\x02 \x03(\t\x12\r\n\x05top_k\x18\x03 \x01(\r\"D\n\tRankChunk\x12\x11\n\tviewer_id\x18\x01 \x01(\t\x12\x15\n\rcandidate_ids\x18\x02 \x03(\t\x12\r\n\x05top_k\x18\x03 \x01(\r\"t\n\x0cRankResponse\x12\x12\n\nranked_ids\x18\x01 \x03(\t\x12\x0e\n\x06scores\x18\x02 \x03(\x02\x12\x15\n\rmodel_version\x18\x03 \x01(\t\x12\x10\n\x08\x64\x65graded\x18\x04 \x01(\x08\x12\x17\n\x0f\x64\x65graded_reason\x18\x05 \x01(\t\"(\n\x12ReloadModelRequest\x12\x12\n\nmodel_file\x18\x01 \x01(\t\"=\n\x13ReloadModelResponse\x12\x15\n\rmodel_version\x18\x01 \x01(\t\x12\x0f\n\x07swapped\x18\x02 \x01(\x08\x32\x92\x01\n\x06Ranker\x12#\n\x04Rank\x12\x0c.RankRequest\x1a\r.RankResponse\x12)\n\nRankStream\x12\n.RankChunk\x1a\r.RankResponse(\x01\x12\x38\n\x0bReloadModel\x12\x13.ReloadModelRequest\x1a\x14.ReloadModelResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -32,9 +32,15 @@ _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'ranker_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
   _globals['_RANKREQUEST']._serialized_start=16
-  _globals['_RANKREQUEST']._serialized_end=71
-  _globals['_RANKRESPONSE']._serialized_start=73
-  _globals['_RANKRESPONSE']._serialized_end=107
-  _globals['_RANKER']._serialized_start=109
-  _globals['_RANKER']._serialized_end=154
+  _globals['_RANKREQUEST']._serialized_end=86
+  _globals['_RANKCHUNK']._serialized_start=88
+  _globals['_RANKCHUNK']._serialized_end=156
+  _globals['_RANKRESPONSE']._serialized_start=158
+  _globals['_RANKRESPONSE']._serialized_end=274
+  _globals['_RELOADMODELREQUEST']._serialized_start=276
+  _globals['_RELOADMODELREQUEST']._serialized_end=316
+  _globals['_RELOADMODELRESPONSE']._serialized_start=318
+  _globals['_RELOADMODELRESPONSE']._serialized_end=379
+  _globals['_RANKER']._serialized_start=382
+  _globals['_RANKER']._serialized_end=528
 # @@protoc_insertion_point(module_scope)
@@ -39,6 +39,16 @@ class RankerStub(object):
                 request_serializer=ranker__pb2.RankRequest.SerializeToString,
                 response_deserializer=ranker__pb2.RankResponse.FromString,
                 _registered_method=True)
+        self.RankStream = channel.stream_unary(
+                '/Ranker/RankStream',
+                request_serializer=ranker__pb2.RankChunk.SerializeToString,
+                response_deserializer=ranker__pb2.RankResponse.FromString,
+                _registered_method=True)
+        self.ReloadModel = channel.unary_unary(
+                '/Ranker/ReloadModel',
+                request_serializer=ranker__pb2.ReloadModelRequest.SerializeToString,
+                response_deserializer=ranker__pb2.ReloadModelResponse.FromString,
+                _registered_method=True)
 
 
 class RankerServicer(object):
@@ -50,6 +60,20 @@ class RankerServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def RankStream(self, request_iterator, context):
+        """Large candidate sets sent in chunks; only the top_k survive across chunks.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ReloadModel(self, request, context):
+        """Admin: load a model from the model directory, warm it up and swap it in.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_RankerServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -58,6 +82,16 @@ def add_RankerServicer_to_server(servicer, server):
                     request_deserializer=ranker__pb2.RankRequest.FromString,
                     response_serializer=ranker__pb2.RankResponse.SerializeToString,
             ),
+            'RankStream': grpc.stream_unary_rpc_method_handler(
+                    servicer.RankStream,
+                    request_deserializer=ranker__pb2.RankChunk.FromString,
+                    response_serializer=ranker__pb2.RankResponse.SerializeToString,
+            ),
+            'ReloadModel': grpc.unary_unary_rpc_method_handler(
+                    servicer.ReloadModel,
+                    request_deserializer=ranker__pb2.ReloadModelRequest.FromString,
+                    response_serializer=ranker__pb2.ReloadModelResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'Ranker', rpc_method_handlers)
@@ -95,3 +129,57 @@ class Ranker(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def RankStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/Ranker/RankStream',
+            ranker__pb2.RankChunk.SerializeToString,
+            ranker__pb2.RankResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ReloadModel(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/Ranker/ReloadModel',
+            ranker__pb2.ReloadModelRequest.SerializeToString,
+            ranker__pb2.ReloadModelResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
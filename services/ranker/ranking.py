@@ -0,0 +1,22 @@
+import numpy as np
+
+
+def top_k_order(scores: np.ndarray, k: int = 0) -> np.ndarray:
+    """Indices of the ``k`` best scores, best first (all of them if ``k`` is 0).
+
+    Ties keep request order, so equal scores rank the same way on every call.
+    For ``k`` much smaller than ``len(scores)`` this is an O(n) argpartition
+    plus a sort of ``k`` elements instead of a full sort.
+    """
+    scores = np.asarray(scores)
+    n = len(scores)
+    if k <= 0 or k >= n:
+        return np.lexsort((np.arange(n), -scores))
+    cut = np.argpartition(-scores, k - 1)
+    kth = scores[cut[k - 1]]
+    # argpartition picks arbitrarily among scores equal to the k-th; take
+    # the earliest ones so the boundary is deterministic too
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[: k - len(above)]
+    idx = np.concatenate((above, ties))
+    return idx[np.lexsort((idx, -scores[idx]))]
@@ -0,0 +1,94 @@
+"""Short-lived cache of Rank responses.
+
+Feed pagination and client retries resend the same viewer and candidate list
+within seconds. Responses are cached under the viewer, a digest of the
+ordered candidate list (order decides ties), ``top_k`` and the model
+version; a hit skips feature fetch and predict.
+
+Entries expire after ``RANKER_RESULT_CACHE_TTL_S``. Memory is bounded by the
+total number of ranked ids held (``RANKER_RESULT_CACHE_MAX_IDS``, 0 disables
+the cache), evicting least recently used entries. The service clears the
+cache whenever it swaps models.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from prometheus_client import Counter
+
+rank_cache_hits_total = Counter("rank_result_cache_hits_total", "Rank responses served from the result cache")
+rank_cache_misses_total = Counter("rank_result_cache_misses_total", "Rank requests not in the result cache")
+rank_cache_saved_ms_total = Counter(
+    "rank_result_cache_saved_ms_total", "Fetch and predict time avoided by result cache hits, in ms"
+)
+
+Key = Tuple[str, bytes, int, str]
+Entry = Tuple[float, List[str], List[float], float]
+
+
+def candidates_digest(candidate_ids: Sequence[str]) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    for cid in candidate_ids:
+        h.update(cid.encode())
+        h.update(b"\0")
+    return h.digest()
+
+
+class RankResultCache:
+    def __init__(self, max_ids: int = 1_000_000, ttl_s: float = 5.0):
+        self.max_ids = max_ids
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[Key, Entry]" = OrderedDict()
+        self._ids = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["RankResultCache"]:
+        max_ids = int(os.getenv("RANKER_RESULT_CACHE_MAX_IDS", "1000000"))
+        if max_ids <= 0:
+            return None
+        return cls(max_ids, float(os.getenv("RANKER_RESULT_CACHE_TTL_S", "5")))
+
+    @staticmethod
+    def key(viewer_id: str, candidate_ids: Sequence[str], top_k: int, model_version: str) -> Key:
+        return viewer_id, candidates_digest(candidate_ids), top_k, model_version
+
+    def get(self, key: Key) -> Optional[Tuple[List[str], List[float]]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                rank_cache_misses_total.inc()
+                return None
+            self._data.move_to_end(key)
+        rank_cache_hits_total.inc()
+        rank_cache_saved_ms_total.inc(entry[3])
+        return entry[1], entry[2]
+
+    def put(self, key: Key, ranked_ids: List[str], scores: List[float], cost_ms: float) -> None:
+        """``cost_ms`` is what computing the response took; hits count it as saved."""
+        if len(ranked_ids) > self.max_ids:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + self.ttl_s, ranked_ids, scores, cost_ms)
+            self._ids += len(ranked_ids)
+            while self._ids > self.max_ids:
+                self._drop(next(iter(self._data)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._ids = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _drop(self, key: Key) -> None:
+        self._ids -= len(self._data.pop(key)[1])
@@ -1,7 +1,16 @@
 import uvicorn
-from .main import app, serve_grpc
+from .concurrency import ConcurrencyConfig, start_workers, stop_workers
+from .main import app, load_model, serve_grpc
 
 if __name__ == "__main__":
-    grpc_server = serve_grpc()
-    uvicorn.run(app, host="0.0.0.0", port=8000)
-    grpc_server.stop(0)
+    cfg = ConcurrencyConfig.from_env()
+    if cfg.processes > 1:
+        # the workers load and serve the model; this process only answers HTTP
+        app.router.on_startup.remove(load_model)
+        workers = start_workers(50051, cfg)
+        uvicorn.run(app, host="0.0.0.0", port=8000)
+        stop_workers(workers)
+    else:
+        grpc_server = serve_grpc(workers=cfg.grpc_workers)
+        uvicorn.run(app, host="0.0.0.0", port=8000)
+        grpc_server.stop(0)
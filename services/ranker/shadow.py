@@ -0,0 +1,138 @@
+"""Shadow scoring of a candidate model on live traffic.
+
+A sampled fraction of Rank requests hand their feature matrix and primary
+scores to ``ShadowScorer.submit``, which returns immediately. The shadow
+model scores on its own small thread pool; when ``max_pending`` requests are
+already queued or running the sample is dropped rather than queued, so a
+slow shadow never backs up into the serving path.
+
+The feature matrix is shared, not copied: callers must not modify it after
+submitting.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+import numpy as np
+from prometheus_client import Counter, Histogram
+
+from . import model_store
+from .model_store import ServedModel
+from .ranking import top_k_order
+
+log = logging.getLogger(__name__)
+
+shadow_served_total = Counter("shadow_served_total", "Shadow traffic served")
+shadow_dropped_total = Counter("shadow_dropped_total", "Shadow samples dropped because the queue was full")
+shadow_errors_total = Counter("shadow_errors_total", "Shadow predict failures")
+shadow_latency_ms = Histogram(
+    "shadow_latency_ms", "Shadow model predict latency in ms",
+    buckets=(0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250),
+)
+shadow_rank_correlation = Histogram(
+    "shadow_rank_correlation", "Spearman correlation of shadow and primary scores",
+    buckets=(-0.5, 0, 0.25, 0.5, 0.7, 0.8, 0.9, 0.95, 0.98, 0.99, 1.0),
+)
+shadow_overlap_at_k = Histogram(
+    "shadow_overlap_at_k", "Share of the primary top k also in the shadow top k",
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0),
+)
+
+
+def average_ranks(x: np.ndarray) -> np.ndarray:
+    """Ranks of ``x`` with ties sharing their mean rank."""
+    ranks = np.empty(len(x), dtype=np.float64)
+    ranks[np.argsort(x, kind="stable")] = np.arange(len(x))
+    _, inv, counts = np.unique(x, return_inverse=True, return_counts=True)
+    return (np.bincount(inv, weights=ranks) / counts)[inv]
+
+
+def spearman(a: np.ndarray, b: np.ndarray) -> float:
+    """NaN when either side is constant (the correlation is undefined)."""
+    ra, rb = average_ranks(a), average_ranks(b)
+    if len(a) < 2 or ra.std() == 0 or rb.std() == 0:
+        return float("nan")
+    return float(np.corrcoef(ra, rb)[0, 1])
+
+
+def overlap_at_k(a: np.ndarray, b: np.ndarray, k: int) -> float:
+    k = min(k, len(a))
+    if k == 0:
+        return float("nan")
+    return len(np.intersect1d(top_k_order(a, k), top_k_order(b, k))) / k
+
+
+class ShadowScorer:
+    def __init__(
+        self,
+        model: ServedModel,
+        sample_rate: float = 0.05,
+        max_pending: int = 64,
+        workers: int = 1,
+        k: int = 10,
+    ):
+        self.model = model
+        self.sample_rate = sample_rate
+        self.max_pending = max_pending
+        self.k = k
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shadow")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, live_feature_map: Dict[str, int]) -> Optional["ShadowScorer"]:
+        """``RANKER_SHADOW_MODEL`` enables shadowing; it must share the live feature map.
+
+        The shadow predicts single-threaded so it cannot take cores from the
+        primary's OpenMP teams.
+        """
+        path = os.getenv("RANKER_SHADOW_MODEL")
+        if not path:
+            return None
+        model = model_store.load(path, num_threads=1, live_feature_map=live_feature_map)
+        log.info("shadow scoring %s", model.version)
+        return cls(
+            model,
+            sample_rate=float(os.getenv("RANKER_SHADOW_SAMPLE_RATE", "0.05")),
+            max_pending=int(os.getenv("RANKER_SHADOW_MAX_PENDING", "64")),
+            workers=int(os.getenv("RANKER_SHADOW_WORKERS", "1")),
+            k=int(os.getenv("RANKER_SHADOW_K", "10")),
+        )
+
+    def submit(self, feats: np.ndarray, primary: np.ndarray) -> bool:
+        """Maybe score ``feats`` in the background; True if the sample was taken."""
+        if random.random() >= self.sample_rate:
+            return False
+        with self._lock:
+            if self._pending >= self.max_pending:
+                shadow_dropped_total.inc()
+                return False
+            self._pending += 1
+        self._pool.submit(self._score, feats, primary)
+        return True
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+
+    def _score(self, feats, primary) -> None:
+        try:
+            start = time.perf_counter()
+            scores = np.asarray(self.model.predict(feats), dtype=np.float64)
+            shadow_latency_ms.observe((time.perf_counter() - start) * 1000)
+            rho = spearman(primary, scores)
+            if not np.isnan(rho):
+                shadow_rank_correlation.observe(rho)
+            overlap = overlap_at_k(primary, scores, self.k)
+            if not np.isnan(overlap):
+                shadow_overlap_at_k.observe(overlap)
+            shadow_served_total.inc()
+        except Exception:
+            shadow_errors_total.inc()
+            log.exception("shadow predict failed")
+        finally:
+            with self._lock:
+                self._pending -= 1
@@ -0,0 +1,94 @@
+"""Ranking candidate sets that arrive in chunks.
+
+``RankStream`` clients send a large candidate list as a stream of
+``RankChunk`` messages. While chunk *i* is being scored, chunk *i+1*'s
+features are fetched on a background thread. Only the running top ``k`` are
+kept between chunks, so memory stays at ``k`` plus ``prefetch`` chunks no
+matter how many candidates the stream carries.
+"""
+import queue
+import threading
+from typing import Callable, Iterable, Iterator, List, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+from .ranking import top_k_order
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_DONE = object()
+
+
+class StreamingTopK:
+    """Top ``k`` (id, score) pairs over chunks pushed in request order.
+
+    Survivors are kept in arrival order, so merging a chunk is a single
+    ``top_k_order`` over survivors + chunk and ties break exactly as in a
+    one-shot ranking of the whole list: earlier candidates first.
+    """
+
+    def __init__(self, k: int):
+        if k <= 0:
+            raise ValueError("k must be positive")
+        self.k = k
+        self.ids: np.ndarray = np.empty(0, dtype=object)
+        self.scores = np.empty(0, dtype=np.float64)
+        self.seen = 0
+
+    def push(self, ids: Sequence[str], scores) -> None:
+        self.seen += len(ids)
+        ids = np.concatenate((self.ids, np.asarray(ids, dtype=object)))
+        scores = np.concatenate((self.scores, np.asarray(scores, dtype=np.float64)))
+        if len(scores) > self.k:
+            keep = np.sort(top_k_order(scores, self.k))
+            ids, scores = ids[keep], scores[keep]
+        self.ids, self.scores = ids, scores
+
+    def result(self) -> Tuple[List[str], np.ndarray]:
+        """``(ranked_ids, scores)``, best first."""
+        order = top_k_order(self.scores)
+        return self.ids[order].tolist(), self.scores[order]
+
+
+def prefetch(items: Iterable[T], fn: Callable[[T], R], depth: int = 1) -> Iterator[Tuple[T, R]]:
+    """Yield ``(item, fn(item))`` with ``fn`` running up to ``depth`` items ahead.
+
+    ``fn`` runs on one background thread; exceptions from it or from ``items``
+    are re-raised by the consumer. Abandoning the generator stops the thread.
+    """
+    q: "queue.Queue" = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run():
+        try:
+            for item in items:
+                if not put((item, fn(item), None)):
+                    return
+        except BaseException as err:
+            put((None, None, err))
+            return
+        put(_DONE)
+
+    thread = threading.Thread(target=run, name="rank-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            entry = q.get()
+            if entry is _DONE:
+                return
+            item, result, err = entry
+            if err is not None:
+                raise err
+            yield item, result
+    finally:
+        stop.set()
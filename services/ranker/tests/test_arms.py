@@ -0,0 +1,84 @@
+import json
+import os
+
+import grpc
+import lightgbm as lgb
+import numpy as np
+import pytest
+from prometheus_client import REGISTRY
+
+from services.ranker import main, ranker_pb2, ranker_pb2_grpc
+from services.ranker.arms import parse_arms, union_feature_map
+
+
+def write_model(model_dir, fmap, seed):
+    os.makedirs(model_dir, exist_ok=True)
+    with open(os.path.join(model_dir, "feature_map.json"), "w") as f:
+        json.dump(fmap, f)
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((400, len(fmap))).astype(np.float32)
+    model = lgb.LGBMRanker(objective="lambdarank", n_estimators=5, num_leaves=7, min_child_samples=5, verbose=-1)
+    model.fit(X, (X[:, 0] > 0).astype(int), group=[20] * 20)
+    path = os.path.join(model_dir, f"ranker_v{seed}.txt")
+    model.booster_.save_model(path)
+    return path
+
+
+def test_parse_arms():
+    assert parse_arms("a=90:/m/a.txt, b=10:/m/b.txt") == [("a", 90.0, "/m/a.txt"), ("b", 10.0, "/m/b.txt")]
+    with pytest.raises(ValueError):
+        parse_arms("a=90")
+    with pytest.raises(ValueError):
+        parse_arms("a=1:x,a=1:y")
+
+
+def test_union_keeps_first_map_order():
+    assert union_feature_map([{"y": 1, "x": 0}, {"z": 0, "x": 1}]) == {"x": 0, "y": 1, "z": 2}
+
+
+def test_arms_serve_their_own_models_and_feature_columns(tmp_path, monkeypatch):
+    a = write_model(str(tmp_path / "a"), {"f0": 0, "f1": 1}, seed=1)
+    b = write_model(str(tmp_path / "b"), {"f2": 0, "f0": 1, "f1": 2}, seed=2)
+    monkeypatch.setenv("RANKER_ARMS", f"control=50:{a},treatment=50:{b}")
+    monkeypatch.setenv("RANKER_ARMS_SALT", "exp-1")
+    monkeypatch.setenv("RANKER_BACKEND", "lightgbm")
+    monkeypatch.delenv("FEATURE_MAP", raising=False)
+    monkeypatch.setattr(main, "model", None)
+    monkeypatch.setattr(main, "feature_map", None)
+    monkeypatch.setattr(main, "shadow", None)
+    monkeypatch.setattr(main, "result_cache", None)
+    monkeypatch.setattr(main, "arms", None)
+    main.load_model()
+    assert main.feature_map == {"f0": 0, "f1": 1, "f2": 2}
+
+    fetched = []
+
+    def fetch(viewer_id, cids):
+        fetched.append(viewer_id)
+        rng = np.random.default_rng(len(cids))
+        return rng.standard_normal((len(cids), 3)).astype(np.float32)
+
+    monkeypatch.setattr(main, "fetch_features", fetch)
+    router = main.arms
+    viewers = [f"v{i}" for i in range(400)]
+    assigned = {v: router.route(v).name for v in viewers}
+    assert assigned == {v: router.route(v).name for v in viewers}  # stable
+    assert 120 < sum(n == "control" for n in assigned.values()) < 280
+
+    server = main.serve_grpc(port=50061)
+    try:
+        stub = ranker_pb2_grpc.RankerStub(grpc.insecure_channel("localhost:50061"))
+        cids = ["a", "b", "c", "d"]
+        X = fetch("x", cids)
+        for v in viewers[:20]:
+            resp = stub.Rank(ranker_pb2.RankRequest(viewer_id=v, candidate_ids=cids))
+            arm = router.route(v)
+            assert resp.model_version == arm.served.version
+            expected = lgb.Booster(model_file=arm.served.path).predict(X[:, arm.columns] if arm.columns is not None else X)
+            np.testing.assert_allclose(sorted(resp.scores, reverse=True), np.sort(expected)[::-1], rtol=1e-5)
+        assert fetched.count(viewers[0]) == 1  # one fetch per request, whatever the arm
+    finally:
+        server.stop(0)
+    for name in ("control", "treatment"):
+        assert REGISTRY.get_sample_value("rank_arm_requests_total", {"arm": name}) > 0
+        assert REGISTRY.get_sample_value("ranker_arm_model_bytes", {"arm": name}) > 0
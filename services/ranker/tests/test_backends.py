@@ -0,0 +1,46 @@
+import lightgbm as lgb
+import numpy as np
+import pytest
+
+from services.ranker import backends
+
+
+@pytest.fixture(scope="module")
+def booster():
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((2000, 6)).astype(np.float32)
+    y = (X[:, 0] + 0.5 * X[:, 1] > 0).astype(int) + (X[:, 2] > 1).astype(int)
+    model = lgb.LGBMRanker(
+        objective="lambdarank", num_leaves=31, n_estimators=40, min_child_samples=5, verbose=-1
+    )
+    model.fit(X, y, group=[20] * 100)
+    return model.booster_
+
+
+@pytest.mark.parametrize("name,module", [("treelite", "tl2cgen"), ("onnx", "onnxruntime")])
+def test_backend_parity_with_lightgbm(booster, tmp_path, monkeypatch, name, module):
+    pytest.importorskip(module)
+    monkeypatch.setenv("RANKER_BACKEND_CACHE_DIR", str(tmp_path))
+    X = backends.synthetic_rows(booster, 500, seed=1)
+    expected = backends.LightGBMBackend(booster).predict(X)
+    got = backends.build_backend(name, booster).predict(X)
+    assert got.shape == expected.shape
+    np.testing.assert_allclose(got, expected, atol=backends.PARITY_ATOL)
+
+
+def test_select_backend_picks_a_matching_backend(booster, tmp_path, monkeypatch):
+    monkeypatch.setenv("RANKER_BACKEND_CACHE_DIR", str(tmp_path))
+    chosen = backends.select_backend(booster, repeat=3)
+    assert chosen.name in backends.BACKENDS
+    X = backends.synthetic_rows(booster, 50, seed=2)
+    np.testing.assert_allclose(chosen.predict(X), booster.predict(X), atol=backends.PARITY_ATOL)
+
+
+def test_select_backend_falls_back_to_lightgbm(booster):
+    chosen = backends.select_backend(booster, candidates=["nope"], repeat=1)
+    assert chosen.name == "lightgbm"
+
+
+def test_unknown_backend_rejected(booster):
+    with pytest.raises(ValueError, match="unknown ranker backend"):
+        backends.load_backend(booster, "xgboost")
@@ -0,0 +1,82 @@
+import threading
+
+import numpy as np
+import pytest
+
+from services.ranker.batcher import MicroBatcher
+
+
+class CountingModel:
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, X):
+        self.calls.append(len(X))
+        return X[:, 0] * 2
+
+
+def test_concurrent_requests_share_one_predict():
+    model = CountingModel()
+    batcher = MicroBatcher(model.predict, max_rows=1000, max_wait_s=0.05)
+    results = {}
+    start = threading.Barrier(4)
+
+    def call(i):
+        X = np.full((10, 3), i, dtype=np.float32)
+        start.wait()
+        results[i] = batcher.predict(X)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+    assert sum(model.calls) == 40 and len(model.calls) < 4
+    for i, scores in results.items():
+        np.testing.assert_array_equal(scores, np.full(10, 2 * i))
+
+
+def test_max_rows_splits_batches():
+    model = CountingModel()
+    batcher = MicroBatcher(model.predict, max_rows=15, max_wait_s=0.05)
+    threads = [threading.Thread(target=batcher.predict, args=(np.ones((10, 1)),)) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+    assert model.calls == [10, 10, 10]
+
+
+def test_errors_reach_every_caller():
+    def boom(X):
+        raise RuntimeError("model gone")
+
+    batcher = MicroBatcher(boom, max_wait_s=0.001)
+    with pytest.raises(RuntimeError, match="model gone"):
+        batcher.predict(np.ones((2, 2)))
+    batcher.close()
+
+
+def test_each_caller_is_scored_by_its_own_model():
+    old, new = CountingModel(), CountingModel()
+    new.predict = lambda X: X[:, 0] * 3
+    batcher = MicroBatcher(old.predict, max_rows=1000, max_wait_s=0.05)
+    results = {}
+    start = threading.Barrier(4)
+
+    def call(i):
+        X = np.full((5, 1), 1, dtype=np.float32)
+        start.wait()
+        results[i] = batcher.predict(X, (old if i % 2 else new).predict)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+    assert len(results) == 4
+    for i, scores in results.items():
+        np.testing.assert_array_equal(scores, np.full(5, 2 if i % 2 else 3))
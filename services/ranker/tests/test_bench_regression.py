@@ -0,0 +1,38 @@
+from services.ranker.bench.regression import compare
+
+
+def scenario(**kw):
+    base = {"candidates": 200, "qps": 100.0, "rps": 100.0, "p50_ms": 5.0, "p95_ms": 9.0, "p99_ms": 12.0,
+            "cpu_ms_per_request": 4.0, "requests": 2000, "errors": 0, "dropped": 0}
+    return {**base, **kw}
+
+
+def test_flags_slower_latency_cpu_and_throughput_only():
+    baseline = {"scenarios": [scenario(), scenario(candidates=1000)]}
+    results = {"scenarios": [
+        scenario(p99_ms=14.5, p50_ms=5.5, cpu_ms_per_request=5.0),
+        scenario(candidates=1000, rps=80.0, p95_ms=5.0),
+        scenario(candidates=5000, p99_ms=100.0),  # not in the baseline
+    ]}
+    problems = compare(results, baseline, tolerance=0.15)
+    assert len(problems) == 3
+    assert any("p99_ms 12.0 -> 14.5" in p for p in problems)
+    assert any("cpu_ms_per_request" in p for p in problems)
+    assert any(p.startswith("1000 candidates") and "rps" in p for p in problems)
+
+
+def test_a_run_where_every_request_fails_is_a_regression():
+    baseline = {"scenarios": [scenario()]}
+    down = {"candidates": 200, "qps": 100.0, "rps": 0.0, "requests": 0, "errors": 1000, "dropped": 0,
+            "cpu_ms_per_request": None}
+    problems = compare({"scenarios": [down]}, baseline, tolerance=0.15)
+    assert any("error rate 0.00% -> 100.00%" in p for p in problems)
+    for metric in ("rps", "p50_ms", "p95_ms", "p99_ms", "cpu_ms_per_request"):
+        assert any(f": {metric} " in p for p in problems)
+
+
+def test_any_new_errors_fail_by_default():
+    baseline = {"scenarios": [scenario()]}
+    results = {"scenarios": [scenario(errors=3)]}
+    assert compare(results, baseline, tolerance=0.15) == ["200 candidates @ 100.0 qps: error rate 0.00% -> 0.15%"]
+    assert compare(results, baseline, tolerance=0.15, error_tolerance=0.01) == []
@@ -0,0 +1,50 @@
+import lightgbm as lgb
+import numpy as np
+import pytest
+
+from services.ranker import backends, cascade
+from services.ranker.ranking import top_k_order
+
+
+@pytest.fixture(scope="module")
+def booster():
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((2000, 6)).astype(np.float32)
+    y = (X[:, 0] + 0.5 * X[:, 1] > 0).astype(int) + (X[:, 2] > 1).astype(int)
+    model = lgb.LGBMRanker(objective="lambdarank", num_leaves=15, n_estimators=40, min_child_samples=5, verbose=-1)
+    model.fit(X, y, group=[20] * 100)
+    return model.booster_
+
+
+def test_truncated_booster_matches_num_iteration(booster):
+    X = backends.synthetic_rows(booster, 100, seed=1)
+    np.testing.assert_allclose(cascade.truncated(booster, 10).predict(X), booster.predict(X, num_iteration=10))
+
+
+def test_cascade_rescores_stage_one_head_with_full_model(booster):
+    c = cascade.build(booster, trees=10, rescore=30, backend="lightgbm")
+    X = backends.synthetic_rows(booster, 200, seed=2)
+    first = booster.predict(X, num_iteration=10)
+    full = booster.predict(X)
+    order, scores = c.rank(X, booster.predict)
+    head = set(top_k_order(first, 30).tolist())
+    assert sorted(order.tolist()) == list(range(200))
+    assert set(order[:30].tolist()) == head
+    np.testing.assert_allclose(scores[:30], np.sort(full[list(head)])[::-1])
+    np.testing.assert_allclose(scores[30:], first[order[30:]])
+
+    top, top_scores = c.rank(X, booster.predict, k=5)
+    np.testing.assert_array_equal(top, order[:5])
+    assert len(c.rank(X, booster.predict, k=50)[0]) == 50
+
+
+def test_cascade_is_exact_when_everything_is_rescored(booster):
+    c = cascade.build(booster, trees=5, rescore=500, backend="lightgbm")
+    X = backends.synthetic_rows(booster, 100, seed=3)
+    order, _ = c.rank(X, booster.predict)
+    np.testing.assert_array_equal(order, top_k_order(booster.predict(X)))
+
+
+def test_build_without_a_stage_one_is_disabled(booster):
+    assert cascade.build(booster, trees=0) is None
+    assert cascade.build(booster, trees=40) is None  # not cheaper than the full model
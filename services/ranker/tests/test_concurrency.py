@@ -0,0 +1,31 @@
+from services.ranker.concurrency import ConcurrencyConfig, prepare_metrics_dir
+
+
+def test_core_slices_cover_cores_once():
+    cfg = ConcurrencyConfig(processes=3)
+    slices = cfg.core_slices(list(range(8)))
+    assert slices == [[0, 1, 2], [3, 4, 5], [6, 7]]
+
+
+def test_more_processes_than_cores_is_capped():
+    assert len(ConcurrencyConfig(processes=4).core_slices([0, 1])) == 2
+
+
+def test_predict_threads_share_cores_between_handlers():
+    assert ConcurrencyConfig(grpc_workers=4).threads_per_predict(8) == 2
+    assert ConcurrencyConfig(grpc_workers=16).threads_per_predict(8) == 1
+    assert ConcurrencyConfig(grpc_workers=4, predict_threads=3).threads_per_predict(8) == 3
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("RANKER_GRPC_WORKERS", "8")
+    monkeypatch.setenv("RANKER_PROCESSES", "2")
+    cfg = ConcurrencyConfig.from_env()
+    assert (cfg.grpc_workers, cfg.predict_threads, cfg.processes) == (8, 0, 2)
+
+
+def test_metrics_dir_is_emptied_on_start(tmp_path, monkeypatch):
+    (tmp_path / "counter_123.db").write_bytes(b"stale")
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    assert prepare_metrics_dir() == str(tmp_path)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,138 @@
+import dataclasses
+import time
+
+import numpy as np
+import pytest
+from prometheus_client import REGISTRY
+
+from services.ranker import deadline, main, ranker_pb2
+from services.ranker.model_store import ServedModel
+
+
+class Context:
+    def __init__(self, remaining_s):
+        self.deadline = None if remaining_s is None else time.monotonic() + remaining_s
+
+    def time_remaining(self):
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def invocation_metadata(self):
+        return ()
+
+
+class Model:
+    name = "dummy"
+
+    def __init__(self, sign=1.0):
+        self.sign = sign
+
+    def predict(self, X):
+        return self.sign * np.asarray(X, dtype=np.float64)[:, 0]
+
+
+@pytest.fixture
+def servicer(monkeypatch):
+    monkeypatch.setattr(main, "result_cache", None)
+    monkeypatch.setattr(main, "shadow", None)
+    monkeypatch.setattr(main, "arms", None)
+    monkeypatch.setattr(main, "batcher", None)
+    monkeypatch.setattr(main, "model", ServedModel(Model(), {"x": 0}, "ranker_vtest", "", fallback=Model(-1.0)))
+    monkeypatch.setattr(
+        main, "fetch_features", lambda v, cids: np.arange(len(cids), dtype=np.float32).reshape(-1, 1)
+    )
+    return main.RankerServicer()
+
+
+def use_costs(monkeypatch, costs):
+    monkeypatch.setattr(main, "model", dataclasses.replace(main.model, costs=costs))
+    return costs
+
+
+def degraded_count(reason):
+    return REGISTRY.get_sample_value("rank_degraded_total", {"reason": reason}) or 0.0
+
+
+def request(n, top_k=0):
+    return ranker_pb2.RankRequest(viewer_id="v", candidate_ids=[f"c{i}" for i in range(n)], top_k=top_k)
+
+
+def test_no_deadline_or_plenty_of_time_is_not_degraded(servicer, monkeypatch):
+    use_costs(monkeypatch, deadline.CostModel(0.01, 0.01))
+    for ctx in (None, Context(None), Context(10.0)):
+        resp = servicer.Rank(request(100), ctx)
+        assert not resp.degraded and resp.ranked_ids[0] == "c99" and len(resp.ranked_ids) == 100
+
+
+def test_tight_budget_truncates_candidates(servicer, monkeypatch):
+    # 1ms per candidate in each phase, 42ms left - 2ms reserve -> about 20 candidates
+    use_costs(monkeypatch, deadline.CostModel(1.0, 1.0))
+    before = degraded_count("truncated")
+    resp = servicer.Rank(request(100), Context(0.042))
+    assert resp.degraded and resp.degraded_reason == "truncated"
+    n = len(resp.ranked_ids)
+    assert 15 <= n <= 20
+    assert list(resp.ranked_ids) == [f"c{i}" for i in range(n - 1, -1, -1)]
+    assert degraded_count("truncated") == before + 1
+
+
+def test_slow_fetch_leaves_time_only_for_the_fallback_model(servicer, monkeypatch):
+    # 100 candidates at 5ms each fit the 600ms budget up front, but not after
+    # a 200ms fetch
+    use_costs(monkeypatch, deadline.CostModel(0.0001, 5.0))
+
+    def slow_fetch(v, cids):
+        time.sleep(0.2)
+        return np.arange(len(cids), dtype=np.float32).reshape(-1, 1)
+
+    monkeypatch.setattr(main, "fetch_features", slow_fetch)
+    before = degraded_count("fallback_model")
+    resp = servicer.Rank(request(100), Context(0.6))
+    assert resp.degraded_reason == "fallback_model"
+    assert len(resp.ranked_ids) == 100 and resp.ranked_ids[0] == "c0"  # the fallback scores in reverse
+    assert degraded_count("fallback_model") == before + 1
+
+
+def test_no_time_at_all_returns_request_order_unscored(servicer, monkeypatch):
+    use_costs(monkeypatch, deadline.CostModel(1.0, 1.0))
+    resp = servicer.Rank(request(10, top_k=3), Context(0.001))
+    assert resp.degraded_reason == "unscored"
+    assert list(resp.ranked_ids) == ["c0", "c1", "c2"] and not resp.scores
+
+
+def test_cost_model_tracks_observed_cost():
+    costs = deadline.CostModel(1.0, 1.0, alpha=0.5)
+    costs.observe("fetch", 100, 50.0)  # 0.5 ms per candidate
+    assert costs.per_candidate["fetch"] == 0.75
+    assert costs.fits(35.0, "fetch", "predict") == 20
+
+
+def test_truncated_calls_still_teach_the_cost_model(servicer, monkeypatch):
+    # a far too pessimistic prior truncates the first calls; what they
+    # measure brings the estimate down until the full request fits
+    costs = use_costs(monkeypatch, deadline.CostModel(1.0, 1.0, alpha=0.2))
+    degraded = [servicer.Rank(request(5000), Context(0.1)).degraded for _ in range(60)]
+    assert degraded[0] and not any(degraded[-10:])
+    assert costs.per_candidate["fetch"] < 0.01 and costs.per_candidate["predict"] < 0.01
+
+
+def test_costs_are_learned_per_model(servicer, monkeypatch):
+    other = ServedModel(Model(), {"x": 0}, "ranker_vother", "")
+    before = dict(other.costs.per_candidate)
+    costs = use_costs(monkeypatch, deadline.CostModel(1.0, 1.0, alpha=0.5))
+    servicer.Rank(request(100), Context(10.0))
+    assert costs.per_candidate["predict"] < 1.0
+    assert other.costs.per_candidate == before
+
+
+def test_cascade_timings_do_not_move_the_full_predict_estimate(servicer, monkeypatch):
+    class Stage:
+        rescore = 10
+
+        def rank(self, feats, score, k):
+            order = np.arange(len(feats))[::-1]
+            return order, np.asarray(score(np.asarray(feats)[order]), dtype=np.float64)
+
+    costs = deadline.CostModel(1.0, 1.0, alpha=0.5)
+    monkeypatch.setattr(main, "model", dataclasses.replace(main.model, cascade=Stage(), costs=costs))
+    servicer.Rank(request(100), Context(10.0))
+    assert costs.per_candidate["cascade"] < 1.0 and costs.per_candidate["predict"] == 1.0
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from services.ranker import feature_cache
+from services.ranker.feature_cache import CandidateFeatureCache
+from services.ranker.feature_fetcher import FeatureFetcher
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def rows(*values):
+    return np.array([[v, v] for v in values], dtype=np.float32)
+
+
+def test_hits_and_misses():
+    cache = CandidateFeatureCache(width=2, max_bytes=1024, ttl_s=60)
+    cache.put(["a", "b"], rows(1, 2))
+    out, miss = cache.get(["b", "x", "a"])
+    assert miss.tolist() == [1]
+    np.testing.assert_array_equal(out[[0, 2]], rows(2, 1))
+
+
+def test_memory_cap_evicts_least_recently_used():
+    cache = CandidateFeatureCache(width=2, max_bytes=3 * 2 * 4, ttl_s=60)
+    assert cache.capacity == 3
+    cache.put(["a", "b", "c"], rows(1, 2, 3))
+    cache.get(["a"])
+    cache.put(["d"], rows(4))
+    _, miss = cache.get(["a", "b", "c", "d"])
+    assert miss.tolist() == [1]
+    assert len(cache) == 3
+
+
+def test_rows_expire(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(feature_cache.time, "monotonic", lambda: now[0])
+    cache = CandidateFeatureCache(width=2, max_bytes=1024, ttl_s=10)
+    cache.put(["a"], rows(1))
+    now[0] = 11.0
+    _, miss = cache.get(["a"])
+    assert miss.tolist() == [0]
+    assert len(cache) == 0
+    assert feature_cache.feature_cache_rows._value.get() == 0
+
+
+def test_fetcher_only_requests_misses():
+    redis = fakeredis.FakeRedis()
+    redis.hset("feat:viewer:v", mapping={"g": 9})
+    for cid in "abc":
+        redis.hset(f"feat:cand:{cid}", mapping={"f": ord(cid)})
+    cache = CandidateFeatureCache(width=2, max_bytes=1024, ttl_s=60)
+    fetcher = FeatureFetcher(redis, {"f": 0, "g": 1}, cache=cache)
+    first = fetcher.fetch("v", ["a", "b"])
+
+    requested = []
+    fetch_raw = fetcher.fetch_raw
+    fetcher.fetch_raw = lambda viewer, cids: requested.append(list(cids)) or fetch_raw(viewer, cids)
+    second = fetcher.fetch("v", ["b", "c", "a"])
+    assert requested == [["c"]]
+    np.testing.assert_array_equal(second, [[98, 9], [99, 9], [97, 9]])
+    np.testing.assert_array_equal(first, second[[2, 0]])
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from services.ranker import feature_fetcher
+from services.ranker.feature_fetcher import FeatureFetcher
+
+fakeredis = pytest.importorskip("fakeredis")
+
+FMAP = {"trend": 2, "fav_overlap": 0, "recent_swipes": 1}
+
+
+@pytest.fixture
+def redis():
+    r = fakeredis.FakeRedis()
+    r.hset("feat:viewer:v1", mapping={"recent_swipes": 7})
+    r.hset("feat:cand:a", mapping={"fav_overlap": 0.5, "trend": 1.5})
+    r.hset("feat:cand:b", mapping={"fav_overlap": 0.25, "recent_swipes": 3})
+    return r
+
+
+def test_columns_follow_feature_map_and_gaps_are_filled(redis):
+    fetcher = FeatureFetcher(redis, FMAP, defaults={"trend": -1.0})
+    feats = fetcher.fetch("v1", ["a", "b", "missing"])
+    assert feats.dtype == np.float32 and feats.flags["C_CONTIGUOUS"]
+    np.testing.assert_array_equal(feats, [
+        [0.5, 7.0, 1.5],
+        [0.25, 3.0, -1.0],
+        [0.0, 7.0, -1.0],
+    ])
+
+
+def test_single_round_trip(redis, monkeypatch):
+    executes = []
+    pipeline = redis.pipeline
+
+    def counting_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        execute = pipe.execute
+        pipe.execute = lambda: executes.append(1) or execute()
+        return pipe
+
+    monkeypatch.setattr(redis, "pipeline", counting_pipeline)
+    FeatureFetcher(redis, FMAP).fetch("v1", ["a", "b"] * 50)
+    assert executes == [1]
+
+
+def test_empty_candidates(redis):
+    assert FeatureFetcher(redis, FMAP).fetch("v1", []).shape == (0, 3)
+
+
+def test_fetch_features_uses_configured_fetcher(redis, monkeypatch):
+    monkeypatch.setattr(feature_fetcher, "_fetcher", FeatureFetcher(redis, FMAP))
+    feats = feature_fetcher.fetch_features("v1", ["a"])
+    np.testing.assert_array_equal(feats, [[0.5, 7.0, 1.5]])
+
+
+def test_missing_features_are_counted_by_fallback(redis):
+    from prometheus_client import REGISTRY
+
+    def value(name, labels=None):
+        return REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+    before = (
+        value("feature_missing_values_total", {"fallback": "viewer"}),
+        value("feature_missing_values_total", {"fallback": "default"}),
+        value("feature_missing_rows_total"),
+    )
+    FeatureFetcher(redis, FMAP).fetch("v1", ["a", "b", "missing"])
+    after = (
+        value("feature_missing_values_total", {"fallback": "viewer"}),
+        value("feature_missing_values_total", {"fallback": "default"}),
+        value("feature_missing_rows_total"),
+    )
+    assert [a - b for a, b in zip(after, before)] == [2, 3, 1]
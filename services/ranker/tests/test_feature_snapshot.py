@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+import pytest
+
+from services.ranker.feature_fetcher import FeatureFetcher
+from services.ranker.feature_snapshot import SnapshotStore, build_from_parquet, write_snapshot
+
+FMAP = {"trend": 2, "fav_overlap": 0, "recent_swipes": 1}
+
+
+def test_lookup_gathers_rows_in_request_order(tmp_path):
+    write_snapshot(str(tmp_path), ["b", "a", "c"], {"trend": [2.0, 1.0, 3.0], "fav_overlap": [0.25, 0.125, 0.5]}, FMAP)
+    store = SnapshotStore(str(tmp_path), FMAP, poll_s=0).start()
+    rows, miss = store.current.lookup(["c", "zz", "a", "b"])
+    np.testing.assert_array_equal(miss, [1])
+    np.testing.assert_array_equal(rows[[0, 2, 3]][:, [0, 2]], [[0.5, 3.0], [0.125, 1.0], [0.25, 2.0]])
+    assert np.isnan(rows[:, 1]).all() and np.isnan(rows[1]).all()
+
+
+def test_new_snapshot_is_swapped_in_and_old_ones_pruned(tmp_path):
+    root = str(tmp_path)
+    write_snapshot(root, ["a"], {"trend": [1.0]}, FMAP)
+    store = SnapshotStore(root, FMAP, poll_s=0).start()
+    held = store.current
+    assert not store.refresh()
+    write_snapshot(root, ["a"], {"trend": [2.0]}, FMAP, keep=1)
+    assert store.refresh()
+    assert not store.refresh()
+    assert store.current.lookup(["a"])[0][0, 2] == 2.0
+    assert held.lookup(["a"])[0][0, 2] == 1.0  # still mapped after pruning
+    assert len([d for d in os.listdir(root) if d.startswith("snapshot-")]) == 1
+
+
+def test_rejects_unknown_columns(tmp_path):
+    with pytest.raises(ValueError):
+        write_snapshot(str(tmp_path), ["a"], {"nope": [1.0]}, FMAP)
+
+
+def test_fetcher_only_asks_redis_for_viewer_and_unknown_candidates(tmp_path):
+    fakeredis = pytest.importorskip("fakeredis")
+    r = fakeredis.FakeRedis()
+    r.hset("feat:viewer:v1", mapping={"recent_swipes": 7})
+    r.hset("feat:cand:new", mapping={"fav_overlap": 0.75, "trend": 9.0})
+    write_snapshot(str(tmp_path), ["a", "b"], {"fav_overlap": [0.5, 0.25], "trend": [1.5, np.nan]}, FMAP)
+    fetcher = FeatureFetcher(r, FMAP, defaults={"trend": -1.0}, snapshots=SnapshotStore(str(tmp_path), FMAP, 0).start())
+
+    keys = []
+    pipeline = r.pipeline
+
+    def recording_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        hmget = pipe.hmget
+        pipe.hmget = lambda key, names: keys.append(key) or hmget(key, names)
+        return pipe
+
+    r.pipeline = recording_pipeline
+    feats = fetcher.fetch("v1", ["b", "new", "a"])
+    assert keys == ["feat:viewer:v1", "feat:cand:new"]
+    np.testing.assert_array_equal(feats, [[0.25, 7.0, -1.0], [0.75, 7.0, 9.0], [0.5, 7.0, 1.5]])
+
+
+def test_build_from_parquet(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    table = pa.table({"candidate_id": ["x", "y"], "trend": [1.0, 2.0], "unrelated": [0, 0]})
+    pq.write_table(table, tmp_path / "c.parquet")
+    build_from_parquet(str(tmp_path / "c.parquet"), FMAP, str(tmp_path / "snap"))
+    store = SnapshotStore(str(tmp_path / "snap"), FMAP, 0).start()
+    rows, miss = store.current.lookup(["y", "x"])
+    assert len(miss) == 0
+    np.testing.assert_array_equal(rows[:, 2], [2.0, 1.0])
+    assert np.isnan(rows[:, :2]).all()  # only feature_map columns are carried
@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+
+import grpc
+import numpy as np
+from fastapi.testclient import TestClient
+
+from services.ranker import main, metrics, ranker_pb2, ranker_pb2_grpc
+from services.ranker.model_store import ServedModel
+
+
+class Dummy:
+    name = "dummy"
+
+    def predict(self, X):
+        return np.asarray(X)[:, 0]
+
+
+def test_rank_phases_are_exposed_with_request_id_exemplars(monkeypatch):
+    monkeypatch.setattr(metrics, "EXEMPLARS", True)
+    monkeypatch.setattr(main, "result_cache", None)
+    monkeypatch.setattr(main, "model", ServedModel(Dummy(), {"x": 0}, "ranker_vtest", ""))
+    monkeypatch.setattr(
+        main, "fetch_features", lambda v, cids: np.arange(len(cids), dtype=np.float32).reshape(-1, 1)
+    )
+    server = main.serve_grpc(port=50060)
+    try:
+        stub = ranker_pb2_grpc.RankerStub(grpc.insecure_channel("localhost:50060"))
+        stub.Rank(
+            ranker_pb2.RankRequest(viewer_id="v", candidate_ids=["a", "b", "c"]),
+            metadata=[("x-request-id", "req-123")],
+        )
+    finally:
+        server.stop(0)
+
+    client = TestClient(main.app)
+    text = client.get("/metrics").text
+    for name in ("fetch", "predict", "sort"):
+        assert f'rank_phase_ms_count{{phase="{name}"}}' in text
+    assert "rank_candidates_bucket" in text
+    assert "feature_missing_values_total" in text
+
+    om = client.get("/metrics", headers={"accept": "application/openmetrics-text"}).text
+    assert 'request_id="req-123"' in om
+
+
+def test_exemplars_are_opt_in(monkeypatch):
+    class Context:
+        def invocation_metadata(self):
+            return [("x-request-id", "r")]
+
+    monkeypatch.setattr(metrics, "EXEMPLARS", False)
+    assert metrics.request_exemplar(Context()) is None
+    monkeypatch.setattr(metrics, "EXEMPLARS", True)
+    assert metrics.request_exemplar(Context()) == {"request_id": "r"}
+
+
+def test_metrics_sum_worker_processes(tmp_path, monkeypatch):
+    # each worker process writes its own file under PROMETHEUS_MULTIPROC_DIR
+    count = "from prometheus_client import Counter; Counter('rank_requests_total', '').inc(2)"
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", count], env=env, check=True)
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    text = TestClient(main.app).get("/metrics").text
+    assert "rank_requests_total 4.0" in text
@@ -0,0 +1,114 @@
+import json
+import os
+
+import grpc
+import lightgbm as lgb
+import numpy as np
+import pytest
+
+from services.ranker import main, model_store, ranker_pb2, ranker_pb2_grpc
+
+
+def write_model(model_dir, version, n_features=4, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((400, n_features)).astype(np.float32)
+    y = (X[:, 0] > 0).astype(int)
+    model = lgb.LGBMRanker(objective="lambdarank", n_estimators=5, num_leaves=7, min_child_samples=5, verbose=-1)
+    model.fit(X, y, group=[20] * 20)
+    path = os.path.join(model_dir, f"ranker_v{version}.txt")
+    model.booster_.save_model(path)
+    os.utime(path, (0, 0))  # old enough to be past the settle window
+    return path
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    with open(tmp_path / "feature_map.json", "w") as f:
+        json.dump({f"f{i}": i for i in range(4)}, f)
+    monkeypatch.setenv("RANKER_BACKEND", "lightgbm")
+    monkeypatch.setenv("MODEL_PATH", write_model(str(tmp_path), "2024-01-01"))
+    monkeypatch.setattr(main, "model", None)
+    monkeypatch.setattr(main, "feature_map", None)
+    main.load_model()
+    return str(tmp_path)
+
+
+def test_latest_model_skips_unsettled_files(tmp_path):
+    old = write_model(str(tmp_path), "2024-01-01")
+    new = write_model(str(tmp_path), "2024-02-01")
+    os.utime(new, None)
+    assert model_store.latest_model(str(tmp_path), settle_s=60) == old
+    assert model_store.latest_model(str(tmp_path)) == new
+
+
+def test_watcher_swaps_in_newer_model(model_dir):
+    before = main.model
+    assert before.version == "ranker_v2024-01-01"
+    watcher = model_store.ModelWatcher(model_dir, main.reload_model, lambda: main.model.path)
+    assert not watcher.check()
+    write_model(model_dir, "2024-02-01", seed=1)
+    assert watcher.check()
+    assert main.model.version == "ranker_v2024-02-01"
+    # a request holding the old model can still score with it
+    X = np.zeros((3, 4), dtype=np.float32)
+    assert before.predict(X).shape == (3,)
+    assert model_store.served_model_info._value == {
+        "version": "ranker_v2024-02-01", "backend": "lightgbm", "cascade": ""
+    }
+
+
+def test_mismatched_model_is_rejected_and_not_retried(model_dir):
+    bad = write_model(model_dir, "2024-03-01", n_features=5)
+    calls = []
+
+    def reload(path):
+        calls.append(path)
+        return main.reload_model(path)
+
+    watcher = model_store.ModelWatcher(model_dir, reload, lambda: main.model.path)
+    assert not watcher.check()
+    assert not watcher.check()
+    assert calls == [bad]
+    assert main.model.version == "ranker_v2024-01-01"
+    with pytest.raises(model_store.FeatureMismatch):
+        main.reload_model(bad)
+
+
+def test_reload_without_a_model_names_the_directory(model_dir, tmp_path_factory, monkeypatch):
+    empty = str(tmp_path_factory.mktemp("empty"))
+    monkeypatch.setattr(main, "model_dir", empty)
+    with pytest.raises(FileNotFoundError, match=empty):
+        main.reload_model()
+    assert main.model.version == "ranker_v2024-01-01"
+
+
+def test_reload_rpc(model_dir):
+    write_model(model_dir, "2024-02-01", seed=1)
+    server = main.serve_grpc(port=50057)
+    try:
+        stub = ranker_pb2_grpc.RankerStub(grpc.insecure_channel("localhost:50057"))
+        resp = stub.ReloadModel(ranker_pb2.ReloadModelRequest())
+        assert resp.model_version == "ranker_v2024-02-01" and resp.swapped
+        resp = stub.ReloadModel(ranker_pb2.ReloadModelRequest(model_file="ranker_v2024-02-01.txt"))
+        assert not resp.swapped
+        with pytest.raises(grpc.RpcError) as err:
+            stub.ReloadModel(ranker_pb2.ReloadModelRequest(model_file="../../etc/passwd"))
+        assert err.value.code() == grpc.StatusCode.NOT_FOUND
+        ranked = stub.Rank(ranker_pb2.RankRequest(viewer_id="v", candidate_ids=["a", "b"]))
+        assert ranked.model_version == "ranker_v2024-02-01"
+    finally:
+        server.stop(0)
+
+
+def test_only_rank_serving_loads_build_the_cheaper_scorers(tmp_path, monkeypatch):
+    with open(tmp_path / "feature_map.json", "w") as f:
+        json.dump({f"f{i}": i for i in range(4)}, f)
+    path = write_model(str(tmp_path), "2024-01-01")
+    monkeypatch.setenv("RANKER_FALLBACK_TREES", "2")
+    monkeypatch.setenv("RANKER_CASCADE_TREES", "2")
+    shadow = model_store.load(path)
+    assert shadow.cascade is None and shadow.fallback is None
+    served = model_store.load(path, cascade=True, fallback=True)
+    assert served.cascade is not None and served.fallback is served.cascade.first
+    monkeypatch.delenv("RANKER_CASCADE_TREES")
+    assert model_store.load(path, fallback=True).fallback is not None
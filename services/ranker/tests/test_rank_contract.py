@@ -3,6 +3,7 @@ from multiprocessing import Process
 import time
 
 from services.ranker import main, server, ranker_pb2, ranker_pb2_grpc
+from services.ranker.model_store import ServedModel
 
 
 def start_server():
@@ -30,3 +31,23 @@ def test_rank_response_order(tmp_path, monkeypatch):
     assert resp1.ranked_ids == ["c", "b", "a"]
     assert resp1.ranked_ids == resp2.ranked_ids
     grpc_server.stop(0)
+
+
+def test_rank_top_k_returns_scores_and_version(monkeypatch):
+    def fetch(viewer_id, candidate_ids):
+        return [[float(len(cid))] for cid in candidate_ids]
+    monkeypatch.setattr(main, "fetch_features", fetch)
+    class Dummy:
+        def predict(self, X):
+            return [row[0] for row in X]
+    monkeypatch.setattr(main, "model", ServedModel(Dummy(), {"len": 0}, "ranker_v2024-01-01", "ranker_v2024-01-01.txt"))
+
+    grpc_server = main.serve_grpc(port=50056)
+    channel = grpc.insecure_channel("localhost:50056")
+    stub = ranker_pb2_grpc.RankerStub(channel)
+    req = ranker_pb2.RankRequest(viewer_id="v1", candidate_ids=["bb", "a", "ccc", "dd"], top_k=2)
+    resp = stub.Rank(req)
+    assert list(resp.ranked_ids) == ["ccc", "bb"]
+    assert list(resp.scores) == [3.0, 2.0]
+    assert resp.model_version == "ranker_v2024-01-01"
+    grpc_server.stop(0)
@@ -0,0 +1,64 @@
+import time
+
+import grpc
+import numpy as np
+from prometheus_client import REGISTRY
+
+from services.ranker import main, ranker_pb2, ranker_pb2_grpc
+from services.ranker.model_store import ServedModel
+from services.ranker.result_cache import RankResultCache
+
+
+def test_key_depends_on_candidate_order_and_model():
+    k = RankResultCache.key
+    assert k("v", ["a", "b"], 0, "m1") == k("v", ["a", "b"], 0, "m1")
+    assert k("v", ["a", "b"], 0, "m1") != k("v", ["b", "a"], 0, "m1")
+    assert k("v", ["ab"], 0, "m1") != k("v", ["a", "b"], 0, "m1")
+    assert k("v", ["a", "b"], 0, "m1") != k("v", ["a", "b"], 0, "m2")
+    assert k("v", ["a", "b"], 0, "m1") != k("v", ["a", "b"], 1, "m1")
+
+
+def test_evicts_by_total_ids_and_expires():
+    cache = RankResultCache(max_ids=5, ttl_s=0.05)
+    cache.put("a", ["1", "2", "3"], [3.0, 2.0, 1.0], 1.0)
+    cache.put("b", ["1", "2"], [2.0, 1.0], 1.0)
+    assert cache.get("a") is not None  # a is now most recent
+    cache.put("c", ["1"], [1.0], 1.0)
+    assert cache.get("b") is None
+    assert cache.get("a") == (["1", "2", "3"], [3.0, 2.0, 1.0])
+    time.sleep(0.06)
+    assert cache.get("a") is None and cache.get("c") is None
+
+
+def test_repeated_rank_skips_fetch_until_model_swap(monkeypatch):
+    calls = []
+
+    def fetch(viewer_id, candidate_ids):
+        calls.append(viewer_id)
+        return np.array([[float(len(c))] for c in candidate_ids], dtype=np.float32)
+
+    class Dummy:
+        name = "dummy"
+
+        def predict(self, X):
+            return np.asarray(X)[:, 0]
+
+    monkeypatch.setattr(main, "fetch_features", fetch)
+    monkeypatch.setattr(main, "result_cache", RankResultCache(max_ids=100, ttl_s=60))
+    main.install_model(ServedModel(Dummy(), {"x": 0}, "ranker_v1", "v1.txt"))
+    saved = REGISTRY.get_sample_value("rank_result_cache_saved_ms_total") or 0.0
+    server = main.serve_grpc(port=50059)
+    try:
+        stub = ranker_pb2_grpc.RankerStub(grpc.insecure_channel("localhost:50059"))
+        req = ranker_pb2.RankRequest(viewer_id="v", candidate_ids=["bb", "a", "ccc"])
+        first = stub.Rank(req)
+        second = stub.Rank(req)
+        assert calls == ["v"]
+        assert first == second
+        assert REGISTRY.get_sample_value("rank_result_cache_saved_ms_total") > saved
+        main.install_model(ServedModel(Dummy(), {"x": 0}, "ranker_v2", "v2.txt"))
+        assert len(main.result_cache) == 0
+        assert stub.Rank(req).model_version == "ranker_v2"
+        assert calls == ["v", "v"]
+    finally:
+        server.stop(0)
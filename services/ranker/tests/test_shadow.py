@@ -0,0 +1,58 @@
+import threading
+
+import numpy as np
+from prometheus_client import REGISTRY
+
+from services.ranker import shadow
+from services.ranker.model_store import ServedModel
+
+
+class Blocking:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def predict(self, X):
+        self.release.wait(5)
+        return -np.asarray(X)[:, 0]
+
+
+def sample(name):
+    return REGISTRY.get_sample_value(name) or 0.0
+
+
+def test_rank_agreement_metrics():
+    a = np.array([0.9, 0.5, 0.1, 0.7])
+    assert shadow.spearman(a, a * 2) == 1.0
+    assert shadow.spearman(a, -a) == -1.0
+    assert np.isnan(shadow.spearman(a, np.ones(4)))
+    assert shadow.overlap_at_k(a, a, 2) == 1.0
+    assert shadow.overlap_at_k(a, np.array([0.0, 0.0, 1.0, 1.0]), 2) == 0.5
+
+
+def test_average_ranks_share_ties():
+    np.testing.assert_array_equal(shadow.average_ranks(np.array([3.0, 1.0, 3.0])), [1.5, 0.0, 1.5])
+
+
+def test_full_queue_drops_instead_of_blocking():
+    model = Blocking()
+    scorer = shadow.ShadowScorer(ServedModel(model, {}, "shadow", ""), sample_rate=1.0, max_pending=2)
+    feats = np.arange(8, dtype=np.float32).reshape(4, 2)
+    primary = feats[:, 0].astype(np.float64)
+    dropped = sample("shadow_dropped_total")
+    served = sample("shadow_served_total")
+    reversed_ = REGISTRY.get_sample_value("shadow_rank_correlation_bucket", {"le": "-0.5"}) or 0.0
+    assert scorer.submit(feats, primary)
+    assert scorer.submit(feats, primary)
+    assert not scorer.submit(feats, primary)
+    assert sample("shadow_dropped_total") == dropped + 1
+    model.release.set()
+    scorer.close()
+    assert sample("shadow_served_total") == served + 2
+    # the shadow reverses the primary order
+    assert REGISTRY.get_sample_value("shadow_rank_correlation_bucket", {"le": "-0.5"}) == reversed_ + 2
+
+
+def test_sampling_skips_requests():
+    scorer = shadow.ShadowScorer(ServedModel(Blocking(), {}, "shadow", ""), sample_rate=0.0)
+    assert not scorer.submit(np.zeros((1, 1)), np.zeros(1))
+    scorer.close()
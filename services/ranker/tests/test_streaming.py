@@ -0,0 +1,63 @@
+import grpc
+import numpy as np
+import pytest
+
+from services.ranker import main, ranker_pb2, ranker_pb2_grpc
+from services.ranker.model_store import ServedModel
+from services.ranker.ranking import top_k_order
+from services.ranker.streaming import StreamingTopK, prefetch
+
+
+def test_streaming_top_k_matches_one_shot_ranking():
+    rng = np.random.default_rng(0)
+    scores = rng.integers(0, 50, 5000).astype(np.float64)  # plenty of ties
+    ids = [f"c{i}" for i in range(len(scores))]
+    best = StreamingTopK(100)
+    for lo in range(0, len(ids), 333):
+        best.push(ids[lo : lo + 333], scores[lo : lo + 333])
+        assert len(best.ids) <= 100
+    ranked, got = best.result()
+    order = top_k_order(scores, 100)
+    assert ranked == [ids[i] for i in order]
+    np.testing.assert_array_equal(got, scores[order])
+    assert best.seen == 5000
+
+
+def test_prefetch_runs_ahead_and_reraises():
+    assert list(prefetch(range(4), lambda x: x * x)) == [(0, 0), (1, 1), (2, 4), (3, 9)]
+
+    def boom(x):
+        if x == 2:
+            raise KeyError(x)
+        return x
+
+    with pytest.raises(KeyError):
+        list(prefetch(range(4), boom))
+
+
+def test_rank_stream_matches_unary_rank(monkeypatch):
+    def fetch(viewer_id, candidate_ids):
+        return np.array([[float(int(c) % 97)] for c in candidate_ids], dtype=np.float32)
+
+    class Dummy:
+        def predict(self, X):
+            return np.asarray(X)[:, 0]
+
+    monkeypatch.setattr(main, "fetch_features", fetch)
+    monkeypatch.setattr(main, "model", ServedModel(Dummy(), {"x": 0}, "ranker_vtest", ""))
+    cids = [str(i) for i in range(3000)]
+    server = main.serve_grpc(port=50058)
+    try:
+        stub = ranker_pb2_grpc.RankerStub(grpc.insecure_channel("localhost:50058"))
+        unary = stub.Rank(ranker_pb2.RankRequest(viewer_id="v", candidate_ids=cids, top_k=25))
+        chunks = [
+            ranker_pb2.RankChunk(viewer_id="v", candidate_ids=cids[lo : lo + 500], top_k=25)
+            for lo in range(0, len(cids), 500)
+        ]
+        streamed = stub.RankStream(iter(chunks))
+        assert list(streamed.ranked_ids) == list(unary.ranked_ids)
+        assert list(streamed.scores) == list(unary.scores)
+        assert streamed.model_version == "ranker_vtest"
+        assert list(stub.RankStream(iter([])).ranked_ids) == []
+    finally:
+        server.stop(0)
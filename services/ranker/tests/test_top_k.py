@@ -0,0 +1,17 @@
+import numpy as np
+
+from services.ranker.ranking import top_k_order
+
+
+def test_full_order_breaks_ties_by_request_order():
+    scores = np.array([0.5, 0.9, 0.5, 0.1, 0.9])
+    assert top_k_order(scores).tolist() == [1, 4, 0, 2, 3]
+
+
+def test_top_k_matches_prefix_of_full_order():
+    rng = np.random.default_rng(0)
+    # coarse scores so the k-th boundary regularly falls inside a tie
+    scores = rng.integers(0, 20, size=1000).astype(np.float64)
+    full = top_k_order(scores)
+    for k in (1, 7, 50, 999, 1000, 5000):
+        assert top_k_order(scores, k).tolist() == full[:k].tolist()
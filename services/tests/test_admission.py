@@ -0,0 +1,229 @@
+import asyncio
+import threading
+import time
+
+import grpc
+import numpy as np
+import pytest
+from concurrent import futures
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.admission import (
+    QUEUE_FULL,
+    RETRY_AFTER_KEY,
+    WAIT_TOO_LONG,
+    AdmissionController,
+    AdmissionMiddleware,
+    GrpcAdmissionInterceptor,
+    Overloaded,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_admits_up_to_limit_then_queues_and_hands_off_in_order():
+    ctl = AdmissionController("t-fifo", limit=1, max_queue=2, target_wait_ms=1000, adaptive=False)
+    first = ctl.acquire()
+    order = []
+
+    def waiter(name):
+        ticket = ctl.acquire()
+        order.append(name)
+        ctl.release(ticket)
+
+    threads = [threading.Thread(target=waiter, args=(n,)) for n in ("a", "b")]
+    for queued, t in enumerate(threads, 1):
+        t.start()
+        while ctl.snapshot()["queued"] < queued:
+            time.sleep(0.001)
+    with pytest.raises(Overloaded) as err:
+        ctl.acquire()
+    assert err.value.reason == QUEUE_FULL
+    ctl.release(first)
+    for t in threads:
+        t.join()
+    assert order == ["a", "b"]
+    snap = ctl.snapshot()
+    assert (snap["limit"], snap["in_flight"], snap["queued"]) == (1, 0, 0)
+
+
+def test_sheds_when_estimated_wait_exceeds_target():
+    clock = Clock()
+    ctl = AdmissionController("t-wait", limit=2, max_queue=100, target_wait_ms=50, adaptive=False, clock=clock)
+    ticket = ctl.acquire()
+    clock.now += 0.04  # 40ms service time
+    ctl.release(ticket)
+    held = [ctl.acquire(), ctl.acquire()]
+    # one queued call waits ~20ms (40ms / 2 slots), a third would wait ~60ms
+    with pytest.raises(Overloaded) as err:
+        ctl.acquire(max_wait_s=0.01)
+    assert err.value.reason == WAIT_TOO_LONG
+    assert err.value.retry_after_s >= 0.05
+    for t in held:
+        ctl.release(t)
+
+
+def test_queued_call_times_out_after_target_wait():
+    ctl = AdmissionController("t-timeout", limit=1, max_queue=5, target_wait_ms=20, adaptive=False)
+    held = ctl.acquire()
+    t0 = time.monotonic()
+    with pytest.raises(Overloaded):
+        ctl.acquire()
+    assert 0.015 < time.monotonic() - t0 < 0.5
+    assert ctl.snapshot()["queued"] == 0
+    ctl.release(held)
+    ctl.release(ctl.acquire())
+
+
+def test_adaptive_limit_shrinks_when_latency_rises_and_recovers():
+    clock = Clock()
+    ctl = AdmissionController("t-adapt", limit=20, min_limit=2, max_limit=40, clock=clock)
+
+    def wave(service_s):
+        tickets = [ctl.acquire() for _ in range(int(ctl.limit))]
+        clock.now += service_s
+        for t in tickets:
+            ctl.release(t)
+
+    for _ in range(50):
+        wave(0.01)
+    steady = ctl.limit
+    assert steady > 20
+    for _ in range(5):
+        wave(0.05)
+    assert ctl.limit < steady / 2
+    for _ in range(15):
+        wave(0.01)
+    assert ctl.limit > steady / 2
+
+
+def test_async_waiter_is_granted_when_slot_frees():
+    ctl = AdmissionController("t-async", limit=1, max_queue=1, target_wait_ms=1000, adaptive=False)
+    held = ctl.acquire()
+
+    async def run():
+        task = asyncio.ensure_future(ctl.acquire_async())
+        await asyncio.sleep(0.01)
+        assert ctl.snapshot()["queued"] == 1
+        threading.Thread(target=ctl.release, args=(held,)).start()
+        ctl.release(await asyncio.wait_for(task, 1))
+
+    asyncio.run(run())
+    assert ctl.snapshot()["in_flight"] == 0
+
+
+def test_cancelled_waiter_gives_back_its_place():
+    ctl = AdmissionController("t-cancel", limit=1, max_queue=2, target_wait_ms=1000, adaptive=False)
+    held = ctl.acquire()
+
+    async def run():
+        queued = asyncio.ensure_future(ctl.acquire_async())
+        await asyncio.sleep(0.01)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert ctl.snapshot()["queued"] == 0
+        ctl.release(held)
+        # the cancelled waiter must not have taken the freed slot
+        ctl.release(await asyncio.wait_for(ctl.acquire_async(), 1))
+
+    asyncio.run(run())
+    assert ctl.snapshot()["in_flight"] == 0
+
+
+def test_slot_granted_to_a_cancelled_waiter_is_released():
+    ctl = AdmissionController("t-cancel-granted", limit=1, max_queue=2, target_wait_ms=1000, adaptive=False)
+    held = ctl.acquire()
+
+    async def run():
+        queued = asyncio.ensure_future(ctl.acquire_async())
+        await asyncio.sleep(0.01)
+        ctl.release(held)  # grants the waiter; it is cancelled before it resumes
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+    asyncio.run(run())
+    assert ctl.snapshot()["in_flight"] == 0
+
+
+def test_tail_latency_stays_bounded_under_overload():
+    # one "core": every call holds it for 2ms, so capacity is ~500/s and
+    # 32 back-to-back clients offer far more than that
+    core = threading.Lock()
+    ctl = AdmissionController("t-overload", limit=2, max_limit=4, max_queue=4, target_wait_ms=10)
+    served, shed = [], [0]
+    lock = threading.Lock()
+
+    def client():
+        for _ in range(15):
+            t0 = time.perf_counter()
+            try:
+                ticket = ctl.acquire()
+            except Overloaded:
+                with lock:
+                    shed[0] += 1
+                continue
+            with core:
+                time.sleep(0.002)
+            ctl.release(ticket)
+            with lock:
+                served.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=client) for _ in range(32)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # unbounded, the last callers would wait behind ~31 others (>60ms)
+    assert shed[0] > 0
+    assert np.percentile(np.asarray(served) * 1000, 99) < 45
+
+
+def test_grpc_interceptor_returns_resource_exhausted_with_retry_after():
+    ctl = AdmissionController("t-grpc", limit=1, max_queue=0, adaptive=False)
+    handler = grpc.method_handlers_generic_handler(
+        "Test", {"Echo": grpc.unary_unary_rpc_method_handler(lambda req, ctx: req)}
+    )
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4), interceptors=[GrpcAdmissionInterceptor(ctl)])
+    server.add_generic_rpc_handlers((handler,))
+    server.add_insecure_port("localhost:50062")
+    server.start()
+    try:
+        channel = grpc.insecure_channel("localhost:50062")
+        echo = channel.unary_unary("/Test/Echo")
+        assert echo(b"hi", timeout=5) == b"hi"
+        held = ctl.acquire()
+        with pytest.raises(grpc.RpcError) as err:
+            echo(b"hi", timeout=5)
+        ctl.release(held)
+        assert err.value.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+        assert int(dict(err.value.trailing_metadata())[RETRY_AFTER_KEY]) > 0
+        assert echo(b"again", timeout=5) == b"again"
+        channel.close()
+    finally:
+        server.stop(0)
+
+
+def test_http_middleware_returns_503_with_retry_after():
+    ctl = AdmissionController("t-http", limit=1, max_queue=0, adaptive=False)
+    app = FastAPI()
+    app.add_middleware(AdmissionMiddleware, controller=ctl)
+    app.get("/work")(lambda: {"ok": True})
+    app.get("/healthz")(lambda: {"status": "ok"})
+    client = TestClient(app)
+    assert client.get("/work").status_code == 200
+    held = ctl.acquire()
+    resp = client.get("/work")
+    assert resp.status_code == 503
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert client.get("/healthz").status_code == 200
+    ctl.release(held)
+    assert client.get("/work").status_code == 200
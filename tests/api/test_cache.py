@@ -0,0 +1,88 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import api.embed as embed
+from api._embedding.cache import EmbeddingCache, LocalTier
+
+
+class CountingConn:
+    def __init__(self, row):
+        self.row = row
+        self.fetches = 0
+        self.saved = None
+
+    async def fetchrow(self, *args, **kwargs):
+        self.fetches += 1
+        return self.row
+
+    async def execute(self, *args):
+        self.saved = args[1]
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = CountingConn({"title": "t", "description": "d", "tags": ["x"], "embedding": None})
+
+    async def get_db():
+        return conn
+
+    monkeypatch.setattr(embed, "get_db", get_db)
+    monkeypatch.setattr(embed, "cache", EmbeddingCache(LocalTier(16, 60)))
+    return conn
+
+
+def handle(media_id="m1"):
+    return asyncio.run(embed.handle(embed.EmbedRequest(mediaId=media_id)))
+
+
+def test_local_tier_bounds_entries_and_expires(monkeypatch):
+    tier = LocalTier(max_entries=2, ttl_s=10)
+    for key in ("a", "b", "c"):
+        tier.set(key, b"x")
+    assert len(tier) == 2 and tier.get("a") is None
+
+    now = [0.0]
+    monkeypatch.setattr("api._embedding.cache.time.monotonic", lambda: now[0])
+    tier.set("d", b"y")
+    now[0] = 11.0
+    assert tier.get("d") is None
+
+
+def test_hit_skips_postgres(conn):
+    conn.row["embedding"] = [0.5, 0.25]
+    assert handle() == {"embedding": [0.5, 0.25], "cached": True}
+    assert handle() == {"embedding": [0.5, 0.25], "cached": True}
+    assert conn.fetches == 1
+
+
+def test_write_replaces_cached_vector(conn, monkeypatch):
+    async def create_embedding(text):
+        return [0.125] * 4
+
+    monkeypatch.setattr(embed, "create_embedding", create_embedding)
+    first = handle()
+    assert first["cached"] is False and conn.saved == [0.125] * 4
+    assert handle() == {"embedding": [0.125] * 4, "cached": True}
+    assert conn.fetches == 1
+
+
+def test_redis_tier_shared_between_processes():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    writer = EmbeddingCache(None, fakeredis.aioredis.FakeRedis(server=server), ttl_s=60)
+    reader = EmbeddingCache(LocalTier(4, 60), fakeredis.aioredis.FakeRedis(server=server))
+
+    async def scenario():
+        await writer.set("m1", [1.0, 2.0])
+        first = await reader.get("m1")
+        await writer.invalidate("m1")
+        return first, await EmbeddingCache(None, reader.redis).get("m1")
+
+    first, after = asyncio.run(scenario())
+    assert np.array_equal(first, [1.0, 2.0])
+    assert after is None
@@ -0,0 +1,166 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+import api._embedding.dlq_consumer as dlq
+from api._embedding.cache import EmbeddingCache
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class FakeConn:
+    def __init__(self, rows):
+        self.rows = rows
+        self.updates = []
+
+    async def fetch(self, query, ids):
+        return [self.rows[i] for i in ids if i in self.rows]
+
+    async def executemany(self, query, args):
+        self.updates.extend(args)
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self):
+        pool = self
+
+        class Ctx:
+            async def __aenter__(self):
+                return pool.conn
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Ctx()
+
+
+def media(mid, title="t", embedding=None):
+    return {"id": mid, "title": title, "description": "", "tags": [], "embedding": embedding}
+
+
+@pytest.fixture
+def env(monkeypatch):
+    calls = []
+
+    async def create_embeddings(texts):
+        calls.append(list(texts))
+        return np.ones((len(texts), 4), dtype=np.float16)
+
+    monkeypatch.setattr(dlq, "create_embeddings", create_embeddings)
+    monkeypatch.setattr(dlq, "cache", EmbeddingCache(None))
+    redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    return redis, calls
+
+
+def consumer(redis, rows, **cfg):
+    conn = FakeConn(rows)
+    return dlq.DlqConsumer(redis, FakePool(conn), "c0", dlq.DlqConfig(block_ms=1, **cfg)), conn
+
+
+def test_batch_embeds_distinct_texts_once_and_acks(env):
+    redis, calls = env
+    rows = {"a": media("a", "same"), "b": media("b", "same"), "c": media("c", "other"), "d": media("d", embedding=[1.0])}
+    c, conn = consumer(redis, rows)
+
+    async def scenario():
+        await dlq.ensure_group(redis, c.cfg)
+        for mid in "abcd":
+            await redis.xadd("embedding_dlq", {"mediaId": mid, "error": "e", "ts": "1"})
+        processed = await c.run_once()
+        pending = await redis.xpending("embedding_dlq", "retry_group")
+        return processed, pending["pending"]
+
+    processed, pending = asyncio.run(scenario())
+    assert processed == 4 and pending == 0
+    assert calls == [["same", "other"]]
+    assert sorted(mid for _, mid in conn.updates) == ["a", "b", "c"]
+
+
+def test_failures_back_off_then_go_dead(env, monkeypatch):
+    redis, _ = env
+
+    async def boom(texts):
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr(dlq, "create_embeddings", boom)
+    c, _ = consumer(redis, {"a": media("a")}, max_retry=2, backoff_base_s=0.05)
+
+    async def scenario():
+        await dlq.ensure_group(redis, c.cfg)
+        await redis.xadd("embedding_dlq", {"mediaId": "a", "error": "e", "ts": "1"})
+        await c.run_once()  # retry 1, re-queued with a due time
+        await c.run_once()  # read back, held until due
+        held = len(c._delayed)
+        await asyncio.sleep(0.06)
+        await c.run_once()  # retry 2 → dead letter
+        return held, await redis.xrange("embedding_dlq_dead")
+
+    held, dead = asyncio.run(scenario())
+    assert held == 1
+    assert len(dead) == 1
+    assert dead[0][1]["retry"] == "2" and "provider down" in dead[0][1]["error"]
+
+
+def test_concurrent_consumers_reclaim_stale_entries(env):
+    redis, calls = env
+    rows = {f"m{i}": media(f"m{i}", f"t{i}") for i in range(10)}
+    conn = FakeConn(rows)
+    cfg = dlq.DlqConfig(batch=3, block_ms=1, claim_idle_ms=1, claim_every_s=0)
+    consumers = [dlq.DlqConsumer(redis, FakePool(conn), f"c{i}", cfg) for i in range(3)]
+
+    async def scenario():
+        await dlq.ensure_group(redis, cfg)
+        for mid in rows:
+            await redis.xadd("embedding_dlq", {"mediaId": mid, "error": "e", "ts": "1"})
+        # a consumer that reads and then dies without ACKing
+        await redis.xreadgroup("retry_group", "dead", {"embedding_dlq": ">"}, count=2)
+        time.sleep(0.005)
+        for _ in range(3):
+            await asyncio.gather(*(c.run_once() for c in consumers))
+        return (await redis.xpending("embedding_dlq", "retry_group"))["pending"]
+
+    assert asyncio.run(scenario()) == 0
+    assert sorted({mid for _, mid in conn.updates}) == sorted(rows)
+
+
+
+def test_malformed_entries_go_dead_without_stopping_the_batch(env):
+    redis, _ = env
+    c, conn = consumer(redis, {"a": media("a")})
+
+    async def scenario():
+        await dlq.ensure_group(redis, c.cfg)
+        await redis.xadd("embedding_dlq", {"error": "e", "ts": "1"})
+        await redis.xadd("embedding_dlq", {"mediaId": "b", "due": "soon"})
+        await redis.xadd("embedding_dlq", {"mediaId": "a", "error": "e", "ts": "1"})
+        processed = await c.run_once()
+        pending = await redis.xpending("embedding_dlq", "retry_group")
+        return processed, pending["pending"], await redis.xrange("embedding_dlq_dead")
+
+    processed, pending, dead = asyncio.run(scenario())
+    assert processed == 1 and pending == 0
+    assert [mid for _, mid in conn.updates] == ["a"]
+    assert [f["error"].split(":")[0] for _, f in dead] == ["malformed entry", "malformed entry"]
+
+
+def test_run_survives_redis_errors(env, monkeypatch):
+    redis, _ = env
+    c, _ = consumer(redis, {}, backoff_base_s=0.01)
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("redis went away")
+        stop.set()
+        return 0
+
+    monkeypatch.setattr(c, "run_once", flaky)
+    stop = asyncio.Event()
+    asyncio.run(asyncio.wait_for(c.run(stop), 5))
+    assert len(calls) == 3
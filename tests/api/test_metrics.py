@@ -0,0 +1,108 @@
+import asyncio
+import io
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+import api.embed as embed
+from api._embedding import metrics
+from api._embedding.cache import EmbeddingCache
+
+
+class DummyConn:
+    def __init__(self, row):
+        self.row = row
+
+    async def fetchrow(self, *args, **kwargs):
+        return self.row
+
+    async def execute(self, *args):
+        pass
+
+    async def close(self):
+        pass
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = DummyConn({"title": "t", "description": "d", "tags": [], "embedding": None})
+
+    async def get_db():
+        return conn
+
+    async def create_embedding(text):
+        return [0.5] * 4
+
+    monkeypatch.setattr(embed, "get_db", get_db)
+    monkeypatch.setattr(embed, "create_embedding", create_embedding)
+    monkeypatch.setattr(embed, "cache", EmbeddingCache(None))
+    return conn
+
+
+def handle():
+    return asyncio.run(embed.handle(embed.EmbedRequest(mediaId="m")))
+
+
+def test_miss_records_every_phase(conn):
+    before = {p: sample("embed_phase_seconds_count", phase=p) for p in ("acquire", "fetch", "compose", "update")}
+    misses = sample("embed_cache_misses_total")
+    handle()
+    for p, count in before.items():
+        assert sample("embed_phase_seconds_count", phase=p) == count + 1
+    assert sample("embed_cache_misses_total") == misses + 1
+
+
+def test_budget_rejection_counted(conn, monkeypatch):
+    monkeypatch.setenv("OPENAI_BUDGET_REMAINING", "1")
+    before = sample("embed_budget_rejections_total")
+    with pytest.raises(embed.HTTPException):
+        handle()
+    assert sample("embed_budget_rejections_total") == before + 1
+
+
+def test_provider_error_counted(monkeypatch):
+    def create(**kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(embed.openai, "embeddings", type("E", (), {"create": staticmethod(create)}))
+    before = sample("embed_provider_errors_total")
+    with pytest.raises(RuntimeError):
+        asyncio.run(embed.create_embeddings(["x"]))
+    assert sample("embed_provider_errors_total") == before + 1
+
+
+def test_metrics_endpoint_exposes_histograms():
+    resp = TestClient(embed.app).get("/metrics")
+    assert resp.status_code == 200
+    assert "embed_phase_seconds_bucket" in resp.text
+
+
+def test_logs_are_sampled(caplog):
+    with caplog.at_level(logging.INFO, logger="api.embed"):
+        for _ in range(50):
+            metrics.log_sampled("embedded", rate=0.0)
+        metrics.log_sampled("embedded", rate=1.0, mediaId="m")
+    assert len(caplog.records) == 1
+    assert '"mediaId": "m"' in caplog.records[0].getMessage()
+
+
+def test_sampled_lines_reach_stdout_without_logging_config():
+    log = metrics.log
+    saved = log.handlers[:], log.level, log.propagate
+    log.handlers, log.propagate = [], True
+    log.setLevel(logging.NOTSET)
+    try:
+        out = io.StringIO()
+        metrics.configure_request_log(out)
+        assert log.getEffectiveLevel() == logging.INFO
+        metrics.log_sampled("embedded", rate=1.0, mediaId="m")
+        assert '"mediaId": "m"' in out.getvalue()
+    finally:
+        log.handlers, _, log.propagate = saved
+        log.setLevel(saved[1])
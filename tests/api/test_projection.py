@@ -0,0 +1,77 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import api.embed as embed
+from api._embedding.projection import PCA, MeanPool, Truncate, build_projection
+
+
+def batch(n=5, dim=768):
+    return np.random.default_rng(0).standard_normal((n, dim), dtype=np.float32)
+
+
+def test_mean_pool_matches_legacy_reshape():
+    vecs = batch()
+    out = MeanPool()(vecs)
+    legacy = [v.reshape(256, 3).mean(axis=1).astype(np.float16) for v in vecs]
+    assert out.dtype == np.float16
+    assert np.array_equal(out, np.stack(legacy))
+
+
+def test_truncate_keeps_prefix():
+    vecs = batch()
+    assert np.array_equal(Truncate()(vecs), vecs[:, :256].astype(np.float16))
+
+
+@pytest.mark.parametrize("proj", [
+    MeanPool(),
+    Truncate(),
+    PCA(np.random.default_rng(1).standard_normal((256, 768)), np.ones(768)),
+])
+def test_single_and_batch_paths_agree(proj):
+    vecs = batch(150)
+    out = proj(vecs)
+    for i, v in enumerate(vecs):
+        assert np.array_equal(proj.one(v), out[i])
+
+
+def test_rejects_wrong_input_dim():
+    with pytest.raises(ValueError, match="768"):
+        MeanPool()(batch(dim=3072))
+
+
+def test_pca_loads_favorites_builder_json(tmp_path):
+    matrix = np.eye(256, 768)
+    path = tmp_path / "pca.json"
+    path.write_text(json.dumps(matrix.tolist()))
+    proj = build_projection("pca", str(path))
+    vecs = batch()
+    assert np.array_equal(proj(vecs), vecs[:, :256].astype(np.float16))
+
+
+def test_pca_rejects_mismatched_matrix(tmp_path):
+    path = tmp_path / "pca.npy"
+    np.save(path, np.zeros((128, 768)))
+    with pytest.raises(ValueError, match="expected 768→256"):
+        build_projection("pca", str(path))
+
+
+def test_create_embeddings_projects_provider_batch(monkeypatch):
+    vecs = batch(3)
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        data = [SimpleNamespace(index=i, embedding=v.tolist()) for i, v in enumerate(vecs)]
+        return SimpleNamespace(data=data[::-1])
+
+    monkeypatch.setattr(embed.openai, "embeddings", SimpleNamespace(create=create))
+    monkeypatch.setattr(embed, "get_projection", MeanPool)
+    out = asyncio.run(embed.create_embeddings(["a", "b", "c"]))
+    assert calls[0]["dimensions"] == 768
+    assert np.array_equal(out, MeanPool()(vecs))
+    single = asyncio.run(embed.create_embedding("a"))
+    assert single == out[0].tolist()